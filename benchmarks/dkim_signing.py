@@ -0,0 +1,84 @@
+"""
+This benchmark compares DKIM signing throughput of RSA-2048, Ed25519 and dual (RSA + Ed25519) signatures.
+
+The first numbers are messages signed per second on one core,
+the last one is RSA signing spread over a pool of processes, one per core.
+Requires dkimpy, pynacl and the openssl binary to generate an RSA key.
+
+Usage: python -m benchmarks.dkim_signing [number of messages] [body size in KB]
+"""
+
+import asyncio
+import base64
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import nacl.encoding
+import nacl.signing
+
+from mailers.message import Email
+from mailers.signers.dkim import DKIMKey, DKIMSigner, ProcessPoolDKIMSigner
+
+MESSAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+BODY_SIZE = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+
+def generate_rsa_key() -> DKIMKey:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rsa.pem")
+        subprocess.run(["openssl", "genrsa", "-out", path, "2048"], check=True, capture_output=True)
+        return DKIMKey.from_file("rsa", path)
+
+
+def generate_ed25519_key() -> DKIMKey:
+    seed = nacl.signing.SigningKey.generate().encode(nacl.encoding.Base64Encoder)
+    return DKIMKey.from_ed25519("ed", seed)
+
+
+def create_messages() -> list:
+    text = base64.b64encode(os.urandom(BODY_SIZE * 768)).decode()
+    return [
+        Email(to="user@example.com", from_address="sender@example.com", subject=f"Message {index}", text=text).build()
+        for index in range(MESSAGES)
+    ]
+
+
+def report(name: str, elapsed: float) -> None:
+    print(f"{name:<20} {MESSAGES / elapsed:>10.0f} messages/s {elapsed / MESSAGES * 1000:>8.3f} ms/message")
+
+
+def benchmark(name: str, signer: DKIMSigner) -> None:
+    messages = create_messages()
+    started_at = time.perf_counter()
+    for message in messages:
+        signer.sign(message)
+    report(name, time.perf_counter() - started_at)
+
+
+async def benchmark_process_pool(name: str, signer: ProcessPoolDKIMSigner) -> None:
+    await signer.sign(create_messages()[0])  # start workers
+    messages = create_messages()
+    started_at = time.perf_counter()
+    await asyncio.gather(*[signer.sign(message) for message in messages])
+    report(name, time.perf_counter() - started_at)
+    signer.shutdown()
+
+
+def main() -> None:
+    rsa_key = generate_rsa_key()
+    ed25519_key = generate_ed25519_key()
+
+    print(f"Signing {MESSAGES} messages with {BODY_SIZE} KB body.")
+    benchmark("rsa-sha256", DKIMSigner(keys={"example.com": rsa_key}))
+    benchmark("ed25519-sha256", DKIMSigner(keys={"example.com": ed25519_key}))
+    benchmark("rsa + ed25519", DKIMSigner(keys={"example.com": [rsa_key, ed25519_key]}))
+
+    pool_signer = ProcessPoolDKIMSigner(DKIMSigner(keys={"example.com": rsa_key}))
+    asyncio.run(benchmark_process_pool(f"rsa-sha256 x {os.cpu_count()} cpu", pool_signer))
+
+
+if __name__ == "__main__":
+    main()
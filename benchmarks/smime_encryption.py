@@ -0,0 +1,70 @@
+"""
+This benchmark measures S/MIME encryption throughput of messages with a large attachment
+for a growing number of recipients.
+
+The content is encrypted once per message, only the content key is wrapped per recipient,
+so the throughput should barely depend on the number of recipients.
+Requires cryptography.
+
+Usage: python -m benchmarks.smime_encryption [number of messages] [attachment size in KB]
+"""
+
+import datetime
+import os
+import sys
+import time
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+from mailers.encrypters.smime import SMIMEEncrypter
+from mailers.message import Email
+
+MESSAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+ATTACHMENT_SIZE = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+
+
+def generate_certificate(address: str) -> x509.Certificate:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.EMAIL_ADDRESS, address)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+
+
+def benchmark(encrypter: SMIMEEncrypter, recipients: list) -> None:
+    email = Email(to=recipients, from_address="sender@example.com", subject="Report", text="See attached.")
+    email.attach(os.urandom(ATTACHMENT_SIZE * 1024), "report.bin", "application/octet-stream")
+    messages = [email.build() for _ in range(MESSAGES)]
+
+    started_at = time.perf_counter()
+    for message in messages:
+        encrypter.encrypt(message)
+    elapsed = time.perf_counter() - started_at
+    print(
+        f"{len(recipients):>3} recipient(s) {MESSAGES / elapsed:>10.1f} messages/s "
+        f"{MESSAGES * ATTACHMENT_SIZE / 1024 / elapsed:>8.1f} MB/s"
+    )
+
+
+def main() -> None:
+    addresses = [f"user{index}@example.com" for index in range(10)]
+    encrypter = SMIMEEncrypter({address: generate_certificate(address) for address in addresses})
+
+    print(f"Encrypting {MESSAGES} messages with {ATTACHMENT_SIZE} KB attachment.")
+    for count in [1, 5, 10]:
+        benchmark(encrypter, addresses[:count])
+
+
+if __name__ == "__main__":
+    main()
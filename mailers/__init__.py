@@ -1,15 +1,20 @@
-from mailers.encrypters import Encrypter
+from mailers.encrypters import AsyncEncrypter, Encrypter
 from mailers.exceptions import MailersError
 from mailers.factories import create_transport_from_url
 from mailers.mailer import Mailer, TemplatedMailer
-from mailers.message import Email
+from mailers.message import Email, Envelope
 from mailers.preprocessors import Preprocessor
-from mailers.signers import Signer
+from mailers.signers import AsyncSigner, Signer
 from mailers.transports import (
+    ArchiveTransport,
     FileTransport,
     InMemoryTransport,
+    LMTPTransport,
+    MaildirTransport,
     MultiTransport,
     NullTransport,
+    RoutingTransport,
+    SendmailTransport,
     StreamTransport,
     Transport,
 )
@@ -21,14 +26,22 @@ __all__ = [
     "SMTPTransport",
     "NullTransport",
     "FileTransport",
+    "ArchiveTransport",
+    "MaildirTransport",
+    "LMTPTransport",
+    "SendmailTransport",
     "StreamTransport",
     "MailersError",
     "Email",
+    "Envelope",
     "Preprocessor",
     "Signer",
+    "AsyncSigner",
     "Encrypter",
+    "AsyncEncrypter",
     "Mailer",
     "TemplatedMailer",
     "create_transport_from_url",
     "MultiTransport",
+    "RoutingTransport",
 ]
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import anyio
+import typing
+
+from mailers.exceptions import MailersError
+
+T = typing.TypeVar("T")
+R = typing.TypeVar("R")
+
+
+class _Batch(typing.Generic[T, R]):
+    def __init__(self, deadline: float) -> None:
+        self.items: typing.List[T] = []
+        self.results: typing.List[R] = []
+        self.error: typing.Optional[Exception] = None
+        self.started = False
+        self.deadline = deadline
+        self.done = anyio.Event()
+
+
+class Batcher(typing.Generic[T, R]):
+    """
+    Collects items submitted concurrently and processes them with one "handler" call.
+
+    A batch is processed when it reaches "max_batch_size" items or "max_delay" seconds after its first item.
+    Every caller waits for the same deadline and the first one to reach it processes the batch,
+    so the batch is processed even when the caller that started it is cancelled.
+    The handler must return results in the order of items.
+    """
+
+    def __init__(
+        self,
+        handler: typing.Callable[[typing.List[T]], typing.Awaitable[typing.List[R]]],
+        max_batch_size: int = 100,
+        max_delay: float = 0.005,
+        cancelled_message: str = "Processing of the batch was cancelled.",
+    ) -> None:
+        assert max_batch_size > 0, "Batch size must be a positive number."
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.cancelled_message = cancelled_message
+        self._batch: typing.Optional[_Batch[T, R]] = None
+
+    async def submit(self, item: T) -> R:
+        """Add the item to the current batch and return its result once the batch is processed."""
+        batch = self._batch
+        if batch is None:
+            batch = self._batch = _Batch(anyio.current_time() + self.max_delay)
+        index = len(batch.items)
+        batch.items.append(item)
+
+        if len(batch.items) < self.max_batch_size:
+            with anyio.move_on_after(batch.deadline - anyio.current_time()):
+                await batch.done.wait()
+        await self._flush(batch)
+
+        if batch.error:
+            raise batch.error
+        return batch.results[index]
+
+    async def _flush(self, batch: _Batch[T, R]) -> None:
+        if self._batch is batch:
+            self._batch = None
+        if batch.started:
+            await batch.done.wait()
+            return
+
+        batch.started = True
+        try:
+            batch.results = await self.handler(batch.items)
+        except Exception as ex:
+            batch.error = ex
+        except BaseException:
+            batch.error = MailersError(self.cancelled_message)
+            raise
+        finally:
+            batch.done.set()
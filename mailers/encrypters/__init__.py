@@ -1,3 +1,3 @@
-from .base import Encrypter
+from .base import AsyncEncrypter, Encrypter
 
-__all__ = ["Encrypter"]
+__all__ = ["Encrypter", "AsyncEncrypter"]
@@ -6,3 +6,11 @@ class Encrypter(abc.ABC):  # pragma: no cover
     @abc.abstractmethod
     def encrypt(self, message: EmailMessage) -> EmailMessage:
         raise NotImplementedError()
+
+
+class AsyncEncrypter(abc.ABC):  # pragma: no cover
+    """An encrypter that awaits I/O, e.g. fetches certificates or calls a key management service."""
+
+    @abc.abstractmethod
+    async def encrypt(self, message: EmailMessage) -> EmailMessage:
+        raise NotImplementedError()
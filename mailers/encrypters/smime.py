@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import abc
+import collections
+import copy
+import os
+import typing
+from email.message import EmailMessage
+from email.utils import getaddresses
+
+try:  # pragma: no cover
+    from cryptography import x509
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.serialization import pkcs7
+except ImportError:  # pragma: no cover
+    raise ImportError(
+        "Please install cryptography (https://pypi.org/project/cryptography/) library "
+        "to encrypt messages with S/MIME method."
+    )
+
+from mailers.encrypters.base import Encrypter
+from mailers.exceptions import EncryptionError
+
+
+class CertificateStore(abc.ABC):  # pragma: no cover
+    """Looks up recipient certificates by email address."""
+
+    @abc.abstractmethod
+    def get_certificate(self, address: str) -> typing.Optional[x509.Certificate]:
+        raise NotImplementedError()
+
+
+class InMemoryCertificateStore(CertificateStore):
+    """Keeps certificates in a mapping of email address to a certificate or PEM text."""
+
+    def __init__(self, certificates: typing.Mapping[str, typing.Union[x509.Certificate, str, bytes]]) -> None:
+        self.certificates = {address.lower(): certificate for address, certificate in certificates.items()}
+
+    def get_certificate(self, address: str) -> typing.Optional[x509.Certificate]:
+        certificate = self.certificates.get(address)
+        if certificate is None or isinstance(certificate, x509.Certificate):
+            return certificate
+        return x509.load_pem_x509_certificate(certificate.encode() if isinstance(certificate, str) else certificate)
+
+
+class DirectoryCertificateStore(CertificateStore):
+    """Reads certificates from "<directory>/<email address>.pem" files."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def get_certificate(self, address: str) -> typing.Optional[x509.Certificate]:
+        path = os.path.join(self.directory, address + ".pem")
+        if os.sep in address or not os.path.isfile(path):
+            return None
+        with open(path, "rb") as f:
+            return x509.load_pem_x509_certificate(f.read())
+
+
+class SMIMEEncrypter(Encrypter):
+    """
+    Encrypt messages with S/MIME for all recipients from To, Cc and Bcc headers.
+
+    The content is encrypted once with a single content key that is wrapped for every recipient,
+    so the cost of encrypting large attachments does not grow with the number of recipients.
+    Certificates are looked up in the store and the most recently used of them are cached in memory.
+    """
+
+    def __init__(
+        self,
+        store: typing.Union[CertificateStore, typing.Mapping[str, typing.Union[x509.Certificate, str, bytes]]],
+        cache_size: int = 1024,
+        content_encryption_algorithm: typing.Optional[typing.Any] = None,
+    ) -> None:
+        self.store = store if isinstance(store, CertificateStore) else InMemoryCertificateStore(store)
+        self.cache_size = cache_size
+        self.content_encryption_algorithm = content_encryption_algorithm
+        self._cache: typing.OrderedDict[str, x509.Certificate] = collections.OrderedDict()
+
+    def get_certificate(self, address: str) -> x509.Certificate:
+        address = address.lower()
+        certificate = self._cache.get(address)
+        if certificate is not None:
+            self._cache.move_to_end(address)
+            return certificate
+
+        certificate = self.store.get_certificate(address)
+        if certificate is None:
+            raise EncryptionError(f'No certificate found for "{address}".')
+
+        self._cache[address] = certificate
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return certificate
+
+    def encrypt(self, message: EmailMessage) -> EmailMessage:
+        headers = [str(value) for name in ["To", "Cc", "Bcc"] for value in message.get_all(name, [])]
+        addresses = list(dict.fromkeys(address.lower() for _, address in getaddresses(headers) if address))
+        if not addresses:
+            raise EncryptionError("Message has no recipients to encrypt for.")
+
+        # the encrypted entity consists of content headers and the body only
+        content = copy.copy(message)
+        for name in set(content.keys()):
+            if not name.lower().startswith("content-"):
+                del content[name]
+
+        builder = pkcs7.PKCS7EnvelopeBuilder().set_data(content.as_bytes())
+        if self.content_encryption_algorithm:
+            builder = builder.set_content_encryption_algorithm(self.content_encryption_algorithm)
+        for address in addresses:
+            builder = builder.add_recipient(self.get_certificate(address))
+        envelope = builder.encrypt(serialization.Encoding.DER, [pkcs7.PKCS7Options.Binary])
+
+        encrypted = EmailMessage(policy=message.policy)
+        for name, value in message.items():
+            if not name.lower().startswith("content-") and name.lower() != "mime-version":
+                encrypted[name] = value
+        encrypted.set_content(
+            envelope,
+            maintype="application",
+            subtype="pkcs7-mime",
+            params={"smime-type": "enveloped-data", "name": "smime.p7m"},
+            disposition="attachment",
+            filename="smime.p7m",
+        )
+        return encrypted
@@ -1,3 +1,6 @@
+import typing
+
+
 class MailersError(Exception):
     """Base error class."""
 
@@ -16,3 +19,15 @@ class InvalidBodyError(MailersError):
 
 class DeliveryError(MailersError):
     """Raised if transport fails to deliver the message."""
+
+
+class RecipientsRefusedError(DeliveryError):
+    """Raised when the server refuses all recipients, "statuses" maps each recipient to the (code, text) reply."""
+
+    def __init__(self, message: str, statuses: typing.Mapping[str, typing.Tuple[int, str]]) -> None:
+        super().__init__(message)
+        self.statuses = dict(statuses)
+
+
+class EncryptionError(MailersError):
+    """Raised when the message cannot be encrypted."""
@@ -1,8 +1,16 @@
 import typing
-from urllib.parse import parse_qsl, urlparse
+from urllib.parse import parse_qsl, unquote, urlencode, urlparse
 
 from mailers.exceptions import NotRegisteredTransportError
-from mailers.transports import ConsoleTransport, FileTransport, InMemoryTransport, NullTransport, Transport
+from mailers.transports import (
+    ArchiveTransport,
+    ConsoleTransport,
+    FileTransport,
+    InMemoryTransport,
+    MaildirTransport,
+    NullTransport,
+    Transport,
+)
 
 
 def create_transport_from_url(url: str) -> Transport:
@@ -16,17 +24,66 @@ def create_transport_from_url(url: str) -> Transport:
 
         stream = options.get("stream")
         assert stream in ["stdout", "stderr"], '"stream" must be one of "stdout", "stderr"'
-        return ConsoleTransport(stream=typing.cast(typing.Literal["stdout", "stderr"], stream))
+        return ConsoleTransport(
+            stream=typing.cast(typing.Literal["stdout", "stderr"], stream),
+            buffered=options.get("buffered", "").lower() in ["yes", "1", "on", "true"],
+        )
 
     if protocol == "file":
         return FileTransport(directory=components.path)
 
+    if protocol == "archive":
+        max_segment_age = options.get("max_segment_age")
+        return ArchiveTransport(
+            directory=components.path,
+            max_segment_size=int(options.get("max_segment_size", 64 * 1024 * 1024)),
+            max_segment_age=float(max_segment_age) if max_segment_age else None,
+            compress=options.get("compress", "").lower() in ["yes", "1", "on", "true"],
+            flush_interval=float(options.get("flush_interval", 1)) or None,
+        )
+
+    if protocol == "maildir":
+        return MaildirTransport(
+            directory=components.path,
+            shard_levels=int(options.get("shard_levels", 0)),
+            fsync=options.get("fsync", "").lower() in ["yes", "1", "on", "true"],
+        )
+
     if protocol == "memory":
-        return InMemoryTransport()
+        capacity = options.get("capacity")
+        return InMemoryTransport(capacity=int(capacity) if capacity else None)
 
     if protocol == "null":
         return NullTransport()
 
+    if protocol in ["http", "https"]:
+        from mailers.transports.http import HTTPTransport, JSONPayloadAdapter, RawPayloadAdapter
+
+        adapter_class = RawPayloadAdapter if options.get("adapter") == "raw" else JSONPayloadAdapter
+        query = [(key, value) for key, value in parse_qsl(components.query) if key not in ["adapter", "batch_size"]]
+        return HTTPTransport(
+            components._replace(query=urlencode(query)).geturl(),
+            adapter=adapter_class(max_batch_size=int(options.get("batch_size", 1))),
+        )
+
+    if protocol == "lmtp":
+        from mailers.transports.local import LMTPTransport
+
+        return LMTPTransport(
+            path=None if components.hostname else components.path,
+            host=components.hostname,
+            port=components.port or 24,
+            pool_size=int(options.get("pool_size", 1)),
+        )
+
+    if protocol == "sendmail":
+        from mailers.transports.local import SendmailTransport
+
+        return SendmailTransport(
+            command=[components.path or "/usr/sbin/sendmail", "-bs"],
+            pool_size=int(options.get("pool_size", 1)),
+        )
+
     if protocol == "smtp":
 
         def _cast_to_bool(value: str) -> bool:
@@ -41,6 +98,12 @@ def create_transport_from_url(url: str) -> Transport:
         cert_file: typing.Optional[str] = options.get("cert_file", None)
         cert_bundle: typing.Optional[str] = options.get("cert_bundle", None)
         validate_certs = _cast_to_bool(options.get("validate_certs", ""))
+        utf8 = _cast_to_bool(options.get("utf8", ""))
+        max_recipients = int(options["max_recipients"]) if options.get("max_recipients") else None
+        pool_size = int(options.get("pool_size", 0))
+        # "+" is common in VERP addresses, read it literally instead of decoding it as a space
+        raw_options = dict(option.partition("=")[::2] for option in components.query.split("&"))
+        verp = unquote(raw_options["verp"]) if raw_options.get("verp") else None
 
         from mailers.transports.smtp import SMTPTransport
 
@@ -55,6 +118,10 @@ def create_transport_from_url(url: str) -> Transport:
             cert_file=cert_file,
             cert_bundle=cert_bundle,
             validate_certs=validate_certs,
+            utf8=utf8,
+            max_recipients=max_recipients,
+            pool_size=pool_size,
+            verp=verp,
         )
 
     raise NotRegisteredTransportError(f"Don't know how to create transport for protocol '{protocol}'.")
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import abc
+import anyio
+import collections
+import sqlite3
+import threading
+import time
+import typing
+
+
+class IdempotencyStore(abc.ABC):  # pragma: nocover
+    """Remembers keys of sent messages for "ttl" seconds."""
+
+    @abc.abstractmethod
+    async def contains(self, key: str) -> bool:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def add(self, key: str) -> None:
+        raise NotImplementedError()
+
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    """Keep keys in memory, at most "max_size" of them, the oldest keys are evicted first."""
+
+    def __init__(self, ttl: float = 3600, max_size: int = 10000) -> None:
+        assert max_size > 0, "Size must be a positive number."
+        self.ttl = ttl
+        self.max_size = max_size
+        self._keys: typing.OrderedDict[str, float] = collections.OrderedDict()
+
+    async def contains(self, key: str) -> bool:
+        expires_at = self._keys.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._keys[key]
+            return False
+        return True
+
+    async def add(self, key: str) -> None:
+        now = time.monotonic()
+        self._keys[key] = now + self.ttl
+        self._keys.move_to_end(key)
+
+        # all keys live for the same time, so the oldest keys expire first
+        while self._keys and (len(self._keys) > self.max_size or next(iter(self._keys.values())) <= now):
+            self._keys.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class SQLiteIdempotencyStore(IdempotencyStore):
+    """
+    Keep keys in an SQLite database, so they survive restarts and are shared by processes on the same host.
+
+    Expired keys are deleted every "cleanup_interval" additions.
+    Queries run in worker threads, so they do not block the event loop.
+    """
+
+    def __init__(self, path: str, ttl: float = 3600, cleanup_interval: int = 1000) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.cleanup_interval = cleanup_interval
+        self._additions = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS mailers_sent_keys (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS mailers_sent_keys_expires_at ON mailers_sent_keys (expires_at)"
+        )
+
+    async def contains(self, key: str) -> bool:
+        return await anyio.to_thread.run_sync(self._contains, key)
+
+    async def add(self, key: str) -> None:
+        await anyio.to_thread.run_sync(self._add, key)
+
+    def _contains(self, key: str) -> bool:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM mailers_sent_keys WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row is not None
+
+    def _add(self, key: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO mailers_sent_keys (key, expires_at) VALUES (?, ?)", (key, now + self.ttl)
+            )
+            self._additions += 1
+            if self._additions % self.cleanup_interval == 0:
+                self._connection.execute("DELETE FROM mailers_sent_keys WHERE expires_at <= ?", (now,))
+
+    def close(self) -> None:
+        self._connection.close()
@@ -1,13 +1,22 @@
+import anyio
+import anyio.abc
+import contextlib
+import time
 import typing
-from email.message import EmailMessage
+from dataclasses import dataclass
+from email.message import EmailMessage, Message
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
+from email.utils import parseaddr
 
 from mailers import create_transport_from_url
-from mailers.encrypters import Encrypter
+from mailers.encrypters import AsyncEncrypter, Encrypter
 from mailers.exceptions import DeliveryError, InvalidSenderError
-from mailers.message import Email, Recipients
+from mailers.idempotency import IdempotencyStore
+from mailers.message import Attachment, Email, Envelope, Recipients, clone_message
 from mailers.preprocessors import Preprocessor
-from mailers.signers import Signer
+from mailers.signers import AsyncSigner, Signer
 from mailers.transports import Transport
+from mailers.transports.base import accepts_envelope, send_with_envelope
 
 if typing.TYPE_CHECKING:  # pragma: nocover
     import jinja2
@@ -18,54 +27,167 @@ else:  # pragma: nocover
         jinja2 = None
 
 
+def _get_message_size(message: Message) -> int:
+    """Estimate the serialized size of the message without flattening it."""
+    size = 0
+    for part in message.walk():
+        size += sum(len(name) + len(str(value)) + 4 for name, value in part.items())
+        if not part.is_multipart():
+            payload = part.get_payload()
+            size += len(payload) if isinstance(payload, (str, bytes)) else 0
+    return size
+
+
 class Mailer:
-    """A facade for sending mails."""
+    """
+    A facade for sending mails.
+
+    Set "large_message_transport" to send messages larger than "large_message_size" bytes via a separate transport,
+    so that messages with big attachments do not hold up small ones.
+
+    With "idempotency_store" set, messages are sent once per Message-ID (or the key passed to "send")
+    while the store remembers the key, repeated sends are skipped.
+
+    Use the mailer as an async context manager to enter its transports that are async context managers,
+    e.g. to keep connections open or to run best effort deliveries of MultiTransport in background.
+    """
 
     def __init__(
         self,
         transport: typing.Union[Transport, str],
         from_address: typing.Optional[str] = None,
-        signer: typing.Optional[Signer] = None,
-        encrypter: typing.Optional[Encrypter] = None,
+        signer: typing.Union[Signer, AsyncSigner, None] = None,
+        encrypter: typing.Union[Encrypter, AsyncEncrypter, None] = None,
         preprocessors: typing.Optional[typing.List[Preprocessor]] = None,
+        large_message_transport: typing.Union[Transport, str, None] = None,
+        large_message_size: int = 1024 * 1024,
+        idempotency_store: typing.Optional[IdempotencyStore] = None,
     ) -> None:
         if isinstance(transport, str):
             transport = create_transport_from_url(transport)
+        if isinstance(large_message_transport, str):
+            large_message_transport = create_transport_from_url(large_message_transport)
         self.transport = transport
+        self.large_message_transport = large_message_transport
+        self.large_message_size = large_message_size
+        self.idempotency_store = idempotency_store
+        self._in_flight: typing.Dict[str, anyio.Event] = {}
         self.from_address = from_address
         self.signer = signer
         self.encrypter = encrypter
         self.preprocessors = preprocessors or []
+        self._exit_stack: typing.Optional[contextlib.AsyncExitStack] = None
+
+    async def __aenter__(self) -> "Mailer":
+        async with contextlib.AsyncExitStack() as stack:
+            for transport in dict.fromkeys([self.transport, self.large_message_transport]):
+                if transport is not None and hasattr(transport, "__aenter__"):
+                    await stack.enter_async_context(typing.cast(typing.AsyncContextManager, transport))
+            self._exit_stack = stack.pop_all()
+        return self
+
+    async def __aexit__(self, *args: typing.Any) -> typing.Optional[bool]:
+        stack, self._exit_stack = self._exit_stack, None
+        assert stack, "Mailer is not entered."
+        return await stack.__aexit__(*args)
+
+    async def send(
+        self,
+        message: typing.Union[Email, EmailMessage],
+        envelope: typing.Optional[Envelope] = None,
+        idempotency_key: typing.Optional[str] = None,
+    ) -> None:
+        """
+        Send the message.
+
+        Pass an envelope to deliver the message to other recipients or from another sender than its headers specify.
+        Without it, the envelope is created from addresses of Email or read from headers of EmailMessage by transports.
+        """
+        store = self.idempotency_store
+        if store is None:
+            await self._send(message, envelope)
+            return
+
+        # the ID is generated before sending, so the key of the first send is the ID that "build" uses
+        key: typing.Any = idempotency_key
+        if not key:
+            key = (
+                message.ensure_id(self._get_default_domain())
+                if isinstance(message, Email)
+                else message.get("Message-ID")
+            )
+        if not key:
+            await self._send(message, envelope)
+            return
 
-    async def send(self, message: typing.Union[Email, EmailMessage]) -> None:
+        key = str(key).strip()
+        while key in self._in_flight:
+            await self._in_flight[key].wait()
+        if await store.contains(key):
+            return
+
+        event = self._in_flight[key] = anyio.Event()
+        try:
+            await self._send(message, envelope)
+            await store.add(key)
+        finally:
+            del self._in_flight[key]
+            event.set()
+
+    async def _send(self, message: typing.Union[Email, EmailMessage], envelope: typing.Optional[Envelope]) -> None:
         from_ = message.from_address if isinstance(message, Email) else message.get("From")
         sender_ = message.sender if isinstance(message, Email) else message.get("Sender")
 
         if not from_ and not self.from_address and not sender_:
             raise InvalidSenderError('Message must have "From" or "Sender" header.')
 
-        if not from_ and self.from_address:
-            if isinstance(message, Email):
-                message.from_address = self.from_address
-            else:
-                message["From"] = self.from_address
+        # the caller's message is never modified, preprocessors change parts, signers and from_address add headers
+        built_envelope: typing.Optional[Envelope] = None
+        if isinstance(message, Email):
+            # From is added to the built copy, so the ID gets the domain of the mailer's address here
+            message.ensure_id(self._get_default_domain())
+            mime_message = message.build()
+            built_envelope = message.build_envelope()
+            if not built_envelope.sender and self.from_address:
+                built_envelope.sender = parseaddr(self.from_address)[1]
+        else:
+            mime_message = clone_message(message, deep=bool(self.preprocessors))
 
-        mime_message = message.build() if isinstance(message, Email) else message
+        if not from_ and self.from_address:
+            mime_message["From"] = self.from_address
 
         for preprocessor in self.preprocessors:
             mime_message = preprocessor(mime_message)
 
-        if self.encrypter:
+        if isinstance(self.encrypter, AsyncEncrypter):
+            mime_message = await self.encrypter.encrypt(mime_message)
+        elif self.encrypter:
             mime_message = self.encrypter.encrypt(mime_message)
 
-        if self.signer:
+        if isinstance(self.signer, AsyncSigner):
+            mime_message = await self.signer.sign(mime_message)
+        elif self.signer:
             mime_message = self.signer.sign(mime_message)
 
+        transport = self.get_transport(mime_message)
+        # preprocessors may change address headers, transports read the envelope from the headers then
+        if envelope is None and built_envelope and not self.preprocessors and accepts_envelope(transport):
+            envelope = built_envelope
+
         try:
-            await self.transport.send(mime_message)
+            await send_with_envelope(transport, mime_message, envelope)
         except Exception as ex:
             raise DeliveryError("Failed to deliver email message.") from ex
 
+    def _get_default_domain(self) -> str:
+        return parseaddr(self.from_address)[1].rpartition("@")[2] if self.from_address else ""
+
+    def get_transport(self, message: Message) -> Transport:
+        """Select a transport for the message by its size."""
+        if self.large_message_transport and _get_message_size(message) > self.large_message_size:
+            return self.large_message_transport
+        return self.transport
+
     async def send_message(
         self,
         to: Recipients,
@@ -100,15 +222,110 @@ class Mailer:
         await self.send(message)
 
 
+TemplateContext = typing.Mapping[str, typing.Any]
+BulkRow = typing.Tuple[Recipients, TemplateContext]
+
+
+@dataclass
+class BulkResult:
+    """An outcome of sending one row of a bulk mailing."""
+
+    to: Recipients
+    error: typing.Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def _iterate_rows(
+    rows: typing.Union[typing.Iterable[BulkRow], typing.AsyncIterable[BulkRow]],
+) -> typing.AsyncIterator[BulkRow]:
+    if isinstance(rows, typing.AsyncIterable):
+        async for row in rows:
+            yield row
+    else:
+        for row in rows:
+            yield row
+
+
+async def _iterate_results(
+    receive_stream: MemoryObjectReceiveStream[typing.Tuple[BulkResult, anyio.Event]],
+) -> typing.AsyncIterator[BulkResult]:
+    async for result, done in receive_stream:
+        await done.wait()
+        yield result
+
+
 class TemplatedMailer(Mailer):
+    """
+    A mailer that renders message bodies from Jinja templates.
+
+    Resolved templates are cached per name unless the environment auto reloads them.
+    Use "warm_up" to compile templates at startup
+    and "bytecode_cache_dir" to reuse compiled templates between processes.
+    Environments created with "enable_async" are rendered with "render_async",
+    otherwise set "render_in_thread" to move rendering of heavy templates off the event loop.
+    """
+
     def __init__(
         self,
         transport: typing.Union[Transport, str],
         jinja_env: "jinja2.Environment",
+        inline_css: bool = False,
+        render_in_thread: bool = False,
+        bytecode_cache_dir: typing.Optional[str] = None,
         **kwargs: typing.Any,
     ) -> None:
         super().__init__(transport, **kwargs)
+        if bytecode_cache_dir:
+            jinja_env = jinja_env.overlay(bytecode_cache=jinja2.FileSystemBytecodeCache(bytecode_cache_dir))
+        if inline_css:
+            from mailers.templating import CSSInliningLoader
+
+            assert jinja_env.loader, "Jinja environment must have a loader to inline CSS."
+            jinja_env = jinja_env.overlay(loader=CSSInliningLoader(jinja_env.loader))
         self.jinja_env = jinja_env
+        self.render_in_thread = render_in_thread
+        self._templates: typing.Dict[str, "jinja2.Template"] = {}
+
+    def get_template(self, name: str) -> "jinja2.Template":
+        if self.jinja_env.auto_reload:
+            return self.jinja_env.get_template(name)
+
+        template = self._templates.get(name)
+        if template is None:
+            template = self._templates[name] = self.jinja_env.get_template(name)
+        return template
+
+    def warm_up(
+        self,
+        names: typing.Optional[typing.Iterable[str]] = None,
+        filter_func: typing.Optional[typing.Callable[[str], bool]] = None,
+    ) -> typing.Dict[str, float]:
+        """
+        Load and compile templates ahead of the first message.
+
+        By default, all templates known to the loader are loaded.
+        Returns time spent loading each template, in seconds.
+        """
+        if names is None:
+            names = self.jinja_env.list_templates(filter_func=filter_func)
+
+        timings: typing.Dict[str, float] = {}
+        for name in names:
+            started_at = time.perf_counter()
+            self.get_template(name)
+            timings[name] = time.perf_counter() - started_at
+        return timings
+
+    async def render_template(self, name: str, context: typing.Optional[TemplateContext] = None) -> str:
+        template = self.get_template(name)
+        if self.jinja_env.is_async:
+            return await template.render_async(context or {})
+        if self.render_in_thread:
+            return await anyio.to_thread.run_sync(template.render, context or {})
+        return template.render(context or {})
 
     async def send_templated_message(
         self,
@@ -116,7 +333,7 @@ class TemplatedMailer(Mailer):
         subject: str,
         text_template: typing.Optional[str] = None,
         html_template: typing.Optional[str] = None,
-        template_context: typing.Optional[typing.Mapping[str, typing.Any]] = None,
+        template_context: typing.Optional[TemplateContext] = None,
         from_address: typing.Optional[Recipients] = None,
         cc: typing.Optional[Recipients] = None,
         bcc: typing.Optional[Recipients] = None,
@@ -125,14 +342,20 @@ class TemplatedMailer(Mailer):
         sender: typing.Optional[str] = None,
         return_path: typing.Optional[str] = None,
         message_id: typing.Optional[str] = None,
+        attachments: typing.Optional[typing.Iterable[Attachment]] = None,
     ) -> None:
         assert text_template or html_template, "Either text_template or html_template must be set."
-        text: typing.Optional[str] = None
-        html: typing.Optional[str] = None
-        if text_template:
-            text = self.jinja_env.get_template(text_template).render(template_context or {})
-        if html_template:
-            html = self.jinja_env.get_template(html_template).render(template_context or {})
+        rendered: typing.Dict[str, str] = {}
+
+        async def _render(template_name: str) -> None:
+            rendered[template_name] = await self.render_template(template_name, template_context)
+
+        async with anyio.create_task_group() as task_group:
+            for template_name in filter(None, [text_template, html_template]):
+                task_group.start_soon(_render, template_name)
+
+        text = rendered[text_template] if text_template else None
+        html = rendered[html_template] if html_template else None
 
         message = Email(
             to=to,
@@ -149,5 +372,87 @@ class TemplatedMailer(Mailer):
             text_charset="utf-8",
             html_charset="utf-8",
             message_id=message_id,
+            attachments=attachments,
         )
         await self.send(message)
+
+    @contextlib.asynccontextmanager
+    async def send_templated_many(
+        self,
+        rows: typing.Union[typing.Iterable[BulkRow], typing.AsyncIterable[BulkRow]],
+        subject: str,
+        text_template: typing.Optional[str] = None,
+        html_template: typing.Optional[str] = None,
+        from_address: typing.Optional[Recipients] = None,
+        cc: typing.Optional[Recipients] = None,
+        bcc: typing.Optional[Recipients] = None,
+        reply_to: typing.Optional[Recipients] = None,
+        headers: typing.Optional[typing.Mapping[str, typing.Any]] = None,
+        sender: typing.Optional[str] = None,
+        return_path: typing.Optional[str] = None,
+        attachments: typing.Optional[typing.Iterable[Attachment]] = None,
+        concurrency: int = 10,
+    ) -> typing.AsyncIterator[typing.AsyncIterator[BulkResult]]:
+        """
+        Send the same templates to many recipients, each with its own template context.
+
+        Use it as an async context manager that returns an async iterator of results,
+        sends run in a task group owned by the context, leaving it early cancels pending sends.
+        Rows are (recipient, context) pairs and may come from a sync or async iterable.
+        They are consumed lazily and up to "concurrency" messages are rendered and sent in parallel,
+        a new message starts as soon as any of them finishes.
+        At most "concurrency" * 4 results wait to be yielded, so memory usage does not depend on the number of rows.
+        Headers and attachments are shared between all messages.
+        Results are yielded in the order of rows, failures are reported instead of raised.
+        """
+        assert text_template or html_template, "Either text_template or html_template must be set."
+        assert concurrency > 0, "Concurrency must be a positive number."
+        shared_headers = dict(headers) if headers else {}
+        shared_attachments = list(attachments or [])
+
+        semaphore = anyio.Semaphore(concurrency)
+        # pending results in the order of rows, sends may run ahead of the oldest unfinished row
+        # by a few windows of "concurrency" rows, so one slow send does not stall the others
+        send_stream: MemoryObjectSendStream[typing.Tuple[BulkResult, anyio.Event]]
+        receive_stream: MemoryObjectReceiveStream[typing.Tuple[BulkResult, anyio.Event]]
+        send_stream, receive_stream = anyio.create_memory_object_stream(concurrency * 4)
+
+        async def _send(to: Recipients, context: TemplateContext, result: BulkResult, done: anyio.Event) -> None:
+            try:
+                await self.send_templated_message(
+                    to=to,
+                    subject=subject,
+                    text_template=text_template,
+                    html_template=html_template,
+                    template_context=context,
+                    from_address=from_address,
+                    cc=cc,
+                    bcc=bcc,
+                    reply_to=reply_to,
+                    headers=shared_headers,
+                    sender=sender,
+                    return_path=return_path,
+                    attachments=shared_attachments,
+                )
+            except Exception as ex:
+                result.error = ex
+            finally:
+                semaphore.release()
+                done.set()
+
+        async def _produce(task_group: anyio.abc.TaskGroup) -> None:
+            async with send_stream:
+                async for to, context in _iterate_rows(rows):
+                    # a new send starts as soon as any running send finishes
+                    await semaphore.acquire()
+                    result, done = BulkResult(to=to), anyio.Event()
+                    await send_stream.send((result, done))
+                    task_group.start_soon(_send, to, context, result, done)
+
+        async with receive_stream, anyio.create_task_group() as task_group:
+            task_group.start_soon(_produce, task_group)
+            try:
+                yield _iterate_results(receive_stream)
+            finally:
+                # all results have been consumed or the caller has left the context early
+                task_group.cancel_scope.cancel()
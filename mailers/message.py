@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 import anyio as anyio
+import copy
 import email
 import email.encoders
 import email.utils
@@ -28,6 +29,50 @@ def _randon_string(length: int) -> str:
     return "".join(random.choices(string.ascii_lowercase + string.digits, k=length))
 
 
+# RFC 5322 limits a line to 998 octets, excluding CRLF
+_MAX_LINE_LENGTH = 998
+_8BIT_BYTES = bytes(range(128, 256))
+
+
+def choose_transfer_encoding(data: bytes, allow_8bit: bool = False) -> str:
+    """
+    Select the most compact Content-Transfer-Encoding for a text part.
+
+    Short-lined ASCII content is sent as "7bit" and, when allowed, 8-bit content as "8bit".
+    Otherwise, the smaller of "quoted-printable" and "base64" is chosen
+    by estimating the encoded size from the number of bytes that require escaping.
+    """
+    lines = data.splitlines()
+    if b"\0" not in data and max(map(len, lines), default=0) <= _MAX_LINE_LENGTH:
+        if data.isascii():
+            return "7bit"
+        if allow_8bit:
+            return "8bit"
+
+    size = len(data)
+    escaped = size - len(data.translate(None, _8BIT_BYTES)) + data.count(b"=")
+    qp_size = size + 2 * escaped + 3 * (size // 76)  # "=XX" escapes and soft line breaks
+    base64_size = (size + 2) // 3 * 4 + 2 * (size // 57 + 1)  # 76 char lines with CRLF
+    return "quoted-printable" if qp_size <= base64_size else "base64"
+
+
+_M = typing.TypeVar("_M", bound=Message)
+
+
+def clone_message(message: _M, deep: bool = False) -> _M:
+    """
+    Copy the message, so that changes to the copy do not affect the original.
+
+    By default, only the list of headers is copied and the payload is shared,
+    which is enough to add, replace or remove headers. Use "deep" to change the payload too.
+    """
+    if deep:
+        return copy.deepcopy(message)
+    clone = copy.copy(message)
+    clone._headers = list(message._headers)  # type: ignore[attr-defined]
+    return clone
+
+
 def _string_to_address(value: typing.Union[str, Address]) -> Address:
     if isinstance(value, Address):
         return value
@@ -107,6 +152,35 @@ class AddressList:
         self._addresses = _to_addresses(value)
 
 
+def _parse_address(value: typing.Any) -> str:
+    addresses = email.utils.getaddresses([str(value)]) if value else []
+    return addresses[0][1] if addresses else ""
+
+
+@dataclass
+class Envelope:
+    """
+    Addresses used for delivery (MAIL FROM and RCPT TO), separate from message headers.
+
+    The same message may be delivered with different envelopes, for example, to a subset of its recipients.
+    An empty sender is the null reverse-path used for bounces.
+    """
+
+    sender: str
+    recipients: typing.List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_message(cls, message: Message) -> Envelope:
+        """Read the envelope from Sender, Return-Path or From and To, Cc and Bcc headers."""
+        sender = message.get("Sender") or message.get("Return-Path") or message.get("From")
+        headers = [str(value) for name in ["To", "Cc", "Bcc"] for value in message.get_all(name, [])]
+        recipients = [address for _, address in email.utils.getaddresses(headers) if address]
+        return cls(sender=_parse_address(sender), recipients=list(dict.fromkeys(recipients)))
+
+
+_ENVELOPE_HEADERS = {"from", "to", "cc", "bcc", "return-path", "sender"}
+
+
 def _sanitize_input(
     path: typing.Union[str, os.PathLike],
     name: typing.Optional[str] = None,
@@ -158,9 +232,11 @@ class Email:
         html_charset: str = "utf-8",
         boundary: typing.Optional[str] = None,
         message_id: typing.Optional[str] = None,
+        allow_8bit: bool = False,
+        attachments: typing.Optional[typing.Iterable[Attachment]] = None,
     ) -> None:
         self._sender: typing.Optional[Address] = None
-        self._attachments: typing.List[Attachment] = []
+        self._attachments: typing.List[Attachment] = list(attachments or [])
 
         self.to = to
         self.cc = cc
@@ -179,6 +255,7 @@ class Email:
         self.boundary = boundary
         self.headers = headers or {}
         self.id = message_id
+        self.allow_8bit = allow_8bit
 
         self.date = email.utils.localtime()
 
@@ -190,6 +267,38 @@ class Email:
     def sender(self, value: typing.Optional[typing.Union[str, Address]]) -> None:
         self._sender = _string_to_address(value) if value else None
 
+    def build_envelope(self) -> Envelope:
+        """
+        Create the envelope from sender and recipient addresses without parsing headers.
+
+        Address headers set via "headers" override the attributes, the envelope is read from them then.
+        """
+        if any(name.lower() in _ENVELOPE_HEADERS for name in self.headers):
+            address_headers = EmailMessage(policy=SMTP)
+            headers = {
+                "From": self.from_address,
+                "To": self.to,
+                "Cc": self.cc,
+                "Bcc": self.bcc,
+                "Return-Path": self.return_path,
+                "Sender": self.sender,
+                **self.headers,
+            }
+            for header_name, header_value in headers.items():
+                if header_value and header_name.lower() in _ENVELOPE_HEADERS:
+                    address_headers[header_name] = header_value
+            return Envelope.from_message(address_headers)
+
+        from_address = self.from_address.first
+        if self.sender:
+            sender = self.sender.addr_spec
+        elif self.return_path:
+            sender = _parse_address(self.return_path)
+        else:
+            sender = from_address.addr_spec if from_address else ""
+        recipients = [address.addr_spec for addresses in [self.to, self.cc, self.bcc] for address in addresses]
+        return Envelope(sender=sender, recipients=list(dict.fromkeys(recipients)))
+
     def attach(
         self,
         body: typing.Union[str, bytes],
@@ -255,15 +364,21 @@ class Email:
     def attach_part(self, part: MIMEBase) -> None:
         self._attachments.append(Attachment(part=part))
 
+    def _transfer_encoding(self, content: str, charset: str) -> str:
+        return choose_transfer_encoding(content.encode(charset), self.allow_8bit)
+
     def validate(self) -> None:
         if all([self.text is None, self.html is None, not self._attachments]):
             raise InvalidBodyError("Email message must have a text, or HTML part or attachments.")
 
-    def build(self) -> EmailMessage:  # noqa: C901
-        self.validate()
+    def ensure_id(self, default_domain: str = "") -> str:
+        """
+        Generate a Message-ID unless the message has one, return the ID.
 
+        The domain of the ID is taken from the sender or From address, "default_domain" is used without them.
+        """
         if not self.id:
-            domain = ""
+            domain = default_domain
             if self.sender:
                 domain = self.sender.domain
             if self.from_address:
@@ -273,6 +388,11 @@ class Email:
                 else:  # pragma: no cover
                     raise ValueError("Could not read sender domain from From header.")
             self.id = email.utils.make_msgid(domain=domain)
+        return self.id
+
+    def build(self) -> EmailMessage:  # noqa: C901
+        self.validate()
+        self.ensure_id()
 
         headers = {
             "From": self.from_address,
@@ -300,20 +420,40 @@ class Email:
 
         # this is text only message
         if self.text and not any([self.html, inline_attachments, attachments]):
-            mime_message.set_content(self.text, subtype="plain", charset=self.text_charset)
+            mime_message.set_content(
+                self.text,
+                subtype="plain",
+                charset=self.text_charset,
+                cte=self._transfer_encoding(self.text, self.text_charset),
+            )
             return mime_message
 
         # this is HTML only message
         if self.html and not any([self.text, inline_attachments, attachments]):
-            mime_message.set_content(self.html, subtype="html", charset=self.html_charset)
+            mime_message.set_content(
+                self.html,
+                subtype="html",
+                charset=self.html_charset,
+                cte=self._transfer_encoding(self.html, self.html_charset),
+            )
             return mime_message
 
         if self.text:
-            mime_message.set_content(self.text, subtype="plain", charset=self.text_charset)
+            mime_message.set_content(
+                self.text,
+                subtype="plain",
+                charset=self.text_charset,
+                cte=self._transfer_encoding(self.text, self.text_charset),
+            )
 
         if self.html:
             domain = str(self.id).split("@").pop()
-            mime_message.add_alternative(self.html, subtype="html", charset=self.html_charset)
+            mime_message.add_alternative(
+                self.html,
+                subtype="html",
+                charset=self.html_charset,
+                cte=self._transfer_encoding(self.html, self.html_charset),
+            )
             html_part = mime_message.get_payload(1 if self.text else 0)
             for inline_attachment in inline_attachments:
                 main_type, sub_type = inline_attachment.mime_type_parts
@@ -1,3 +1,3 @@
-from .base import Signer
+from .base import AsyncSigner, BatchingSigner, Signer
 
-__all__ = ["Signer"]
+__all__ = ["Signer", "AsyncSigner", "BatchingSigner"]
@@ -1,8 +1,43 @@
 import abc
+import typing
 from email.message import EmailMessage
 
+from mailers.batching import Batcher
+
 
 class Signer(abc.ABC):  # pragma: no cover
     @abc.abstractmethod
     def sign(self, message: EmailMessage) -> EmailMessage:
         raise NotImplementedError()
+
+
+class AsyncSigner(abc.ABC):  # pragma: no cover
+    """A signer that awaits I/O, e.g. calls a key management service or a hardware security module."""
+
+    @abc.abstractmethod
+    async def sign(self, message: EmailMessage) -> EmailMessage:
+        raise NotImplementedError()
+
+
+class BatchingSigner(AsyncSigner):
+    """
+    Collects messages that are signed concurrently and signs them with one "sign_batch" call.
+
+    A batch is sent when it reaches "max_batch_size" messages or "max_delay" seconds after its first message,
+    so a remote signer can sign many messages in one round trip.
+    """
+
+    def __init__(self, max_batch_size: int = 100, max_delay: float = 0.005) -> None:
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._batcher: Batcher[EmailMessage, EmailMessage] = Batcher(
+            self.sign_batch, max_batch_size, max_delay, cancelled_message="Signing of the batch was cancelled."
+        )
+
+    @abc.abstractmethod
+    async def sign_batch(self, messages: typing.List[EmailMessage]) -> typing.List[EmailMessage]:
+        """Sign messages, return signed messages in the same order."""
+        raise NotImplementedError()  # pragma: no cover
+
+    async def sign(self, message: EmailMessage) -> EmailMessage:
+        return await self._batcher.submit(message)
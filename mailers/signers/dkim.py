@@ -1,50 +1,354 @@
+from __future__ import annotations
+
+import anyio
+import base64
+import concurrent.futures
+import glob
+import multiprocessing.context
+import os
+import re
+import time
 import typing
+from dataclasses import dataclass
 from email.message import EmailMessage
+from email.utils import getaddresses
 
 try:  # pragma: no cover
     import dkim
+    from dkim.canonicalization import CanonicalizationPolicy
+    from dkim.crypto import HASH_ALGORITHMS, UnparsableKeyError, parse_pem_private_key
 except ImportError:  # pragma: no cover
     raise ImportError(
         "Please install dkimpy (https://pypi.org/project/dkimpy/) library " "to sign messages with DKIM method."
     )
 
-from mailers.signers.base import Signer
+from mailers.signers.base import AsyncSigner, Signer
+
+_CANONICALIZATION = b"relaxed/simple"
+_HEADER_SEPARATOR_RE = re.compile(rb"\r?\n\r?\n")
+_LINE_SEPARATOR_RE = re.compile(rb"\r?\n")
+
+
+_KEY_FILE_EXTENSIONS = {".pem": "rsa-sha256", ".ed25519": "ed25519-sha256"}
+
+
+@dataclass(frozen=True)
+class DKIMKey:
+    """A parsed DKIM private key with its selector."""
+
+    selector: str
+    private_key: typing.Any
+    algorithm: str = "rsa-sha256"
+
+    @classmethod
+    def from_pem(cls, selector: str, pem: typing.Union[str, bytes]) -> DKIMKey:
+        """Load an RSA key from PEM text."""
+        try:
+            private_key = parse_pem_private_key(pem.encode() if isinstance(pem, str) else pem)
+        except UnparsableKeyError as ex:
+            raise dkim.KeyFormatError(str(ex)) from ex
+        return cls(selector=selector, private_key=private_key)
+
+    @classmethod
+    def from_ed25519(cls, selector: str, private_key: typing.Union[str, bytes]) -> DKIMKey:
+        """Load an Ed25519 key (RFC 8463) from a base64 encoded seed, as generated by "dknewkey --ktype ed25519"."""
+        try:
+            import nacl.encoding
+            import nacl.exceptions
+            import nacl.signing
+        except ImportError:  # pragma: no cover
+            raise ImportError(
+                "Please install pynacl (https://pypi.org/project/PyNaCl/) library to sign messages with Ed25519 keys."
+            )
+
+        try:
+            signing_key = nacl.signing.SigningKey(
+                private_key.strip().encode() if isinstance(private_key, str) else private_key.strip(),
+                encoder=nacl.encoding.Base64Encoder,
+            )
+        except (nacl.exceptions.ValueError, nacl.exceptions.TypeError, ValueError) as ex:
+            raise dkim.KeyFormatError("Invalid Ed25519 private key.") from ex
+        return cls(selector=selector, private_key=signing_key, algorithm="ed25519-sha256")
+
+    @classmethod
+    def from_file(cls, selector: str, path: str, algorithm: str = "rsa-sha256") -> DKIMKey:
+        with open(path, "rb") as f:
+            if algorithm == "ed25519-sha256":
+                return cls.from_ed25519(selector, f.read())
+            return cls.from_pem(selector, f.read())
+
+
+KeySource = typing.Union[DKIMKey, typing.Tuple[str, typing.Union[str, bytes]]]
+
+
+class DKIMKeyRegistry:
+    """
+    Maps sender domains to DKIM keys.
+
+    Keys are given as a mapping of domain to a DKIMKey, an RSA (selector, PEM text) tuple or a list of them,
+    or read from "<directory>/<domain>/<selector>.pem" (RSA) and "<directory>/<domain>/<selector>.ed25519" files.
+    When "selector" is not set, the domain directory may contain one key file of each type.
+    A message is signed with every key of its domain, e.g. with both RSA and Ed25519 keys.
+
+    Keys are parsed on first use and cached along with misses,
+    so files added after the first lookup of a domain are not seen.
+    Keys of a parent domain are used for subdomains that have no own keys.
+    """
+
+    def __init__(
+        self,
+        keys: typing.Optional[typing.Mapping[str, typing.Union[KeySource, typing.List[KeySource]]]] = None,
+        directory: typing.Optional[str] = None,
+        selector: typing.Optional[str] = None,
+    ) -> None:
+        self.directory = directory
+        self.selector = selector
+        self._sources = {domain.lower(): source for domain, source in (keys or {}).items()}
+        self._keys: typing.Dict[str, typing.List[DKIMKey]] = {}
+
+    def get(self, domain: str) -> typing.Optional[typing.Tuple[str, typing.List[DKIMKey]]]:
+        """Return a signing domain and its keys for the sender domain."""
+        labels = domain.lower().rstrip(".").split(".")
+        for index in range(max(len(labels) - 1, 1)):
+            candidate = ".".join(labels[index:])
+            if candidate not in self._keys:
+                self._keys[candidate] = self._load(candidate)
+            keys = self._keys[candidate]
+            if keys:
+                return candidate, keys
+        return None
+
+    def _load(self, domain: str) -> typing.List[DKIMKey]:
+        source = self._sources.get(domain)
+        if source is not None:
+            sources = source if isinstance(source, list) else [source]
+            return [item if isinstance(item, DKIMKey) else DKIMKey.from_pem(*item) for item in sources]
+
+        if not self.directory:
+            return []
+
+        domain_directory = os.path.join(self.directory, domain)
+        keys = []
+        for extension, algorithm in _KEY_FILE_EXTENSIONS.items():
+            paths = glob.glob(os.path.join(glob.escape(domain_directory), (self.selector or "*") + extension))
+            if len(paths) > 1:
+                raise ValueError(f'Directory "{domain_directory}" contains several keys, set selector explicitly.')
+            for path in paths:
+                selector = os.path.splitext(os.path.basename(path))[0]
+                keys.append(DKIMKey.from_file(selector, path, algorithm))
+        return keys
+
+
+def _split_message(data: bytes) -> typing.Tuple[bytes, bytes]:
+    """Split serialized message into a header block and a body with CRLF line endings."""
+    match = _HEADER_SEPARATOR_RE.search(data)
+    if not match:
+        return data, b""
+
+    # email generators use one line separator for the whole message,
+    # so only messages not separated by CRLF need normalization
+    body = data[match.end() :]
+    if match.group(0) != b"\r\n\r\n":
+        body = _LINE_SEPARATOR_RE.sub(b"\r\n", body)
+    return data[: match.start()] + b"\r\n", body
+
+
+def _get_sender_domain(message: EmailMessage) -> str:
+    addresses = getaddresses([str(message["From"] or message["Sender"] or "")])
+    return addresses[0][1].rpartition("@")[2] if addresses else ""
 
 
 class DKIMSigner(Signer):
+    """
+    Sign messages with DKIM.
+
+    The key is selected by the domain of the From header using the "keys" registry,
+    the key given by "private_key" or "private_key_path" is used for all other domains.
+    Messages from domains without a key are not signed.
+    """
+
     def __init__(
         self,
-        selector: str,
+        selector: typing.Optional[str] = None,
         private_key: typing.Optional[str] = None,
         private_key_path: typing.Optional[str] = None,
         headers: typing.Optional[typing.Iterable[str]] = None,
+        keys: typing.Union[
+            DKIMKeyRegistry, typing.Mapping[str, typing.Union[KeySource, typing.List[KeySource]]], None
+        ] = None,
     ) -> None:
-        assert private_key or private_key_path, 'Either "dkim_key" or "dkim_key_path" must be passed.'
+        assert private_key or private_key_path or keys, "Either a private key or a key registry is required."
+        assert selector or not (private_key or private_key_path), '"selector" is required for the default key.'
         self.dkim_selector = selector
         self.dkim_key = private_key
         self.dkim_key_path = private_key_path
-        self.headers = headers or ["From", "To", "Subject"]
+        self.headers = list(headers or ["From", "To", "Subject"])
+        self.keys = keys if isinstance(keys, DKIMKeyRegistry) else DKIMKeyRegistry(keys)
+        self._default_key: typing.Optional[DKIMKey] = None
 
-    def sign(self, message: EmailMessage) -> EmailMessage:
-        key = self.dkim_key or ""
-        if self.dkim_key_path:
-            # we read file once and then cache in this instance
+    @property
+    def default_key(self) -> typing.Optional[DKIMKey]:
+        if self._default_key is None and self.dkim_selector:
+            # the key file is read and parsed once and then cached in this instance
             # so it shouldn't bottleneck the flow.
             # this is intentional, to avoid marking this method async
             # if it doesn't work for you then pass key using "private_key" argument.
-            with open(self.dkim_key_path, "r") as f:
-                key = f.read()
-                self.dkim_key = key  # cache
-
-        from_address = message["From"]
-        sender_domain = from_address.split("@")[-1]
-
-        signature = dkim.sign(
-            message=message.as_bytes(),
-            selector=self.dkim_selector.encode(),
-            domain=sender_domain.encode(),
-            privkey=key.encode(),
-            include_headers=self.headers,
-        )
-        message.add_header("DKIM-Signature", signature[len("DKIM-Signature: ") :].decode().replace("\r\n", " "))
+            if self.dkim_key:
+                self._default_key = DKIMKey.from_pem(self.dkim_selector, self.dkim_key)
+            elif self.dkim_key_path:
+                self._default_key = DKIMKey.from_file(self.dkim_selector, self.dkim_key_path)
+        return self._default_key
+
+    def sign(self, message: EmailMessage) -> EmailMessage:
+        for value in self.get_signature_headers(message.as_bytes(), _get_sender_domain(message)):
+            message.add_header("DKIM-Signature", value)
+        return message
+
+    def get_signature_headers(self, data: bytes, sender_domain: str) -> typing.List[str]:
+        """Return DKIM-Signature header values for the serialized message, none if the domain has no keys."""
+        found = self.keys.get(sender_domain) if sender_domain else None
+        if found:
+            domain, keys = found
+        elif self.default_key:
+            domain, keys = sender_domain, [self.default_key]
+        else:
+            return []
+
+        return [
+            signature[len("DKIM-Signature: ") :].decode().replace("\r\n", " ")
+            for signature in self.create_signatures(data, domain, keys)
+        ]
+
+    def create_signature(self, data: bytes, domain: str, key: DKIMKey) -> bytes:
+        """Create DKIM-Signature header line for the serialized message using an already parsed key."""
+        return self.create_signatures(data, domain, [key])[0]
+
+    def create_signatures(self, data: bytes, domain: str, keys: typing.Sequence[DKIMKey]) -> typing.List[bytes]:
+        """
+        Create DKIM-Signature header lines for the serialized message, one per key.
+
+        Only the header block is handed to dkimpy, the body is hashed directly.
+        This avoids splitting the whole message into lines, which dominates signing time of large messages.
+        The message is parsed and its body canonicalized once for all keys.
+        """
+        header_block, body = _split_message(data)
+        signer = dkim.DKIM(header_block)
+        canon_policy = CanonicalizationPolicy.from_c_value(_CANONICALIZATION)
+        include_headers = tuple(header.lower().encode() for header in self.headers)
+        if b"from" not in include_headers:
+            raise dkim.ParameterError("The From header field MUST be signed")
+
+        canonical_body = canon_policy.canonicalize_body(body)
+        body_hashes: typing.Dict[bytes, bytes] = {}
+        signatures = []
+        for key in keys:
+            algorithm = key.algorithm.encode()
+            signer.signature_algorithm = algorithm
+            signer.hasher = HASH_ALGORITHMS[algorithm]
+            if algorithm not in body_hashes:
+                body_hashes[algorithm] = base64.b64encode(signer.hasher(canonical_body).digest())
+
+            fields = [
+                (b"v", b"1"),
+                (b"a", algorithm),
+                (b"c", canon_policy.to_c_value()),
+                (b"d", domain.encode()),
+                (b"i", b"@" + domain.encode()),
+                (b"q", b"dns/txt"),
+                (b"s", key.selector.encode()),
+                (b"t", str(int(time.time())).encode()),
+                (b"h", b" : ".join(include_headers)),
+                (b"bh", body_hashes[algorithm]),
+                # force b= to fold onto its own line, see dkim.DKIM.sign
+                (b"b", b"0" * 60),
+            ]
+            header = signer.gen_header(fields, include_headers, canon_policy, b"DKIM-Signature", key.private_key)
+            signatures.append(b"DKIM-Signature: " + header)
+        return signatures
+
+
+_worker_signer: typing.Optional[DKIMSigner] = None
+
+
+def _init_worker(signer: DKIMSigner) -> None:
+    global _worker_signer
+    _worker_signer = signer
+    _ = signer.default_key  # parse the default key once per worker
+
+
+def _sign_in_worker(data: bytes, sender_domain: str) -> typing.List[str]:
+    assert _worker_signer, "Signing worker is not initialized."
+    return _worker_signer.get_signature_headers(data, sender_domain)
+
+
+def _wait_for_future(future: concurrent.futures.Future) -> None:
+    try:
+        future.exception()
+    except concurrent.futures.CancelledError:
+        pass
+
+
+class ProcessPoolDKIMSigner(AsyncSigner):
+    """
+    Sign messages with DKIM in a pool of worker processes.
+
+    RSA signing is CPU bound, so signing on the event loop limits a sender process to one core.
+    The wrapped signer is sent to every worker once, where it parses and caches its keys,
+    then only serialized messages go to the workers and signature header values come back.
+    Results are awaited in threads limited to "max_workers", separate from the default thread pool,
+    and messages still queued for the pool are not signed when the caller is cancelled.
+    The pool is started on the first message, call "shutdown" to stop it.
+    """
+
+    def __init__(
+        self,
+        signer: DKIMSigner,
+        max_workers: typing.Optional[int] = None,
+        mp_context: typing.Optional[multiprocessing.context.BaseContext] = None,
+    ) -> None:
+        self.signer = signer
+        self.max_workers = max_workers
+        self.mp_context = mp_context
+        self._executor: typing.Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._limiter: typing.Optional[anyio.CapacityLimiter] = None
+
+    @property
+    def executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=self.mp_context,
+                initializer=_init_worker,
+                initargs=(self.signer,),
+            )
+        return self._executor
+
+    async def sign(self, message: EmailMessage) -> EmailMessage:
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self.max_workers or os.cpu_count() or 1)
+        limiter = self._limiter
+        future = self.executor.submit(_sign_in_worker, message.as_bytes(), _get_sender_domain(message))
+        done = anyio.Event()
+
+        async def _wait() -> None:
+            # wait in a worker thread, so waiting does not depend on the event loop implementation
+            await anyio.to_thread.run_sync(_wait_for_future, future, limiter=limiter)
+            done.set()
+
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(_wait)
+            try:
+                await done.wait()
+            except BaseException:
+                # a cancelled future wakes the waiting thread, a running one is waited for until signed
+                future.cancel()
+                raise
+
+        for value in future.result():
+            message.add_header("DKIM-Signature", value)
         return message
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
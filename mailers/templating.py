@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import re
+import typing
+
+try:  # pragma: no cover
+    import jinja2
+except ImportError:  # pragma: no cover
+    raise ImportError("Please install jinja2 (https://pypi.org/project/Jinja2/) library to use email templates.")
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    import css_inline
+
+_PLACEHOLDER_RE = re.compile(r"<!--mailers-jinja:(\d+)-->")
+_DOCUMENT_RE = re.compile(r"<html[\s>]", flags=re.IGNORECASE)
+
+
+def _jinja_syntax_re(environment: jinja2.Environment) -> typing.Pattern[str]:
+    delimiters = [
+        (environment.block_start_string, environment.block_end_string),
+        (environment.variable_start_string, environment.variable_end_string),
+        (environment.comment_start_string, environment.comment_end_string),
+    ]
+    return re.compile(
+        "|".join(f"{re.escape(start)}.*?{re.escape(end)}" for start, end in delimiters),
+        flags=re.DOTALL,
+    )
+
+
+def inline_css_in_template_source(
+    source: str,
+    environment: jinja2.Environment,
+    inliner: typing.Optional["css_inline.CSSInliner"] = None,
+) -> str:
+    """
+    Inline CSS into the source of a Jinja HTML template.
+
+    Jinja tags are replaced with HTML comments before inlining and restored afterwards,
+    so the HTML parser does not move or escape them (e.g. loops between table rows).
+    Sources without an <html> element, e.g. child templates and included partials, are inlined as fragments,
+    so they are not wrapped into a document of their own.
+    """
+    if inliner is None:
+        import css_inline
+
+        inliner = css_inline.CSSInliner()
+
+    tags: typing.List[str] = []
+
+    def _protect(match: typing.Match[str]) -> str:
+        tags.append(match.group(0))
+        return f"<!--mailers-jinja:{len(tags) - 1}-->"
+
+    protected = _jinja_syntax_re(environment).sub(_protect, source)
+    if _DOCUMENT_RE.search(protected):
+        inlined = inliner.inline(protected)
+    else:
+        inlined = inliner.inline_fragment(protected, "")
+    return _PLACEHOLDER_RE.sub(lambda match: tags[int(match.group(1))], inlined)
+
+
+class CSSInliningLoader(jinja2.BaseLoader):
+    """
+    Wrap a Jinja loader and inline CSS into HTML template sources when they are loaded.
+
+    Templates are processed once per compilation, so rendering does not pay for inlining.
+    Only templates with matching extensions and a <style> element are processed,
+    layouts should therefore carry their styles themselves.
+    Fragments are parsed as body content, table rows without their <table> should not carry <style> elements.
+    Reloading is governed by the wrapped loader and the environment's "auto_reload" setting.
+    """
+
+    def __init__(
+        self,
+        loader: jinja2.BaseLoader,
+        extensions: typing.Iterable[str] = (".html", ".htm"),
+        inliner: typing.Optional["css_inline.CSSInliner"] = None,
+    ) -> None:
+        self.loader = loader
+        self.extensions = tuple(extensions)
+        self.inliner = inliner
+
+    def get_source(
+        self, environment: jinja2.Environment, template: str
+    ) -> typing.Tuple[str, typing.Optional[str], typing.Optional[typing.Callable[[], bool]]]:
+        source, filename, uptodate = self.loader.get_source(environment, template)
+        if template.endswith(self.extensions) and "<style" in source.lower():
+            source = inline_css_in_template_source(source, environment, self.inliner)
+        return source, filename, uptodate
+
+    def list_templates(self) -> typing.List[str]:
+        return self.loader.list_templates()
@@ -1,17 +1,26 @@
+from .archive import ArchiveTransport
 from .base import Transport
 from .console import ConsoleTransport
 from .file import FileTransport
+from .local import LMTPTransport, SendmailTransport
+from .maildir import MaildirTransport
 from .memory import InMemoryTransport
 from .multi import MultiTransport
 from .null import NullTransport
+from .routing import RoutingTransport
 from .stream import StreamTransport
 
 __all__ = [
+    "ArchiveTransport",
     "Transport",
     "ConsoleTransport",
     "FileTransport",
+    "MaildirTransport",
+    "LMTPTransport",
+    "SendmailTransport",
     "InMemoryTransport",
     "StreamTransport",
     "NullTransport",
     "MultiTransport",
+    "RoutingTransport",
 ]
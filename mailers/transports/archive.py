@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import anyio
+import anyio.abc
+import email
+import email.policy
+import email.utils
+import glob
+import os
+import time
+import typing
+import zlib
+from email.message import EmailMessage, Message
+
+from mailers.transports.base import Transport
+
+_DATA_EXTENSION = ".log"
+_COMPRESSED_DATA_EXTENSION = ".log.zlib"
+_INDEX_EXTENSION = ".idx"
+
+
+class _Location(typing.NamedTuple):
+    path: str
+    offset: int
+    length: int
+    compressed: bool
+
+
+def _get_message_id(message: Message) -> str:
+    return str(message.get("Message-ID") or "").strip() or email.utils.make_msgid()
+
+
+def _parse_message(data: bytes) -> EmailMessage:
+    return typing.cast(EmailMessage, email.message_from_bytes(data, _class=EmailMessage, policy=email.policy.default))
+
+
+def _read_location(location: _Location) -> bytes:
+    with open(location.path, "rb") as f:
+        f.seek(location.offset)
+        data = f.read(location.length)
+    return zlib.decompress(data) if location.compressed else data
+
+
+class ArchiveReader:
+    """
+    Read messages written by ArchiveTransport.
+
+    Index files of all segments are loaded on first lookup into a mapping of Message-ID to a location in a segment,
+    so a message is fetched with one seek and read. Call "refresh" to see messages archived later by other processes.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self._index: typing.Optional[typing.Dict[str, _Location]] = None
+
+    @property
+    def index(self) -> typing.Dict[str, _Location]:
+        if self._index is None:
+            self._index = {}
+            for index_path in sorted(glob.glob(os.path.join(glob.escape(self.directory), "*" + _INDEX_EXTENSION))):
+                self._load_index(index_path)
+        return self._index
+
+    def refresh(self) -> None:
+        self._index = None
+
+    def get_bytes(self, message_id: str) -> typing.Optional[bytes]:
+        location = self.index.get(message_id)
+        return _read_location(location) if location is not None else None
+
+    def get(self, message_id: str) -> typing.Optional[EmailMessage]:
+        data = self.get_bytes(message_id)
+        return _parse_message(data) if data is not None else None
+
+    def add(self, message_id: str, location: _Location) -> None:
+        self.index[message_id] = location
+
+    def __contains__(self, message_id: object) -> bool:
+        return message_id in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _load_index(self, index_path: str) -> None:
+        assert self._index is not None
+        base_path = index_path[: -len(_INDEX_EXTENSION)]
+        compressed = os.path.exists(base_path + _COMPRESSED_DATA_EXTENSION)
+        data_path = base_path + (_COMPRESSED_DATA_EXTENSION if compressed else _DATA_EXTENSION)
+        with open(index_path, "r") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # partially written entry
+                message_id, offset, length = line.rstrip("\n").rsplit("\t", 2)
+                self._index[message_id] = _Location(data_path, int(offset), int(length), compressed)
+
+
+class ArchiveTransport(Transport):
+    """
+    Append messages to rotating segment files for archiving.
+
+    Messages are written back to back into "<directory>/<number>.log" segments,
+    and "<number>.idx" files next to them map every Message-ID to an offset and length in the segment.
+    A new segment is started when the current one exceeds "max_segment_size" bytes or "max_segment_age" seconds,
+    and on every start of the transport. With "compress" enabled, every message is compressed with zlib separately,
+    so it still can be read without decompressing the whole segment.
+
+    Messages are buffered in memory and written in a worker thread once "buffer_size" bytes are collected
+    or the oldest buffered message is older than "flush_interval" seconds. Inside "async with transport"
+    the buffer is also flushed every "flush_interval" seconds without new messages and on exit,
+    otherwise call "flush" to write the rest.
+    Use "get_message" or "ArchiveReader" to fetch archived messages by Message-ID.
+    The transport remembers locations of messages it has written, indexes of other segments are loaded
+    in a worker thread by the first "get_message" call that needs them.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_segment_size: int = 64 * 1024 * 1024,
+        max_segment_age: typing.Optional[float] = None,
+        compress: bool = False,
+        buffer_size: int = 1024 * 1024,
+        flush_interval: typing.Optional[float] = 1.0,
+    ) -> None:
+        if not directory:
+            raise ValueError('Argument "directory" of ArchiveTransport cannot be empty.')
+        assert max_segment_size > 0, "Segment size must be a positive number."
+
+        self.directory = directory
+        self.max_segment_size = max_segment_size
+        self.max_segment_age = max_segment_age
+        self.compress = compress
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.reader = ArchiveReader(directory)
+        self._buffer: typing.List[typing.Tuple[str, bytes]] = []
+        self._buffered_size = 0
+        self._buffered_at = 0.0
+        self._task_group: typing.Optional[anyio.abc.TaskGroup] = None
+        self._pending: typing.Dict[str, bytes] = {}
+        self._written: typing.Dict[str, _Location] = {}
+        self._lock = anyio.Lock()
+        self._segment_number: typing.Optional[int] = None
+        self._segment_size = 0
+        self._segment_started_at = 0.0
+
+    async def send(self, message: Message) -> None:
+        message_id = _get_message_id(message)
+        data = message.as_bytes()
+        if not self._buffer:
+            self._buffered_at = time.monotonic()
+        self._buffer.append((message_id, data))
+        self._buffered_size += len(data)
+        self._pending[message_id] = data
+        if self._buffered_size >= self.buffer_size or self._is_buffer_expired():
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write buffered messages to the archive."""
+        async with self._lock:
+            records, self._buffer, self._buffered_size = self._buffer, [], 0
+            if not records:
+                return
+
+            locations = await anyio.to_thread.run_sync(self._write, records)
+            for (message_id, data), location in zip(records, locations):
+                self._written[message_id] = location
+                if self._pending.get(message_id) is data:
+                    del self._pending[message_id]
+
+    async def get_message(self, message_id: str) -> typing.Optional[EmailMessage]:
+        """Fetch an archived message, including not yet written ones."""
+        data = self._pending.get(message_id)
+        if data is not None:
+            return _parse_message(data)
+        location = self._written.get(message_id)
+        if location is not None:
+            return _parse_message(await anyio.to_thread.run_sync(_read_location, location))
+        return await anyio.to_thread.run_sync(self.reader.get, message_id)
+
+    async def __aenter__(self) -> ArchiveTransport:
+        if self.flush_interval:
+            task_group = anyio.create_task_group()
+            await task_group.__aenter__()
+            task_group.start_soon(self._flush_periodically, self.flush_interval)
+            self._task_group = task_group
+        return self
+
+    async def __aexit__(self, *args: typing.Any) -> None:
+        task_group, self._task_group = self._task_group, None
+        if task_group:
+            task_group.cancel_scope.cancel()
+            await task_group.__aexit__(None, None, None)
+        await self.flush()
+
+    async def _flush_periodically(self, interval: float) -> None:
+        while True:
+            await anyio.sleep(interval)
+            if self._is_buffer_expired():
+                await self.flush()
+
+    def _is_buffer_expired(self) -> bool:
+        return bool(
+            self._buffer and self.flush_interval and time.monotonic() - self._buffered_at >= self.flush_interval
+        )
+
+    def _write(self, records: typing.List[typing.Tuple[str, bytes]]) -> typing.List[_Location]:
+        locations: typing.List[_Location] = []
+        data_file: typing.Optional[typing.BinaryIO] = None
+        index_lines: typing.List[str] = []
+
+        def _close_segment() -> None:
+            assert data_file
+            # index entries are written after the data, so they never point to missing messages
+            data_file.close()
+            with open(self._get_segment_path() + _INDEX_EXTENSION, "a") as index_file:
+                index_file.writelines(index_lines)
+            index_lines.clear()
+
+        try:
+            for message_id, data in records:
+                if self._should_rotate():
+                    if data_file:
+                        _close_segment()
+                        data_file = None
+                    self._start_segment()
+                if data_file is None:
+                    extension = _COMPRESSED_DATA_EXTENSION if self.compress else _DATA_EXTENSION
+                    data_file = typing.cast(typing.BinaryIO, open(self._get_segment_path() + extension, "ab"))
+
+                payload = zlib.compress(data) if self.compress else data
+                # the file may already contain data written before a crash that has no index entries
+                offset = data_file.tell()
+                data_file.write(payload)
+                locations.append(_Location(data_file.name, offset, len(payload), self.compress))
+                index_lines.append(f"{message_id}\t{offset}\t{len(payload)}\n")
+                self._segment_size = offset + len(payload)
+        finally:
+            if data_file:
+                _close_segment()
+        return locations
+
+    def _should_rotate(self) -> bool:
+        if self._segment_number is None or self._segment_size >= self.max_segment_size:
+            return True
+        return bool(self.max_segment_age and time.time() - self._segment_started_at >= self.max_segment_age)
+
+    def _start_segment(self) -> None:
+        if self._segment_number is None:
+            os.makedirs(self.directory, exist_ok=True)
+            # data files count too, a crash may leave a segment without an index
+            numbers = [
+                int(os.path.basename(path).split(".", 1)[0])
+                for extension in [_INDEX_EXTENSION, _DATA_EXTENSION, _COMPRESSED_DATA_EXTENSION]
+                for path in glob.glob(os.path.join(glob.escape(self.directory), "*" + extension))
+            ]
+            self._segment_number = max(numbers, default=0)
+
+        self._segment_number += 1
+        self._segment_size = 0
+        self._segment_started_at = time.time()
+
+    def _get_segment_path(self) -> str:
+        return os.path.join(self.directory, f"{self._segment_number:08d}")
@@ -1,10 +1,55 @@
 from __future__ import annotations
 
 import abc
+import functools
+import inspect
+import typing
 from email.message import EmailMessage
 
+from mailers.exceptions import MailersError
+from mailers.message import Envelope
+
 
 class Transport(abc.ABC):  # pragma: nocover
+    """
+    Transports deliver messages.
+
+    Transports that can deliver a message to other addresses than its headers specify
+    accept an optional "envelope" argument: "async def send(self, message, envelope=None)".
+    When the envelope is given, the message is sent from its sender to its recipients.
+    """
+
     @abc.abstractmethod
     async def send(self, message: EmailMessage) -> None:
         raise NotImplementedError()
+
+
+@functools.lru_cache(maxsize=None)
+def _function_accepts_envelope(function: typing.Callable) -> bool:
+    parameters = inspect.signature(function).parameters.values()
+    return any(parameter.name == "envelope" or parameter.kind == parameter.VAR_KEYWORD for parameter in parameters)
+
+
+def accepts_envelope(transport: Transport) -> bool:
+    """Test if the transport accepts the "envelope" argument, transports written before it was added do not."""
+    send = transport.send
+    function = getattr(send, "__func__", None)
+    return _function_accepts_envelope(function) if function else _function_accepts_envelope.__wrapped__(send)
+
+
+async def send_with_envelope(
+    transport: Transport, message: EmailMessage, envelope: typing.Optional[Envelope] = None
+) -> None:
+    """
+    Send the message via the transport, passing the envelope only to transports that accept it.
+
+    Other transports, e.g. file or memory ones, get the message alone if the envelope matches its headers.
+    """
+    if envelope is None:
+        await transport.send(message)
+    elif accepts_envelope(transport):
+        await typing.cast(typing.Any, transport).send(message, envelope)
+    elif envelope == Envelope.from_message(message):
+        await transport.send(message)
+    else:
+        raise MailersError(f"{type(transport).__name__} does not support envelopes, add 'envelope' argument to 'send'.")
@@ -5,11 +5,16 @@ from mailers.transports.stream import StreamTransport
 
 
 class ConsoleTransport(StreamTransport):
-    def __init__(self, stream: typing.Literal["stdout", "stderr"] = "stderr") -> None:
+    def __init__(
+        self,
+        stream: typing.Literal["stdout", "stderr"] = "stderr",
+        buffered: bool = False,
+        max_buffer_size: int = 1024 * 1024,
+    ) -> None:
         assert stream in ["stdout", "stderr"], "Unsupported console stream type: %s." % stream
         output = None
         if stream == "stderr":
             output = sys.stderr
         elif stream == "stdout":
             output = sys.stdout
-        super().__init__(output)
+        super().__init__(output, buffered=buffered, max_buffer_size=max_buffer_size)
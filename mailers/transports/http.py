@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import abc
+import base64
+import typing
+from email.message import EmailMessage, Message
+from email.utils import getaddresses
+
+try:  # pragma: no cover
+    import httpx
+except ImportError:  # pragma: no cover
+    raise ImportError("Please install httpx (https://pypi.org/project/httpx/) library to send messages via HTTP API.")
+
+from mailers.batching import Batcher
+from mailers.exceptions import DeliveryError
+from mailers.message import Envelope, clone_message
+from mailers.transports.base import Transport
+
+
+def _get_addresses(message: Message, *names: str) -> typing.List[str]:
+    headers = [str(value) for name in names for value in message.get_all(name, [])]
+    return [address for _, address in getaddresses(headers) if address]
+
+
+class PayloadAdapter(abc.ABC):
+    """
+    Converts messages into a JSON request body of an email API and checks its response.
+
+    Set "max_batch_size" to the number of messages the API accepts in one request.
+    """
+
+    max_batch_size: int = 1
+
+    @abc.abstractmethod
+    def build_payload(
+        self, messages: typing.List[Message], envelopes: typing.List[Envelope]
+    ) -> typing.Any:  # pragma: no cover
+        raise NotImplementedError()
+
+    def check_response(self, response: httpx.Response, messages: typing.List[Message]) -> None:
+        """Raise if the API has not accepted the messages."""
+        if response.is_error:
+            raise DeliveryError(f"Email API responded with {response.status_code}: {response.text[:200]}")
+
+
+class JSONPayloadAdapter(PayloadAdapter):
+    """
+    Sends messages as JSON objects with "from", "return_path" (the envelope sender), "to", "cc", "bcc", "subject",
+    "text", "html", "headers" and "attachments" (base64 encoded) fields. Batches are sent as {"messages": [...]}.
+
+    APIs deliver messages to all "to", "cc" and "bcc" addresses, so these fields list only envelope recipients,
+    envelope recipients missing from the headers are added to "bcc".
+    """
+
+    def __init__(self, max_batch_size: int = 1) -> None:
+        self.max_batch_size = max_batch_size
+
+    def build_payload(self, messages: typing.List[Message], envelopes: typing.List[Envelope]) -> typing.Any:
+        if self.max_batch_size == 1:
+            return self.serialize_message(messages[0], envelopes[0])
+        return {
+            "messages": [self.serialize_message(message, envelope) for message, envelope in zip(messages, envelopes)]
+        }
+
+    def serialize_message(
+        self, message: Message, envelope: typing.Optional[Envelope] = None
+    ) -> typing.Dict[str, typing.Any]:
+        assert isinstance(message, EmailMessage), "JSON payload requires email.message.EmailMessage instances."
+        envelope = envelope or Envelope.from_message(message)
+        recipients = self.get_recipients(message, envelope)
+        text_part = message.get_body(("plain",))
+        html_part = message.get_body(("html",))
+        address_headers = {"from", "to", "cc", "bcc", "subject"}
+        return {
+            "from": _get_addresses(message, "From")[0] if message.get("From") else None,
+            "return_path": envelope.sender,
+            "to": recipients["To"],
+            "cc": recipients["Cc"],
+            "bcc": recipients["Bcc"],
+            "subject": str(message.get("Subject", "")),
+            "text": typing.cast(EmailMessage, text_part).get_content() if text_part else None,
+            "html": typing.cast(EmailMessage, html_part).get_content() if html_part else None,
+            "headers": {
+                name: str(value)
+                for name, value in message.items()
+                if name.lower() not in address_headers and not name.lower().startswith(("content-", "mime-"))
+            },
+            "attachments": [
+                {
+                    "filename": part.get_filename(),
+                    "content_type": part.get_content_type(),
+                    "inline": part.get_content_disposition() == "inline",
+                    "content_id": part.get("Content-ID"),
+                    "content": base64.b64encode(typing.cast(bytes, part.get_payload(decode=True) or b"")).decode(),
+                }
+                for part in message.iter_attachments()
+            ],
+        }
+
+    def get_recipients(self, message: Message, envelope: Envelope) -> typing.Dict[str, typing.List[str]]:
+        """Split envelope recipients into "To", "Cc" and "Bcc" lists as they appear in the message headers."""
+        remaining = {recipient.lower(): recipient for recipient in envelope.recipients}
+        recipients: typing.Dict[str, typing.List[str]] = {}
+        for name in ["To", "Cc", "Bcc"]:
+            recipients[name] = [
+                address for address in _get_addresses(message, name) if remaining.pop(address.lower(), None)
+            ]
+        recipients["Bcc"].extend(remaining.values())
+        return recipients
+
+
+class RawPayloadAdapter(PayloadAdapter):
+    """
+    Sends messages as base64 encoded MIME documents without Bcc header with the envelope:
+    {"raw": "...", "sender": "...", "recipients": [...]}. Batches are sent as {"messages": [...]}.
+    """
+
+    def __init__(self, max_batch_size: int = 1) -> None:
+        self.max_batch_size = max_batch_size
+
+    def build_payload(self, messages: typing.List[Message], envelopes: typing.List[Envelope]) -> typing.Any:
+        payloads = [
+            {"raw": self.serialize_message(message), "sender": envelope.sender, "recipients": envelope.recipients}
+            for message, envelope in zip(messages, envelopes)
+        ]
+        return payloads[0] if self.max_batch_size == 1 else {"messages": payloads}
+
+    def serialize_message(self, message: Message) -> str:
+        """Encode the message without Bcc header, envelope recipients receive the message instead."""
+        message = clone_message(message)
+        del message["Bcc"]
+        return base64.b64encode(message.as_bytes()).decode()
+
+
+class HTTPTransport(Transport):
+    """
+    Send messages to an HTTP email API.
+
+    Requests go through a pooled HTTP client that keeps up to "max_connections" connections alive.
+    The adapter converts messages into the request body. When it accepts more than one message per request,
+    messages sent concurrently are collected into batches of up to "max_batch_size" messages,
+    a batch is sent "max_delay" seconds after its first message at the latest.
+    Call "aclose" or use the transport as an async context manager to close the connections.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        adapter: typing.Optional[PayloadAdapter] = None,
+        headers: typing.Optional[typing.Mapping[str, str]] = None,
+        auth: typing.Optional[typing.Tuple[str, str]] = None,
+        timeout: float = 10,
+        max_connections: int = 10,
+        max_delay: float = 0.005,
+        client: typing.Optional[httpx.AsyncClient] = None,
+    ) -> None:
+        self.url = url
+        self.adapter = adapter or JSONPayloadAdapter()
+        self.max_delay = max_delay
+        self.client = client or httpx.AsyncClient(
+            headers=headers,
+            auth=auth,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self._batcher: Batcher[typing.Tuple[Message, Envelope], None] = Batcher(
+            self._send_batch,
+            self.adapter.max_batch_size,
+            max_delay,
+            cancelled_message="Delivery of the batch was cancelled.",
+        )
+
+    async def send(self, message: Message, envelope: typing.Optional[Envelope] = None) -> None:
+        envelope = envelope or Envelope.from_message(message)
+        if self.adapter.max_batch_size == 1:
+            await self.send_batch([message], [envelope])
+            return
+
+        await self._batcher.submit((message, envelope))
+
+    async def send_batch(
+        self, messages: typing.List[Message], envelopes: typing.Optional[typing.List[Envelope]] = None
+    ) -> None:
+        """Send messages in one request."""
+        envelopes = envelopes or [Envelope.from_message(message) for message in messages]
+        response = await self.client.post(self.url, json=self.adapter.build_payload(messages, envelopes))
+        self.adapter.check_response(response, messages)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def __aenter__(self) -> HTTPTransport:
+        return self
+
+    async def __aexit__(self, *args: typing.Any) -> None:
+        await self.aclose()
+
+    async def _send_batch(self, items: typing.List[typing.Tuple[Message, Envelope]]) -> typing.List[None]:
+        await self.send_batch([message for message, _ in items], [envelope for _, envelope in items])
+        return [None] * len(items)
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import anyio
+import anyio.abc
+import re
+import socket
+import typing
+from anyio.streams.buffered import BufferedByteReceiveStream
+from email.message import Message
+
+from mailers.exceptions import DeliveryError, RecipientsRefusedError
+from mailers.message import Envelope, clone_message
+from mailers.transports.base import Transport
+
+Reply = typing.Tuple[int, str]
+
+_DOT_RE = re.compile(rb"^\.", flags=re.MULTILINE)
+_CONNECTION_ERRORS = (anyio.EndOfStream, anyio.BrokenResourceError, anyio.ClosedResourceError, OSError)
+
+
+def _serialize(message: Message) -> bytes:
+    """Serialize the message with CRLF line endings and without Bcc and envelope headers."""
+    message = clone_message(message)
+    for name in ["Bcc", "Sender", "Return-Path"]:
+        del message[name]
+    return message.as_bytes(policy=message.policy.clone(linesep="\r\n"))
+
+
+class _Session:
+    """A client side of an SMTP or LMTP session over a byte stream."""
+
+    def __init__(self, stream: anyio.abc.ByteStream, lmtp: bool) -> None:
+        self.stream = stream
+        self.lmtp = lmtp
+        self.extensions: typing.Set[str] = set()
+        self.data_sent = False
+        self._reader = BufferedByteReceiveStream(stream)
+
+    async def read_reply(self) -> Reply:
+        lines = []
+        while True:
+            line = await self._reader.receive_until(b"\r\n", 65536)
+            lines.append(line[4:].decode(errors="replace"))
+            if line[3:4] != b"-":
+                return int(line[:3]), "\n".join(lines)
+
+    async def execute(self, command: str) -> Reply:
+        await self.stream.send(command.encode() + b"\r\n")
+        return await self.read_reply()
+
+    async def start(self, hostname: str) -> None:
+        code, text = await self.read_reply()
+        if code != 220:
+            raise DeliveryError(f"Server refused the session: {code} {text}")
+
+        code, text = await self.execute(("LHLO " if self.lmtp else "EHLO ") + hostname)
+        if code != 250:
+            raise DeliveryError(f"Server refused the greeting: {code} {text}")
+        self.extensions = {line.split(" ")[0].upper() for line in text.split("\n")[1:]}
+
+    async def deliver(self, sender: str, recipients: typing.List[str], data: bytes) -> typing.Dict[str, Reply]:
+        """Send the message, return a reply for every recipient."""
+        self.data_sent = False
+        mail_command = f"MAIL FROM:<{sender}>"
+        if "8BITMIME" in self.extensions and any(byte > 127 for byte in data):
+            mail_command += " BODY=8BITMIME"
+        commands = [mail_command, *[f"RCPT TO:<{recipient}>" for recipient in recipients], "DATA"]
+
+        # LMTP servers must support pipelining
+        if self.lmtp or "PIPELINING" in self.extensions:
+            await self.stream.send("".join(command + "\r\n" for command in commands).encode())
+            replies = [await self.read_reply() for _ in commands]
+        else:
+            replies = []
+            for command in commands:
+                replies.append(await self.execute(command))
+                if replies[0][0] != 250:
+                    break
+
+        mail_reply, recipient_replies = replies[0], replies[1 : len(recipients) + 1]
+        if mail_reply[0] != 250:
+            if len(replies) == len(commands) and replies[-1][0] == 354:
+                await self._abort_data()
+            await self.execute("RSET")
+            return {recipient: mail_reply for recipient in recipients}
+
+        statuses = dict(zip(recipients, recipient_replies))
+        accepted = [recipient for recipient, reply in statuses.items() if reply[0] in (250, 251)]
+        if replies[-1][0] != 354:
+            await self.execute("RSET")
+            return statuses
+        if not accepted:
+            await self._abort_data()
+            await self.execute("RSET")
+            return statuses
+
+        if not data.endswith(b"\r\n"):
+            data += b"\r\n"
+        self.data_sent = True
+        await self.stream.send(_DOT_RE.sub(b"..", data) + b".\r\n")
+        if self.lmtp:
+            for recipient in accepted:
+                statuses[recipient] = await self.read_reply()
+        else:
+            reply = await self.read_reply()
+            statuses.update({recipient: reply for recipient in accepted})
+        return statuses
+
+    async def close(self) -> None:
+        with anyio.CancelScope(shield=True):
+            with anyio.move_on_after(1):
+                try:
+                    await self.execute("QUIT")
+                except _CONNECTION_ERRORS:
+                    pass
+            await self.stream.aclose()
+
+    async def _abort_data(self) -> None:
+        # servers that accepted DATA of a pipelined transaction without recipients expect an empty message
+        await self.stream.send(b".\r\n")
+        await self.read_reply()
+
+
+class _PersistentSessionTransport(Transport):
+    """Keeps up to "pool_size" sessions open between messages and sends messages over idle sessions."""
+
+    lmtp = False
+
+    def __init__(self, pool_size: int = 1, timeout: float = 30, local_hostname: typing.Optional[str] = None) -> None:
+        assert pool_size > 0, "Pool size must be a positive number."
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.local_hostname = local_hostname
+        self._idle: typing.List[_Session] = []
+        self._semaphore = anyio.Semaphore(pool_size)
+
+    async def connect(self) -> anyio.abc.ByteStream:  # pragma: no cover
+        raise NotImplementedError()
+
+    async def send(self, message: Message, envelope: typing.Optional[Envelope] = None) -> None:
+        statuses = await self.deliver(message, envelope)
+        if not any(code in (250, 251) for code, _ in statuses.values()):
+            raise RecipientsRefusedError("All recipients were refused.", statuses)
+
+    async def deliver(self, message: Message, envelope: typing.Optional[Envelope] = None) -> typing.Dict[str, Reply]:
+        """
+        Deliver the message and return (code, text) reply for every recipient.
+
+        Unlike "send" it does not raise when recipients are refused.
+        """
+        envelope = envelope or Envelope.from_message(message)
+        sender, recipients, data = envelope.sender, envelope.recipients, _serialize(message)
+        if not recipients:
+            raise DeliveryError("Message has no recipients.")
+
+        async with self._semaphore:
+            while self._idle:
+                # idle sessions may have been closed by the server, retry unless the message may have been accepted
+                session = self._idle.pop()
+                try:
+                    return await self._deliver(session, sender, recipients, data)
+                except _CONNECTION_ERRORS:
+                    if session.data_sent:
+                        raise
+
+            session = await self._open_session()
+            return await self._deliver(session, sender, recipients, data)
+
+    async def aclose(self) -> None:
+        """Close all idle sessions."""
+        sessions, self._idle = self._idle, []
+        for session in sessions:
+            await session.close()
+
+    async def __aenter__(self) -> _PersistentSessionTransport:
+        return self
+
+    async def __aexit__(self, *args: typing.Any) -> None:
+        await self.aclose()
+
+    async def _open_session(self) -> _Session:
+        with anyio.fail_after(self.timeout):
+            session = _Session(await self.connect(), lmtp=self.lmtp)
+            try:
+                await session.start(self.local_hostname or socket.gethostname())
+            except BaseException:
+                await session.close()
+                raise
+        return session
+
+    async def _deliver(
+        self, session: _Session, sender: str, recipients: typing.List[str], data: bytes
+    ) -> typing.Dict[str, Reply]:
+        try:
+            with anyio.fail_after(self.timeout):
+                statuses = await session.deliver(sender, recipients, data)
+        except BaseException:
+            await session.close()
+            raise
+        self._idle.append(session)
+        return statuses
+
+
+class LMTPTransport(_PersistentSessionTransport):
+    """
+    Hand messages over to a local MTA or mailbox server via LMTP.
+
+    Connects to a unix socket at "path" or to "host" and "port".
+    Sessions are kept open between messages, commands of a transaction are pipelined,
+    and the server reports delivery status for each recipient, see "deliver".
+    """
+
+    lmtp = True
+
+    def __init__(
+        self,
+        path: typing.Optional[str] = None,
+        host: typing.Optional[str] = None,
+        port: int = 24,
+        pool_size: int = 1,
+        timeout: float = 30,
+        local_hostname: typing.Optional[str] = None,
+    ) -> None:
+        assert path or host, 'Either "path" or "host" is required.'
+        super().__init__(pool_size=pool_size, timeout=timeout, local_hostname=local_hostname)
+        self.path = path
+        self.host = host
+        self.port = port
+
+    async def connect(self) -> anyio.abc.ByteStream:
+        if self.path:
+            return await anyio.connect_unix(self.path)
+        assert self.host
+        return await anyio.connect_tcp(self.host, self.port)
+
+
+class _ProcessStream(anyio.abc.ByteStream):
+    def __init__(self, process: anyio.abc.Process) -> None:
+        assert process.stdin and process.stdout
+        self.process = process
+        self.stdin = process.stdin
+        self.stdout = process.stdout
+
+    async def receive(self, max_bytes: int = 65536) -> bytes:
+        return await self.stdout.receive(max_bytes)
+
+    async def send(self, item: bytes) -> None:
+        await self.stdin.send(item)
+
+    async def send_eof(self) -> None:
+        await self.stdin.aclose()
+
+    async def aclose(self) -> None:
+        with anyio.CancelScope(shield=True):
+            await self.stdin.aclose()
+            with anyio.move_on_after(1):
+                await self.process.wait()
+            if self.process.returncode is None:
+                self.process.kill()
+            await self.process.aclose()
+
+
+class SendmailTransport(_PersistentSessionTransport):
+    """
+    Hand messages over to the local MTA via "sendmail -bs", which speaks SMTP over stdin and stdout.
+
+    Up to "pool_size" sendmail processes are kept running and reused for subsequent messages.
+    """
+
+    def __init__(
+        self,
+        command: typing.Sequence[str] = ("/usr/sbin/sendmail", "-bs"),
+        pool_size: int = 1,
+        timeout: float = 30,
+        local_hostname: typing.Optional[str] = None,
+    ) -> None:
+        super().__init__(pool_size=pool_size, timeout=timeout, local_hostname=local_hostname)
+        self.command = list(command)
+
+    async def connect(self) -> anyio.abc.ByteStream:
+        return _ProcessStream(await anyio.open_process(self.command))
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import anyio
+import hashlib
+import itertools
+import os
+import socket
+import time
+import typing
+from email.message import Message
+
+from mailers.batching import Batcher
+from mailers.transports.base import Transport
+
+_counter = itertools.count()
+
+
+def _create_unique_name() -> str:
+    """Create a file name that is unique across processes and hosts, as described by the Maildir specification."""
+    now = time.time()
+    hostname = socket.gethostname().replace("/", r"\057").replace(":", r"\072")
+    return f"{int(now)}.M{int(now % 1 * 1_000_000)}P{os.getpid()}Q{next(_counter)}.{hostname}"
+
+
+def _fsync_directory(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _Delivery(typing.NamedTuple):
+    maildir: str
+    name: str
+    data: bytes
+
+
+class MaildirTransport(Transport):
+    """
+    Deliver messages into a Maildir.
+
+    A message is written into "tmp" under a unique name and then renamed into "new",
+    so readers never see partially written files.
+    With "shard_levels" set, messages are spread over nested subdirectories named after their hash,
+    two hex digits per level (e.g. "directory/3f/a1/new/..."), each of them being a Maildir itself.
+    With "fsync" enabled, files and "new" directories are flushed to disk before "send" returns.
+    Messages sent concurrently are then written and flushed together in one worker thread call,
+    with one directory flush per batch, see "max_batch_size" and "max_delay".
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        shard_levels: int = 0,
+        fsync: bool = False,
+        max_batch_size: int = 100,
+        max_delay: float = 0.002,
+    ) -> None:
+        if not directory:
+            raise ValueError('Argument "directory" of MaildirTransport cannot be empty.')
+        assert 0 <= shard_levels <= 20, "Shard levels must be between 0 and 20."
+
+        self.directory = directory
+        self.shard_levels = shard_levels
+        self.fsync = fsync
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._maildirs: typing.Set[str] = set()
+        self._batcher: Batcher[_Delivery, None] = Batcher(
+            self._deliver_batch, max_batch_size, max_delay, cancelled_message="Delivery of the batch was cancelled."
+        )
+
+    def get_maildir(self, name: str) -> str:
+        """Return the path of a Maildir to deliver the message file with the name into."""
+        if not self.shard_levels:
+            return self.directory
+        digest = hashlib.sha1(name.encode()).hexdigest()
+        return os.path.join(self.directory, *[digest[level * 2 : level * 2 + 2] for level in range(self.shard_levels)])
+
+    async def send(self, message: Message) -> None:
+        name = _create_unique_name()
+        delivery = _Delivery(maildir=self.get_maildir(name), name=name, data=message.as_bytes())
+        if not self.fsync:
+            await anyio.to_thread.run_sync(self._deliver, [delivery])
+            return
+
+        await self._batcher.submit(delivery)
+
+    async def _deliver_batch(self, deliveries: typing.List[_Delivery]) -> typing.List[None]:
+        await anyio.to_thread.run_sync(self._deliver, deliveries)
+        return [None] * len(deliveries)
+
+    def _deliver(self, deliveries: typing.List[_Delivery]) -> None:
+        for delivery in deliveries:
+            self._ensure_maildir(delivery.maildir)
+            tmp_path = os.path.join(delivery.maildir, "tmp", delivery.name)
+            with open(tmp_path, "xb") as f:
+                f.write(delivery.data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.rename(tmp_path, os.path.join(delivery.maildir, "new", delivery.name))
+
+        if self.fsync:
+            for maildir in {delivery.maildir for delivery in deliveries}:
+                _fsync_directory(os.path.join(maildir, "new"))
+
+    def _ensure_maildir(self, maildir: str) -> None:
+        if maildir not in self._maildirs:
+            for subdirectory in ["tmp", "new", "cur"]:
+                os.makedirs(os.path.join(maildir, subdirectory), exist_ok=True)
+            self._maildirs.add(maildir)
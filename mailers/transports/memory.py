@@ -1,18 +1,147 @@
 from __future__ import annotations
 
+import anyio
+import collections
+import itertools
 import typing
 from email.message import EmailMessage
+from email.utils import getaddresses
 
 from mailers.transports.base import Transport
 
+Predicate = typing.Callable[[EmailMessage], bool]
+
+_IndexKey = typing.Tuple[str, str]
+
+
+class _Entry(typing.NamedTuple):
+    sequence: int
+    message: EmailMessage
+    keys: typing.List[_IndexKey]
+
+
+class _Waiter:
+    def __init__(self, predicate: Predicate) -> None:
+        self.predicate = predicate
+        self.message: typing.Optional[EmailMessage] = None
+        self.event = anyio.Event()
+
 
 class InMemoryTransport(Transport):
-    def __init__(self, storage: typing.Optional[typing.List[EmailMessage]] = None) -> None:
-        self.storage = [] if storage is None else storage
+    """
+    Keep sent messages in memory.
+
+    With "capacity" set, the oldest messages are evicted once the mailbox is full.
+    Messages are indexed by recipient, subject, Message-ID and headers listed in "index_headers",
+    so lookups do not scan the mailbox. Indexes track messages sent through the transport,
+    use "clear" instead of modifying the storage directly.
+    """
+
+    def __init__(
+        self,
+        storage: typing.Optional[typing.List[EmailMessage]] = None,
+        capacity: typing.Optional[int] = None,
+        index_headers: typing.Iterable[str] = (),
+    ) -> None:
+        assert capacity is None or capacity > 0, "Capacity must be a positive number."
+        self.storage: typing.MutableSequence[EmailMessage] = (
+            storage if storage is not None else collections.deque(maxlen=capacity) if capacity else []
+        )
+        self.capacity = capacity
+        self.index_headers = [header.lower() for header in index_headers]
+        self._sequence = itertools.count()
+        self._entries: typing.Deque[_Entry] = collections.deque()
+        self._index: typing.Dict[_IndexKey, typing.Dict[int, EmailMessage]] = {}
+        self._waiters: typing.List[_Waiter] = []
 
     @property
-    def mailbox(self) -> typing.List[EmailMessage]:
+    def mailbox(self) -> typing.MutableSequence[EmailMessage]:
         return self.storage
 
     async def send(self, message: EmailMessage) -> None:
+        entry = _Entry(next(self._sequence), message, self._get_index_keys(message))
+        self._entries.append(entry)
+        for key in entry.keys:
+            self._index.setdefault(key, {})[entry.sequence] = message
+
         self.storage.append(message)
+        if self.capacity and len(self._entries) > self.capacity:
+            self._evict()
+
+        for waiter in list(self._waiters):
+            if waiter.predicate(message):
+                waiter.message = message
+                waiter.event.set()
+                self._waiters.remove(waiter)
+
+    def find_by_recipient(self, address: str) -> typing.List[EmailMessage]:
+        """Return messages sent to the address via To, Cc or Bcc headers."""
+        return self._lookup("recipient", address.lower())
+
+    def find_by_subject(self, subject: str) -> typing.List[EmailMessage]:
+        return self._lookup("subject", subject)
+
+    def find_by_header(self, name: str, value: str) -> typing.List[EmailMessage]:
+        """Return messages that have the header with the value, scan the mailbox if the header is not indexed."""
+        if name.lower() in self.index_headers:
+            return self._lookup(name.lower(), value)
+        return [entry.message for entry in self._entries if value in map(str, entry.message.get_all(name, []))]
+
+    def get_by_message_id(self, message_id: str) -> typing.Optional[EmailMessage]:
+        messages = self._lookup("message-id", message_id)
+        return messages[-1] if messages else None
+
+    async def wait_for(
+        self, predicate: typing.Optional[Predicate] = None, timeout: typing.Optional[float] = None
+    ) -> EmailMessage:
+        """
+        Wait until a message matching the predicate is sent and return it.
+
+        Messages already in the mailbox are checked first.
+        Raises TimeoutError when no message arrives within "timeout" seconds.
+        """
+        predicate = predicate or (lambda message: True)
+        for entry in self._entries:
+            if predicate(entry.message):
+                return entry.message
+
+        waiter = _Waiter(predicate)
+        self._waiters.append(waiter)
+        try:
+            with anyio.fail_after(timeout):
+                await waiter.event.wait()
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        assert waiter.message
+        return waiter.message
+
+    def clear(self) -> None:
+        self.storage.clear()
+        self._entries.clear()
+        self._index.clear()
+
+    def _lookup(self, field: str, value: str) -> typing.List[EmailMessage]:
+        return list(self._index.get((field, value), {}).values())
+
+    def _get_index_keys(self, message: EmailMessage) -> typing.List[_IndexKey]:
+        recipients = [str(value) for name in ["To", "Cc", "Bcc"] for value in message.get_all(name, [])]
+        keys = {("recipient", address.lower()) for _, address in getaddresses(recipients) if address}
+        keys.add(("subject", str(message.get("Subject", ""))))
+        if message.get("Message-ID"):
+            keys.add(("message-id", str(message["Message-ID"]).strip()))
+        for header in self.index_headers:
+            keys.update((header, str(value)) for value in message.get_all(header, []))
+        return list(keys)
+
+    def _evict(self) -> None:
+        entry = self._entries.popleft()
+        for key in entry.keys:
+            bucket = self._index[key]
+            del bucket[entry.sequence]
+            if not bucket:
+                del self._index[key]
+
+        # deque storage evicts the oldest message itself
+        if len(self.storage) > len(self._entries):
+            del self.storage[0]
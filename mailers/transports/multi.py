@@ -1,8 +1,18 @@
+from __future__ import annotations
+
+import anyio
+import anyio.abc
+import logging
 import typing
 from email.message import EmailMessage
 
 from mailers.exceptions import MailersError
-from mailers.transports.base import Transport
+from mailers.message import Envelope, clone_message
+from mailers.transports.base import Transport, send_with_envelope
+
+ErrorHandler = typing.Callable[[Transport, Exception], None]
+
+logger = logging.getLogger(__name__)
 
 
 class MultiDeliveryError(MailersError):
@@ -12,17 +22,94 @@ class MultiDeliveryError(MailersError):
 
 
 class MultiTransport(Transport):
-    def __init__(self, transports: typing.Iterable[Transport]) -> None:
+    """
+    Deliver messages via several transports.
+
+    By default, transports are tried in order until one of them delivers the message.
+    With "broadcast" enabled, the message is sent via all transports concurrently,
+    "send" waits for all transports except "best_effort" ones and fails if any of them fails.
+    Best effort transports run in background while the transport is used as an async context manager,
+    leaving the context waits for them. Outside of it "send" waits for them too, but does not fail because of them.
+    Their errors are passed to "error_handler" or logged.
+    Sends via each transport are limited by "timeout" seconds, use "timeouts" to set it per transport.
+    """
+
+    def __init__(
+        self,
+        transports: typing.Iterable[Transport],
+        broadcast: bool = False,
+        best_effort: typing.Iterable[Transport] = (),
+        timeout: typing.Optional[float] = None,
+        timeouts: typing.Optional[typing.Mapping[Transport, float]] = None,
+        error_handler: typing.Optional[ErrorHandler] = None,
+    ) -> None:
         self.transports = list(transports)
+        self.broadcast = broadcast
+        self.best_effort = list(best_effort)
+        self.timeout = timeout
+        self.timeouts = dict(timeouts or {})
+        self.error_handler = error_handler
+        self._task_group: typing.Optional[anyio.abc.TaskGroup] = None
+
+    async def send(self, message: EmailMessage, envelope: typing.Optional[Envelope] = None) -> None:
+        if self.broadcast:
+            await self._broadcast(message, envelope)
+            return
 
-    async def send(self, message: EmailMessage) -> None:
         exceptions: typing.List[Exception] = []
         for transport in self.transports:
             try:
-                await transport.send(message)
+                await self._send(transport, message, envelope)
             except Exception as ex:
                 exceptions.append(ex)
             else:
                 return
 
         raise MultiDeliveryError("Failed to deliver message via configured mailers.", exceptions)
+
+    async def __aenter__(self) -> MultiTransport:
+        task_group = anyio.create_task_group()
+        await task_group.__aenter__()
+        self._task_group = task_group
+        return self
+
+    async def __aexit__(self, *args: typing.Any) -> typing.Optional[bool]:
+        task_group, self._task_group = self._task_group, None
+        assert task_group, "Transport is not entered."
+        return await task_group.__aexit__(*args)
+
+    async def _send(self, transport: Transport, message: EmailMessage, envelope: typing.Optional[Envelope]) -> None:
+        with anyio.fail_after(self.timeouts.get(transport, self.timeout)):
+            await send_with_envelope(transport, message, envelope)
+
+    async def _broadcast(self, message: EmailMessage, envelope: typing.Optional[Envelope]) -> None:
+        exceptions: typing.List[Exception] = []
+
+        async def _send_required(transport: Transport) -> None:
+            try:
+                # transports get their own copies, so they can not affect each other by changing headers
+                await self._send(transport, clone_message(message), envelope)
+            except Exception as ex:
+                exceptions.append(ex)
+
+        async with anyio.create_task_group() as task_group:
+            for transport in self.transports:
+                if transport in self.best_effort:
+                    background = self._task_group or task_group
+                    background.start_soon(self._send_best_effort, transport, clone_message(message), envelope)
+                else:
+                    task_group.start_soon(_send_required, transport)
+
+        if exceptions:
+            raise MultiDeliveryError("Failed to deliver message via required transports.", exceptions)
+
+    async def _send_best_effort(
+        self, transport: Transport, message: EmailMessage, envelope: typing.Optional[Envelope]
+    ) -> None:
+        try:
+            await self._send(transport, message, envelope)
+        except Exception as ex:
+            if self.error_handler:
+                self.error_handler(transport, ex)
+            else:
+                logger.warning("Best effort delivery via %r failed.", transport, exc_info=ex)
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import anyio
+import typing
+from email.message import EmailMessage
+
+from mailers.exceptions import DeliveryError
+from mailers.message import Envelope
+from mailers.transports.base import Transport, send_with_envelope
+from mailers.transports.multi import MultiDeliveryError
+
+
+class RoutingDeliveryError(MultiDeliveryError):
+    """Raised when some of the routes failed, "failed_recipients" maps every undelivered recipient to its error."""
+
+    def __init__(self, message: str, failed_recipients: typing.Dict[str, Exception]) -> None:
+        super().__init__(message, list({id(ex): ex for ex in failed_recipients.values()}.values()))
+        self.failed_recipients = failed_recipients
+
+
+class _TrieNode:
+    __slots__ = ("children", "transport")
+
+    def __init__(self) -> None:
+        self.children: typing.Dict[str, _TrieNode] = {}
+        self.transport: typing.Optional[Transport] = None
+
+
+def _normalize_domain(domain: str) -> str:
+    return domain.strip().rstrip(".").lower()
+
+
+class RoutingTransport(Transport):
+    """
+    Send messages to recipients of different domains via different transports.
+
+    Routes map domain patterns to transports: "example.com" matches the domain itself
+    and "*.example.com" matches its subdomains, the most specific pattern wins.
+    Recipients that match no pattern are sent via the "default" transport.
+    Patterns are compiled into a mapping of exact domains and a trie of domain labels,
+    so a lookup does not depend on the number of routes.
+
+    Envelope recipients are grouped by transport and groups are sent concurrently,
+    each transport receives the same message with an envelope limited to its recipients.
+    """
+
+    def __init__(
+        self,
+        routes: typing.Mapping[str, Transport],
+        default: typing.Optional[Transport] = None,
+    ) -> None:
+        self.routes = dict(routes)
+        self.default = default
+        self._exact: typing.Dict[str, Transport] = {}
+        self._wildcards = _TrieNode()
+        for pattern, transport in self.routes.items():
+            self.add_route(pattern, transport)
+
+    def add_route(self, pattern: str, transport: Transport) -> None:
+        self.routes[pattern] = transport
+        pattern = _normalize_domain(pattern)
+        if not pattern.startswith("*."):
+            self._exact[pattern] = transport
+            return
+
+        node = self._wildcards
+        for label in reversed(pattern[2:].split(".")):
+            node = node.children.setdefault(label, _TrieNode())
+        node.transport = transport
+
+    def get_transport(self, address: str) -> typing.Optional[Transport]:
+        """Return a transport for the recipient address."""
+        domain = _normalize_domain(address.rpartition("@")[2])
+        transport = self._exact.get(domain)
+        if transport is not None:
+            return transport
+
+        # walk labels from the top level domain, the domain itself is matched only by exact patterns
+        labels = domain.split(".")
+        node = self._wildcards
+        for label in reversed(labels[1:]):
+            child = node.children.get(label)
+            if child is None:
+                break
+            node = child
+            transport = node.transport or transport
+        return transport or self.default
+
+    def route(self, envelope: Envelope) -> typing.Dict[Transport, Envelope]:
+        """Split the envelope into envelopes for each transport."""
+        if not envelope.recipients:
+            raise DeliveryError("Message has no recipients.")
+
+        groups: typing.Dict[Transport, Envelope] = {}
+        unrouted: typing.List[str] = []
+        for recipient in envelope.recipients:
+            transport = self.get_transport(recipient)
+            if transport is None:
+                unrouted.append(recipient)
+            else:
+                groups.setdefault(transport, Envelope(sender=envelope.sender)).recipients.append(recipient)
+
+        if unrouted:
+            raise DeliveryError(f"No route for recipients: {', '.join(unrouted)}.")
+        return groups
+
+    async def send(self, message: EmailMessage, envelope: typing.Optional[Envelope] = None) -> None:
+        groups = self.route(envelope or Envelope.from_message(message))
+        if len(groups) == 1:
+            transport, envelope = next(iter(groups.items()))
+            await send_with_envelope(transport, message, envelope)
+            return
+
+        failed_recipients: typing.Dict[str, Exception] = {}
+
+        async def _send(transport: Transport, envelope: Envelope) -> None:
+            try:
+                await send_with_envelope(transport, message, envelope)
+            except Exception as ex:
+                failed_recipients.update({recipient: ex for recipient in envelope.recipients})
+
+        async with anyio.create_task_group() as task_group:
+            for transport, group_envelope in groups.items():
+                task_group.start_soon(_send, transport, group_envelope)
+
+        if failed_recipients:
+            raise RoutingDeliveryError(
+                f"Failed to deliver message to {len(failed_recipients)} recipient(s).", failed_recipients
+            )
@@ -1,12 +1,59 @@
 from __future__ import annotations
 
+import anyio
 import typing
 from email.message import Message
 
+from mailers.exceptions import DeliveryError, RecipientsRefusedError
+from mailers.message import Envelope, clone_message
 from mailers.transports.base import Transport
 
+if typing.TYPE_CHECKING:  # pragma: nocover
+    import aiosmtplib
+
+Reply = typing.Tuple[int, str]
+
+
+class _IdleConnectionClosed(Exception):
+    """The server has closed an idle connection before the transaction started."""
+
+
+class _Payloads:
+    """Serializes the message once per set of server capabilities and shares the result between transactions."""
+
+    def __init__(self, message: Message) -> None:
+        self.message = message
+        # signatures cover RFC 2047 encoded headers, raw UTF-8 headers would invalidate them
+        self.signed = "DKIM-Signature" in message
+        self._cache: typing.Dict[typing.Tuple[bool, str], bytes] = {}
+
+    def get(self, utf8: bool, cte_type: str) -> bytes:
+        from aiosmtplib.email import flatten_message
+
+        data = self._cache.get((utf8, cte_type))
+        if data is None:
+            data = self._cache[utf8, cte_type] = flatten_message(self.message, utf8=utf8, cte_type=cte_type)
+        return data
+
 
 class SMTPTransport(Transport):
+    """
+    Send messages via an SMTP server.
+
+    Recipients are split into transactions of at most "max_recipients" recipients,
+    all transactions reuse the same serialized message.
+    With "pool_size" set, up to that many connections are kept open between messages
+    and transactions of a message run over them in parallel,
+    otherwise every message is sent over a new connection. Call "aclose" to close pooled connections.
+    Use "deliver" to get the server reply for every recipient.
+    With "utf8" enabled, headers are sent as raw UTF-8 when the server supports SMTPUTF8,
+    except for DKIM signed messages, which are sent as they were signed.
+
+    With a "verp" template every recipient gets its own transaction and envelope sender,
+    e.g. "bounces+{local}={domain}@example.com" for "user@example.org" gives "bounces+user=example.org@example.com".
+    The template may use "local", "domain" and "recipient" fields.
+    """
+
     def __init__(
         self,
         host: str = "localhost",
@@ -19,7 +66,12 @@ class SMTPTransport(Transport):
         cert_file: typing.Optional[str] = None,
         cert_bundle: typing.Optional[str] = None,
         validate_certs: typing.Optional[bool] = None,
+        utf8: bool = False,
+        max_recipients: typing.Optional[int] = None,
+        pool_size: int = 0,
+        verp: typing.Optional[str] = None,
     ):
+        assert max_recipients is None or max_recipients > 0, "Max recipients must be a positive number."
         self._host = host
         self._user = user
         self._port = port
@@ -30,22 +82,92 @@ class SMTPTransport(Transport):
         self._cert_file = cert_file
         self._cert_bundle = cert_bundle
         self._validate_certs = validate_certs if validate_certs is not None else True
+        self._utf8 = utf8
+        self.max_recipients = max_recipients
+        self.pool_size = pool_size
+        self.verp = verp
+        self._idle: typing.List[aiosmtplib.SMTP] = []
+        self._semaphore = anyio.Semaphore(pool_size or 1)
 
-    async def send(self, message: Message) -> None:
-        import aiosmtplib
+    async def send(self, message: Message, envelope: typing.Optional[Envelope] = None) -> None:
+        statuses = await self.deliver(message, envelope)
+        if not any(code in (250, 251) for code, _ in statuses.values()):
+            raise RecipientsRefusedError("All recipients were refused.", statuses)
 
-        sender = message.get("Sender")
-        if sender:
+    async def deliver(self, message: Message, envelope: typing.Optional[Envelope] = None) -> typing.Dict[str, Reply]:
+        """
+        Deliver the message and return (code, text) reply for every recipient.
+
+        Unlike "send" it does not raise when recipients are refused.
+        """
+        if envelope is None:
+            envelope = Envelope.from_message(message)
+        if not envelope.recipients:
+            raise DeliveryError("Message has no recipients.")
+        if message.get("Sender") or message.get("Return-Path"):
+            # envelope headers are not transmitted, remove them from a copy to keep the message reusable
+            message = clone_message(message)
             del message["Sender"]
-        return_path = message.get("Return-Path")
-        if return_path:
             del message["Return-Path"]
-        if sender is None and return_path:
-            sender = return_path
 
-        await aiosmtplib.send(
-            message,
-            sender=sender,
+        transactions = self._split(envelope)
+        payloads = _Payloads(message)
+        if not self.pool_size:
+            client = await self._connect()
+            try:
+                statuses: typing.Dict[str, Reply] = {}
+                for sender, recipients in transactions:
+                    statuses.update(await self._transaction(client, sender, recipients, payloads))
+                return statuses
+            finally:
+                await self._close(client)
+
+        results: typing.List[typing.Dict[str, Reply]] = [{} for _ in transactions]
+
+        async def _deliver_chunk(index: int) -> None:
+            results[index] = await self._pooled_transaction(*transactions[index], payloads)
+
+        async with anyio.create_task_group() as task_group:
+            for index in range(len(transactions)):
+                task_group.start_soon(_deliver_chunk, index)
+        return {recipient: reply for result in results for recipient, reply in result.items()}
+
+    def get_verp_sender(self, recipient: str) -> str:
+        """Return the envelope sender for the recipient built from the "verp" template."""
+        assert self.verp, "VERP template is not configured."
+        local, _, domain = recipient.rpartition("@")
+        sender = self.verp.format(local=local, domain=domain, recipient=recipient)
+        if any(character.isspace() for character in sender):
+            raise ValueError(f'VERP sender "{sender}" must not contain whitespace.')
+        return sender
+
+    def _split(self, envelope: Envelope) -> typing.List[typing.Tuple[str, typing.List[str]]]:
+        """Split the envelope into (sender, recipients) pairs, one pair per transaction."""
+        if self.verp:
+            return [(self.get_verp_sender(recipient), [recipient]) for recipient in envelope.recipients]
+
+        size = self.max_recipients or len(envelope.recipients)
+        return [
+            (envelope.sender, envelope.recipients[index : index + size])
+            for index in range(0, len(envelope.recipients), size)
+        ]
+
+    async def aclose(self) -> None:
+        """Close pooled connections."""
+        clients, self._idle = self._idle, []
+        for client in clients:
+            await self._close(client)
+
+    async def __aenter__(self) -> SMTPTransport:
+        return self
+
+    async def __aexit__(self, *args: typing.Any) -> None:
+        await self.aclose()
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        import aiosmtplib
+
+        client = aiosmtplib.SMTP(
             hostname=self._host,
             port=self._port,
             use_tls=self._use_tls,
@@ -57,3 +179,99 @@ class SMTPTransport(Transport):
             cert_bundle=self._cert_bundle,
             validate_certs=self._validate_certs,
         )
+        await client.connect()
+        if client.is_ehlo_or_helo_needed:
+            await client.ehlo()
+        return client
+
+    async def _close(self, client: aiosmtplib.SMTP) -> None:
+        import aiosmtplib
+
+        with anyio.CancelScope(shield=True):
+            try:
+                if client.is_connected:
+                    await client.quit()
+            except (aiosmtplib.SMTPException, OSError):
+                client.close()
+
+    async def _pooled_transaction(
+        self, sender: str, recipients: typing.List[str], payloads: _Payloads
+    ) -> typing.Dict[str, Reply]:
+        async with self._semaphore:
+            while self._idle:
+                client = self._idle.pop()
+                try:
+                    statuses = await self._transaction(client, sender, recipients, payloads, reused=True)
+                except _IdleConnectionClosed:
+                    client.close()
+                    continue
+                except BaseException:
+                    await self._close(client)
+                    raise
+                self._idle.append(client)
+                return statuses
+
+            client = await self._connect()
+            try:
+                statuses = await self._transaction(client, sender, recipients, payloads)
+            except BaseException:
+                await self._close(client)
+                raise
+            self._idle.append(client)
+            return statuses
+
+    async def _transaction(
+        self,
+        client: aiosmtplib.SMTP,
+        sender: str,
+        recipients: typing.List[str],
+        payloads: _Payloads,
+        reused: bool = False,
+    ) -> typing.Dict[str, Reply]:
+        import aiosmtplib
+
+        mail_options: typing.List[str] = []
+        utf8 = self._utf8 and not payloads.signed and client.supports_extension("smtputf8")
+        if utf8 or not (sender + "".join(recipients)).isascii():
+            mail_options.append("SMTPUTF8")
+        cte_type = "7bit"
+        if client.supports_extension("8bitmime"):
+            mail_options.append("BODY=8BITMIME")
+            cte_type = "8bit"
+        data = payloads.get(utf8, cte_type)
+        if client.supports_extension("size"):
+            mail_options.append(f"SIZE={len(data)}")
+        encoding = "utf-8" if "SMTPUTF8" in mail_options else "ascii"
+
+        try:
+            await client.mail(sender, options=mail_options, encoding=encoding)
+        except aiosmtplib.SMTPServerDisconnected as ex:
+            # idle connections may have been closed by the server, retrying is safe before any recipient is sent
+            if reused:
+                raise _IdleConnectionClosed() from ex
+            raise
+        except aiosmtplib.SMTPResponseException as ex:
+            await client.rset()
+            return {recipient: (ex.code, ex.message) for recipient in recipients}
+
+        statuses: typing.Dict[str, Reply] = {}
+        for recipient in recipients:
+            try:
+                response = await client.rcpt(recipient, encoding=encoding)
+                statuses[recipient] = (response.code, response.message)
+            except aiosmtplib.SMTPResponseException as ex:
+                statuses[recipient] = (ex.code, ex.message)
+
+        accepted = [recipient for recipient, (code, _) in statuses.items() if code in (250, 251)]
+        if not accepted:
+            await client.rset()
+            return statuses
+
+        try:
+            response = await client.data(data)
+        except aiosmtplib.SMTPResponseException as ex:
+            await client.rset()
+            statuses.update({recipient: (ex.code, ex.message) for recipient in accepted})
+            return statuses
+        statuses.update({recipient: (response.code, response.message) for recipient in accepted})
+        return statuses
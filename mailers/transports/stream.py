@@ -1,12 +1,126 @@
+from __future__ import annotations
+
+import anyio
+import atexit
+import collections
+import io
+import threading
 import typing
 from email.message import Message
 
 from mailers.transports.base import Transport
 
 
+class _StreamWriter(threading.Thread):
+    """Writes queued chunks into a stream in a background thread, holding at most "max_size" bytes in memory."""
+
+    def __init__(self, stream: typing.IO, max_size: int) -> None:
+        super().__init__(name="mailers-stream-writer", daemon=True)
+        self.stream = stream
+        self.max_size = max_size
+        self.error: typing.Optional[Exception] = None
+        self._chunks: typing.Deque[bytes] = collections.deque()
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def put(self, data: bytes, block: bool = True) -> bool:
+        with self._condition:
+            # a chunk larger than the buffer is accepted once the buffer is empty
+            while self._chunks and self._size + len(data) > self.max_size:
+                if not block:
+                    return False
+                self._condition.wait()
+            self._chunks.append(data)
+            self._size += len(data)
+            self._condition.notify_all()
+            return True
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self.join()
+
+    def run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._chunks and not self._closed:
+                    self._condition.wait()
+                if not self._chunks:
+                    return
+                chunks = list(self._chunks)
+                self._chunks.clear()
+                self._size = 0
+                self._condition.notify_all()
+
+            try:
+                self._write(b"".join(chunks))
+            except Exception as ex:
+                self.error = ex
+
+    def _write(self, data: bytes) -> None:
+        if not isinstance(self.stream, io.TextIOBase):
+            self.stream.write(data)
+        elif getattr(self.stream, "buffer", None) is not None:
+            self.stream.flush()
+            self.stream.buffer.write(data)  # type: ignore[attr-defined]
+        else:
+            self.stream.write(data.decode("utf-8", errors="replace"))
+        self.stream.flush()
+
+
 class StreamTransport(Transport):
-    def __init__(self, output: typing.IO) -> None:
+    """
+    Write messages into a stream.
+
+    By default, messages are written on the event loop, which blocks it when the stream is slow, e.g. a pipe.
+    With "buffered" enabled, serialized messages are queued and written in batches by a background thread.
+    At most "max_buffer_size" bytes are queued, "send" waits for the writer when the buffer is full.
+    Call "close" or use the transport as an async context manager to write queued messages,
+    they are also written when the interpreter exits.
+    """
+
+    def __init__(self, output: typing.IO, buffered: bool = False, max_buffer_size: int = 1024 * 1024) -> None:
         self.stream = output
+        self.buffered = buffered
+        self.max_buffer_size = max_buffer_size
+        self._writer: typing.Optional[_StreamWriter] = None
 
     async def send(self, message: Message) -> None:
-        self.stream.write(str(message))
+        if not self.buffered:
+            self.stream.write(str(message))
+            return
+
+        writer = self._get_writer()
+        data = message.as_bytes()
+        if not writer.put(data, block=False):
+            await anyio.to_thread.run_sync(writer.put, data)
+
+    def close(self) -> None:
+        """Write queued messages and stop the writer thread."""
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            atexit.unregister(writer.close)
+            writer.close()
+            if writer.error:
+                raise writer.error
+
+    async def aclose(self) -> None:
+        await anyio.to_thread.run_sync(self.close)
+
+    async def __aenter__(self) -> StreamTransport:
+        return self
+
+    async def __aexit__(self, *args: typing.Any) -> None:
+        await self.aclose()
+
+    def _get_writer(self) -> _StreamWriter:
+        if self._writer is None:
+            self._writer = _StreamWriter(self.stream, self.max_buffer_size)
+            self._writer.start()
+            atexit.register(self._writer.close)
+        elif self._writer.error:
+            error, self._writer.error = self._writer.error, None
+            raise error
+        return self._writer
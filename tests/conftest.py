@@ -56,6 +56,22 @@ def smtpd_server(
     server.stop()
 
 
+@pytest.fixture(scope="function")
+def smtpd_controller() -> typing.Generator[typing.Callable[..., Controller], None, None]:
+    """Start SMTP servers with custom handlers on port 10026, servers are stopped after the test."""
+    servers: typing.List[Controller] = []
+
+    def _start(handler: typing.Any, **kwargs: typing.Any) -> Controller:
+        server = Controller(handler, hostname="localhost", port=10026, **kwargs)
+        server.start()
+        servers.append(server)
+        return server
+
+    yield _start
+    for server in servers:
+        server.stop()
+
+
 @pytest.fixture
 def message() -> EmailMessage:
     return Email(
@@ -0,0 +1,123 @@
+import datetime
+import email
+import email.policy
+import pytest
+import typing
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import pkcs7
+from cryptography.x509.oid import NameOID
+from email.message import EmailMessage
+from pathlib import Path
+
+from mailers.encrypters.smime import CertificateStore, DirectoryCertificateStore, SMIMEEncrypter
+from mailers.exceptions import EncryptionError
+from mailers.message import Email
+
+_PrivateKey = rsa.RSAPrivateKey
+
+
+def _generate_certificate(address: str) -> typing.Tuple[x509.Certificate, _PrivateKey]:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.EMAIL_ADDRESS, address)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    return certificate, key
+
+
+@pytest.fixture(scope="module")
+def root_credentials() -> typing.Tuple[x509.Certificate, _PrivateKey]:
+    return _generate_certificate("root@localhost")
+
+
+@pytest.fixture(scope="module")
+def user_credentials() -> typing.Tuple[x509.Certificate, _PrivateKey]:
+    return _generate_certificate("user@localhost")
+
+
+def _decrypt(message: EmailMessage, credentials: typing.Tuple[x509.Certificate, _PrivateKey]) -> EmailMessage:
+    data = pkcs7.pkcs7_decrypt_der(message.get_content(), credentials[0], credentials[1], [])
+    return typing.cast(EmailMessage, email.message_from_bytes(data, _class=EmailMessage, policy=email.policy.default))
+
+
+class _CountingStore(CertificateStore):
+    def __init__(self, certificates: typing.Mapping[str, x509.Certificate]) -> None:
+        self.certificates = certificates
+        self.lookups: typing.List[str] = []
+
+    def get_certificate(self, address: str) -> typing.Optional[x509.Certificate]:
+        self.lookups.append(address)
+        return self.certificates.get(address)
+
+
+def test_smime_encrypter(root_credentials: typing.Any) -> None:
+    message = Email(to="Root <root@localhost>", from_address="sender@localhost", subject="Secret", text="Hello").build()
+    encrypter = SMIMEEncrypter({"root@localhost": root_credentials[0].public_bytes(serialization.Encoding.PEM)})
+
+    encrypted = encrypter.encrypt(message)
+    assert encrypted["Subject"] == "Secret"
+    assert encrypted["To"] == "Root <root@localhost>"
+    assert encrypted.get_content_type() == "application/pkcs7-mime"
+    assert encrypted.get_param("smime-type") == "enveloped-data"
+    assert encrypted.get_filename() == "smime.p7m"
+    assert b"Hello" not in encrypted.as_bytes()
+
+    decrypted = _decrypt(encrypted, root_credentials)
+    assert decrypted.get_content().strip() == "Hello"
+    assert "Subject" not in decrypted
+
+
+def test_smime_encrypter_encrypts_once_for_all_recipients(
+    root_credentials: typing.Any, user_credentials: typing.Any
+) -> None:
+    message = Email(
+        to="root@localhost",
+        bcc="user@localhost",
+        from_address="sender@localhost",
+        text="Hello",
+    ).build()
+    encrypter = SMIMEEncrypter({"root@localhost": root_credentials[0], "user@localhost": user_credentials[0]})
+
+    encrypted = encrypter.encrypt(message)
+    assert _decrypt(encrypted, root_credentials).get_content().strip() == "Hello"
+    assert _decrypt(encrypted, user_credentials).get_content().strip() == "Hello"
+
+
+def test_smime_encrypter_caches_certificates(root_credentials: typing.Any, user_credentials: typing.Any) -> None:
+    store = _CountingStore({"root@localhost": root_credentials[0], "user@localhost": user_credentials[0]})
+    encrypter = SMIMEEncrypter(store, cache_size=1)
+
+    encrypter.encrypt(Email(to="ROOT@localhost", from_address="sender@localhost", text="Hello").build())
+    encrypter.encrypt(Email(to="root@localhost", from_address="sender@localhost", text="Hello").build())
+    assert store.lookups == ["root@localhost"]
+
+    # least recently used certificate is evicted
+    encrypter.encrypt(Email(to="user@localhost", from_address="sender@localhost", text="Hello").build())
+    encrypter.encrypt(Email(to="root@localhost", from_address="sender@localhost", text="Hello").build())
+    assert store.lookups == ["root@localhost", "user@localhost", "root@localhost"]
+
+
+def test_smime_encrypter_requires_certificate_for_each_recipient(root_credentials: typing.Any) -> None:
+    message = Email(to=["root@localhost", "user@localhost"], from_address="sender@localhost", text="Hello").build()
+    encrypter = SMIMEEncrypter({"root@localhost": root_credentials[0]})
+
+    with pytest.raises(EncryptionError, match="user@localhost"):
+        encrypter.encrypt(message)
+
+
+def test_directory_certificate_store(tmp_path: Path, root_credentials: typing.Any) -> None:
+    (tmp_path / "root@localhost.pem").write_bytes(root_credentials[0].public_bytes(serialization.Encoding.PEM))
+    store = DirectoryCertificateStore(str(tmp_path))
+
+    assert store.get_certificate("root@localhost") == root_credentials[0]
+    assert store.get_certificate("user@localhost") is None
@@ -0,0 +1,186 @@
+import anyio
+import pytest
+import typing
+from email.message import EmailMessage
+
+from mailers import AsyncEncrypter, AsyncSigner, InMemoryTransport, Mailer
+from mailers.exceptions import MailersError
+from mailers.message import Email
+from mailers.signers import BatchingSigner
+
+
+class _SigningService:
+    """A local stand-in for a remote signing service."""
+
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+        self.round_trips: typing.List[int] = []
+
+    async def sign(self, payloads: typing.List[bytes]) -> typing.List[str]:
+        await anyio.sleep(0)
+        if self.fail:
+            raise ConnectionError("Service unavailable.")
+        self.round_trips.append(len(payloads))
+        return [f"signature-{len(payload)}" for payload in payloads]
+
+
+class _RemoteSigner(AsyncSigner):
+    def __init__(self, service: _SigningService) -> None:
+        self.service = service
+
+    async def sign(self, message: EmailMessage) -> EmailMessage:
+        [signature] = await self.service.sign([message.as_bytes()])
+        message["X-Signature"] = signature
+        return message
+
+
+class _BatchingRemoteSigner(BatchingSigner):
+    def __init__(self, service: _SigningService, **kwargs: typing.Any) -> None:
+        super().__init__(**kwargs)
+        self.service = service
+
+    async def sign_batch(self, messages: typing.List[EmailMessage]) -> typing.List[EmailMessage]:
+        signatures = await self.service.sign([message.as_bytes() for message in messages])
+        for message, signature in zip(messages, signatures):
+            message["X-Signature"] = signature
+        return messages
+
+
+class _Encrypter(AsyncEncrypter):
+    async def encrypt(self, message: EmailMessage) -> EmailMessage:
+        await anyio.sleep(0)
+        message["X-Encrypted"] = "yes"
+        return message
+
+
+def _create_message(index: int = 0) -> Email:
+    return Email(to=f"user{index}@localhost", from_address="root@localhost", text="Text.")
+
+
+@pytest.mark.asyncio
+async def test_mailer_awaits_async_signer_and_encrypter(mailbox: typing.List[EmailMessage]) -> None:
+    service = _SigningService()
+    mailer = Mailer(InMemoryTransport(mailbox), signer=_RemoteSigner(service), encrypter=_Encrypter())
+    await mailer.send(_create_message())
+    assert mailbox[0]["X-Signature"].startswith("signature-")
+    assert mailbox[0]["X-Encrypted"] == "yes"
+    assert service.round_trips == [1]
+
+
+@pytest.mark.asyncio
+async def test_batching_signer_signs_concurrent_messages_in_one_round_trip(mailbox: typing.List[EmailMessage]) -> None:
+    service = _SigningService()
+    mailer = Mailer(InMemoryTransport(mailbox), signer=_BatchingRemoteSigner(service, max_delay=0.01))
+
+    async with anyio.create_task_group() as task_group:
+        for index in range(10):
+            task_group.start_soon(mailer.send, _create_message(index))
+
+    assert service.round_trips == [10]
+    assert len(mailbox) == 10
+    assert all(message["X-Signature"].startswith("signature-") for message in mailbox)
+
+
+@pytest.mark.asyncio
+async def test_batching_signer_limits_batch_size() -> None:
+    service = _SigningService()
+    signer = _BatchingRemoteSigner(service, max_batch_size=4, max_delay=0.01)
+
+    signed: typing.List[EmailMessage] = []
+
+    async def _sign(index: int) -> None:
+        signed.append(await signer.sign(_create_message(index).build()))
+
+    async with anyio.create_task_group() as task_group:
+        for index in range(10):
+            task_group.start_soon(_sign, index)
+
+    assert service.round_trips == [4, 4, 2]
+    assert len(signed) == 10
+
+
+@pytest.mark.asyncio
+async def test_batching_signer_returns_own_message_to_each_caller() -> None:
+    signer = _BatchingRemoteSigner(_SigningService(), max_delay=0.01)
+    messages = [_create_message(index).build() for index in range(3)]
+    results: typing.Dict[int, EmailMessage] = {}
+
+    async def _sign(index: int) -> None:
+        results[index] = await signer.sign(messages[index])
+
+    async with anyio.create_task_group() as task_group:
+        for index in range(3):
+            task_group.start_soon(_sign, index)
+
+    assert all(results[index] is messages[index] for index in range(3))
+
+
+@pytest.mark.asyncio
+async def test_batching_signer_propagates_errors() -> None:
+    signer = _BatchingRemoteSigner(_SigningService(fail=True), max_delay=0.01)
+    errors: typing.List[Exception] = []
+
+    async def _sign(index: int) -> None:
+        try:
+            await signer.sign(_create_message(index).build())
+        except ConnectionError as ex:
+            errors.append(ex)
+
+    async with anyio.create_task_group() as task_group:
+        for index in range(3):
+            task_group.start_soon(_sign, index)
+
+    assert len(errors) == 3
+
+
+@pytest.mark.asyncio
+async def test_batching_signer_reports_cancelled_batches() -> None:
+    class _SlowSigner(BatchingSigner):
+        async def sign_batch(self, messages: typing.List[EmailMessage]) -> typing.List[EmailMessage]:
+            await anyio.sleep(1)
+            return messages  # pragma: no cover
+
+    # the second message fills the batch, so its caller signs the batch and is cancelled while signing
+    signer = _SlowSigner(max_batch_size=2, max_delay=1)
+    errors: typing.List[Exception] = []
+
+    async def _leader() -> None:
+        await anyio.sleep(0)
+        with anyio.move_on_after(0.05):
+            await signer.sign(_create_message().build())
+
+    async def _follower() -> None:
+        try:
+            await signer.sign(_create_message().build())
+        except MailersError as ex:
+            errors.append(ex)
+
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(_leader)
+        task_group.start_soon(_follower)
+
+    assert len(errors) == 1
+    assert str(errors[0]) == "Signing of the batch was cancelled."
+
+
+@pytest.mark.asyncio
+async def test_batching_signer_signs_batch_when_first_caller_is_cancelled() -> None:
+    service = _SigningService()
+    signer = _BatchingRemoteSigner(service, max_delay=0.05)
+    signed: typing.List[EmailMessage] = []
+
+    async def _first() -> None:
+        with anyio.move_on_after(0.01):
+            await signer.sign(_create_message().build())
+
+    async def _second() -> None:
+        await anyio.sleep(0)
+        with anyio.fail_after(1):
+            signed.append(await signer.sign(_create_message(1).build()))
+
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(_first)
+        task_group.start_soon(_second)
+
+    assert signed[0]["X-Signature"].startswith("signature-")
+    assert service.round_trips == [2]
@@ -0,0 +1,81 @@
+import anyio
+import pytest
+import typing
+
+from mailers.batching import Batcher
+from mailers.exceptions import MailersError
+
+
+class _Handler:
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.batches: typing.List[typing.List[int]] = []
+
+    async def __call__(self, items: typing.List[int]) -> typing.List[int]:
+        await anyio.sleep(self.delay)
+        self.batches.append(list(items))
+        return [item * 10 for item in items]
+
+
+@pytest.mark.asyncio
+async def test_batcher_processes_concurrent_items_in_batches() -> None:
+    handler = _Handler()
+    batcher = Batcher(handler, max_batch_size=3, max_delay=0.01)
+    results: typing.Dict[int, int] = {}
+
+    async def _submit(item: int) -> None:
+        results[item] = await batcher.submit(item)
+
+    async with anyio.create_task_group() as task_group:
+        for item in range(5):
+            task_group.start_soon(_submit, item)
+
+    assert handler.batches == [[0, 1, 2], [3, 4]]
+    assert results == {0: 0, 1: 10, 2: 20, 3: 30, 4: 40}
+
+
+@pytest.mark.asyncio
+async def test_batcher_flushes_when_first_caller_is_cancelled() -> None:
+    handler = _Handler()
+    batcher = Batcher(handler, max_delay=0.05)
+    results: typing.List[int] = []
+
+    async def _first() -> None:
+        with anyio.move_on_after(0.01):
+            await batcher.submit(1)
+
+    async def _second() -> None:
+        await anyio.sleep(0)
+        with anyio.fail_after(1):
+            results.append(await batcher.submit(2))
+
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(_first)
+        task_group.start_soon(_second)
+
+    assert results == [20]
+    assert handler.batches == [[1, 2]]
+
+
+@pytest.mark.asyncio
+async def test_batcher_reports_cancelled_processing() -> None:
+    batcher = Batcher(_Handler(delay=1), max_batch_size=2, max_delay=1, cancelled_message="Cancelled.")
+    errors: typing.List[Exception] = []
+
+    async def _first() -> None:
+        try:
+            await batcher.submit(1)
+        except MailersError as ex:
+            errors.append(ex)
+
+    async def _second() -> None:
+        # fills the batch and processes it
+        await anyio.sleep(0)
+        with anyio.move_on_after(0.05):
+            await batcher.submit(2)
+
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(_first)
+        task_group.start_soon(_second)
+
+    assert [str(error) for error in errors] == ["Cancelled."]
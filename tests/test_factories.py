@@ -1,9 +1,18 @@
 import pytest
 import sys
 
-from mailers import FileTransport, InMemoryTransport, NullTransport, SMTPTransport, create_transport_from_url
+from mailers import (
+    ArchiveTransport,
+    FileTransport,
+    InMemoryTransport,
+    MaildirTransport,
+    NullTransport,
+    SMTPTransport,
+    create_transport_from_url,
+)
 from mailers.exceptions import NotRegisteredTransportError
-from mailers.transports import ConsoleTransport
+from mailers.transports import ConsoleTransport, LMTPTransport, SendmailTransport
+from mailers.transports.http import HTTPTransport, JSONPayloadAdapter, RawPayloadAdapter
 
 
 def test_raises_when_no_transport() -> None:
@@ -16,6 +25,11 @@ async def test_console_transport_from_url() -> None:
     transport = create_transport_from_url("console://?stream=stdout")
     assert isinstance(transport, ConsoleTransport)
     assert transport.stream == sys.stdout
+    assert not transport.buffered
+
+    transport = create_transport_from_url("console://?stream=stdout&buffered=yes")
+    assert isinstance(transport, ConsoleTransport)
+    assert transport.buffered
 
 
 @pytest.mark.asyncio
@@ -28,10 +42,77 @@ async def test_file_transport_from_url() -> None:
         create_transport_from_url("file://")
 
 
+@pytest.mark.asyncio
+async def test_archive_transport_from_url() -> None:
+    transport = create_transport_from_url("archive:///tmp/archive?max_segment_size=1024&max_segment_age=60&compress=1")
+    assert isinstance(transport, ArchiveTransport)
+    assert transport.directory == "/tmp/archive"
+    assert transport.max_segment_size == 1024
+    assert transport.max_segment_age == 60
+    assert transport.compress
+    assert transport.flush_interval == 1
+
+    transport = create_transport_from_url("archive:///tmp/archive?flush_interval=0")
+    assert isinstance(transport, ArchiveTransport)
+    assert transport.flush_interval is None
+
+
+@pytest.mark.asyncio
+async def test_maildir_transport_from_url() -> None:
+    transport = create_transport_from_url("maildir:///tmp/mail?shard_levels=2&fsync=yes")
+    assert isinstance(transport, MaildirTransport)
+    assert transport.directory == "/tmp/mail"
+    assert transport.shard_levels == 2
+    assert transport.fsync
+
+
+@pytest.mark.asyncio
+async def test_http_transport_from_url() -> None:
+    transport = create_transport_from_url("https://api.localhost/v1/send?key=secret&adapter=raw&batch_size=50")
+    assert isinstance(transport, HTTPTransport)
+    assert transport.url == "https://api.localhost/v1/send?key=secret"
+    assert isinstance(transport.adapter, RawPayloadAdapter)
+    assert transport.adapter.max_batch_size == 50
+
+    transport = create_transport_from_url("http://api.localhost/send")
+    assert isinstance(transport, HTTPTransport)
+    assert isinstance(transport.adapter, JSONPayloadAdapter)
+    assert transport.adapter.max_batch_size == 1
+
+
+@pytest.mark.asyncio
+async def test_lmtp_transport_from_url() -> None:
+    transport = create_transport_from_url("lmtp:///var/run/lmtp.sock?pool_size=2")
+    assert isinstance(transport, LMTPTransport)
+    assert transport.path == "/var/run/lmtp.sock"
+    assert transport.pool_size == 2
+
+    transport = create_transport_from_url("lmtp://mail.localhost:2424")
+    assert isinstance(transport, LMTPTransport)
+    assert transport.host == "mail.localhost"
+    assert transport.port == 2424
+
+
+@pytest.mark.asyncio
+async def test_sendmail_transport_from_url() -> None:
+    transport = create_transport_from_url("sendmail:///usr/lib/sendmail")
+    assert isinstance(transport, SendmailTransport)
+    assert transport.command == ["/usr/lib/sendmail", "-bs"]
+
+    transport = create_transport_from_url("sendmail://")
+    assert isinstance(transport, SendmailTransport)
+    assert transport.command == ["/usr/sbin/sendmail", "-bs"]
+
+
 @pytest.mark.asyncio
 async def test_memory_transport_from_url() -> None:
     transport = create_transport_from_url("memory://")
     assert isinstance(transport, InMemoryTransport)
+    assert transport.capacity is None
+
+    transport = create_transport_from_url("memory://?capacity=100")
+    assert isinstance(transport, InMemoryTransport)
+    assert transport.capacity == 100
 
 
 @pytest.mark.asyncio
@@ -44,3 +125,16 @@ async def test_null_transport_from_url() -> None:
 async def test_smtp_transport_from_url() -> None:
     transport = create_transport_from_url("smtp://?timeout=1")
     assert isinstance(transport, SMTPTransport)
+
+    transport = create_transport_from_url("smtp://?max_recipients=100&pool_size=5")
+    assert isinstance(transport, SMTPTransport)
+    assert transport.max_recipients == 100
+    assert transport.pool_size == 5
+
+    transport = create_transport_from_url("smtp://?verp=bounces%2B%7Blocal%7D%3D%7Bdomain%7D%40example.com")
+    assert isinstance(transport, SMTPTransport)
+    assert transport.verp == "bounces+{local}={domain}@example.com"
+
+    transport = create_transport_from_url("smtp://relay?verp=bounces+{local}={domain}@example.com&timeout=1")
+    assert isinstance(transport, SMTPTransport)
+    assert transport.verp == "bounces+{local}={domain}@example.com"
@@ -0,0 +1,88 @@
+import os
+import pytest
+import threading
+import time
+import typing
+from unittest import mock
+
+from mailers.idempotency import InMemoryIdempotencyStore, SQLiteIdempotencyStore
+
+
+@pytest.mark.asyncio
+async def test_in_memory_store() -> None:
+    store = InMemoryIdempotencyStore()
+    assert not await store.contains("a")
+    await store.add("a")
+    assert await store.contains("a")
+
+
+@pytest.mark.asyncio
+async def test_in_memory_store_evicts_oldest_keys() -> None:
+    store = InMemoryIdempotencyStore(max_size=2)
+    await store.add("a")
+    await store.add("b")
+    await store.add("c")
+    assert not await store.contains("a")
+    assert await store.contains("b")
+    assert await store.contains("c")
+    assert len(store) == 2
+
+
+@pytest.mark.asyncio
+async def test_in_memory_store_expires_keys() -> None:
+    store = InMemoryIdempotencyStore(ttl=10)
+    with mock.patch("time.monotonic", return_value=100):
+        await store.add("a")
+    with mock.patch("time.monotonic", return_value=105):
+        await store.add("b")
+        assert await store.contains("a")
+    with mock.patch("time.monotonic", return_value=111):
+        assert not await store.contains("a")
+        await store.add("c")
+    assert len(store) == 2
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store(tmp_path: typing.Any) -> None:
+    path = os.path.join(tmp_path, "keys.db")
+    store = SQLiteIdempotencyStore(path)
+    assert not await store.contains("a")
+    await store.add("a")
+    assert await store.contains("a")
+    store.close()
+
+    # keys survive restarts
+    store = SQLiteIdempotencyStore(path)
+    assert await store.contains("a")
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_expires_keys(tmp_path: typing.Any) -> None:
+    store = SQLiteIdempotencyStore(os.path.join(tmp_path, "keys.db"), ttl=10, cleanup_interval=2)
+    now = time.time()
+    with mock.patch("time.time", return_value=now):
+        await store.add("a")
+    with mock.patch("time.time", return_value=now + 11):
+        assert not await store.contains("a")
+        await store.add("b")
+
+    assert store._connection.execute("SELECT key FROM mailers_sent_keys").fetchall() == [("b",)]
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_queries_in_worker_threads(tmp_path: typing.Any) -> None:
+    store = SQLiteIdempotencyStore(os.path.join(tmp_path, "keys.db"))
+    threads: typing.List[int] = []
+    execute = store._connection.execute
+
+    def _execute(*args: typing.Any) -> typing.Any:
+        threads.append(threading.get_ident())
+        return execute(*args)
+
+    with mock.patch.object(store, "_connection", mock.Mock(execute=_execute)):
+        await store.add("a")
+        assert await store.contains("a")
+    assert threads and threading.get_ident() not in threads
+    store.close()
@@ -1,11 +1,14 @@
+import anyio
+import functools
 import pytest
 import typing
 from email.message import EmailMessage
 from unittest import mock
 
-from mailers import Encrypter, InMemoryTransport, Mailer, NullTransport, Signer, Transport
+from mailers import Encrypter, InMemoryTransport, Mailer, MultiTransport, NullTransport, Signer, Transport
 from mailers.exceptions import DeliveryError, InvalidSenderError
-from mailers.message import Email
+from mailers.idempotency import InMemoryIdempotencyStore
+from mailers.message import Email, Envelope
 
 
 def test_mailer_creates_transport_from_string() -> None:
@@ -195,4 +198,208 @@ async def test_mailer_calls_preprocessors(mailbox: typing.List[EmailMessage]) ->
     memory_transport = InMemoryTransport(mailbox)
     mailer = Mailer(memory_transport, from_address="user@localhost", preprocessors=[prerocessor])
     await mailer.send(message)
-    prerocessor.assert_called_once_with(message)
+    prerocessor.assert_called_once()
+
+    # preprocessors get a copy, so they can not modify the caller's message
+    preprocessed = prerocessor.call_args[0][0]
+    assert preprocessed is not message
+    assert preprocessed["From"] == "user@localhost"
+    assert "From" not in message
+
+
+@pytest.mark.asyncio
+async def test_mailer_sends_large_messages_via_separate_transport() -> None:
+    transport, large_transport = InMemoryTransport(), InMemoryTransport()
+    mailer = Mailer(transport, large_message_transport=large_transport, large_message_size=10 * 1024)
+
+    await mailer.send(Email(to="root@localhost", subject="small", from_address="noreply@localhost", text="Test."))
+    message = Email(to="root@localhost", subject="large", from_address="noreply@localhost", text="Test.")
+    message.attach(b"x" * 10 * 1024, "file.bin")
+    await mailer.send(message)
+
+    assert [message["Subject"] for message in transport.storage] == ["small"]
+    assert [message["Subject"] for message in large_transport.storage] == ["large"]
+
+
+def test_mailer_creates_large_message_transport_from_string() -> None:
+    mailer = Mailer("null://", large_message_transport="memory://")
+    assert isinstance(mailer.large_message_transport, InMemoryTransport)
+
+
+@pytest.mark.asyncio
+async def test_mailer_skips_repeated_sends() -> None:
+    transport = InMemoryTransport()
+    mailer = Mailer(transport, idempotency_store=InMemoryIdempotencyStore())
+    message = Email(to="root@localhost", subject="SUBJECT", from_address="noreply@localhost", text="Test.")
+    message.id = "<1@localhost>"
+
+    await mailer.send(message)
+    await mailer.send(message)
+    await mailer.send(message.build())
+    await mailer.send(message, idempotency_key="job-1")
+    await mailer.send(message, idempotency_key="job-1")
+    assert len(transport.storage) == 2
+
+
+@pytest.mark.asyncio
+async def test_mailer_skips_repeated_sends_of_message_without_id() -> None:
+    transport = InMemoryTransport()
+    mailer = Mailer(transport, idempotency_store=InMemoryIdempotencyStore())
+    message = Email(to="root@localhost", subject="SUBJECT", from_address="noreply@localhost", text="Test.")
+
+    for _ in range(3):
+        await mailer.send(message)
+    assert len(transport.storage) == 1
+    assert transport.storage[0]["Message-ID"] == message.id
+
+
+@pytest.mark.asyncio
+async def test_mailer_sends_again_after_failure() -> None:
+    transport = InMemoryTransport()
+    mailer = Mailer(transport, idempotency_store=InMemoryIdempotencyStore())
+    message = Email(to="root@localhost", subject="SUBJECT", from_address="noreply@localhost", text="Test.")
+
+    with mock.patch.object(transport, "send", side_effect=ValueError):
+        with pytest.raises(DeliveryError):
+            await mailer.send(message, idempotency_key="job-1")
+    await mailer.send(message, idempotency_key="job-1")
+    assert len(transport.storage) == 1
+
+
+@pytest.mark.asyncio
+async def test_mailer_skips_concurrent_duplicates() -> None:
+    transport = InMemoryTransport()
+    mailer = Mailer(transport, idempotency_store=InMemoryIdempotencyStore())
+    message = Email(to="root@localhost", subject="SUBJECT", from_address="noreply@localhost", text="Test.")
+
+    send = transport.send
+
+    async def slow_send(message: EmailMessage) -> None:
+        await anyio.sleep(0.01)
+        await send(message)
+
+    with mock.patch.object(transport, "send", slow_send):
+        async with anyio.create_task_group() as task_group:
+            for _ in range(3):
+                task_group.start_soon(functools.partial(mailer.send, message, idempotency_key="job-1"))
+    assert len(transport.storage) == 1
+
+
+@pytest.mark.asyncio
+async def test_mailer_does_not_modify_message() -> None:
+    transport = InMemoryTransport()
+    signer = mock.MagicMock(spec=Signer)
+    signer.sign.side_effect = lambda message: message.add_header("X-Signature", "1") or message
+    mailer = Mailer(transport, from_address="user@localhost", signer=signer)
+
+    message = Email(to="root@localhost", subject="SUBJECT", text="Test.")
+    await mailer.send(message)
+    assert not message.from_address
+
+    mime_message = message.build()
+    original = mime_message.as_bytes()
+    await mailer.send(mime_message)
+    await mailer.send(mime_message)
+    assert mime_message.as_bytes() == original
+    assert [str(message["From"]) for message in transport.storage] == ["user@localhost"] * 3
+    assert [len(message.get_all("X-Signature", [])) for message in transport.storage] == [1] * 3
+
+
+@pytest.mark.asyncio
+async def test_mailer_generates_message_id_with_domain_of_from_address() -> None:
+    transport = InMemoryTransport()
+    mailer = Mailer(transport, from_address="Mailer <user@example.com>")
+
+    message = Email(to="root@localhost", subject="SUBJECT", text="Test.")
+    await mailer.send(message)
+    assert not message.from_address
+    assert message.id and message.id.endswith("@example.com>")
+    assert transport.storage[0]["Message-ID"] == message.id
+
+    mailer = Mailer(transport, from_address="user@example.com", idempotency_store=InMemoryIdempotencyStore())
+    message = Email(to="root@localhost", subject="SUBJECT", text="Test.")
+    await mailer.send(message)
+    assert message.id and message.id.endswith("@example.com>")
+    assert transport.storage[1]["Message-ID"] == message.id
+
+
+@pytest.mark.asyncio
+async def test_mailer_enters_transport() -> None:
+    primary, archive = InMemoryTransport(), InMemoryTransport()
+    archived = anyio.Event()
+
+    async def _archive(message: EmailMessage, envelope: typing.Optional[Envelope] = None) -> None:
+        await archived.wait()
+        archive.storage.append(message)
+
+    mailer = Mailer(
+        MultiTransport([primary, archive], broadcast=True, best_effort=[archive]), from_address="root@localhost"
+    )
+    with mock.patch.object(archive, "send", side_effect=_archive):
+        async with mailer:
+            # best effort deliveries run in background of the entered transport
+            await mailer.send(Email(to="user@localhost", subject="SUBJECT", text="Test."))
+            assert len(primary.storage) == 1
+            assert not archive.storage
+            archived.set()
+    assert len(archive.storage) == 1
+
+
+class _EnvelopeTransport(InMemoryTransport):
+    def __init__(self) -> None:
+        super().__init__()
+        self.envelopes: typing.List[typing.Optional[Envelope]] = []
+
+    async def send(self, message: EmailMessage, envelope: typing.Optional[Envelope] = None) -> None:
+        self.envelopes.append(envelope)
+        await super().send(message)
+
+
+@pytest.mark.asyncio
+async def test_mailer_passes_envelope() -> None:
+    transport = _EnvelopeTransport()
+    mailer = Mailer(transport, from_address="Root <root@localhost>")
+
+    await mailer.send(Email(to="user@localhost", bcc="hidden@localhost", subject="SUBJECT", text="Test."))
+    await mailer.send(
+        Email(to="user@localhost", subject="SUBJECT", text="Test."), Envelope("bounce@localhost", ["other@localhost"])
+    )
+    assert transport.envelopes == [
+        Envelope("root@localhost", ["user@localhost", "hidden@localhost"]),
+        Envelope("bounce@localhost", ["other@localhost"]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_mailer_passes_envelope_of_address_headers() -> None:
+    transport = _EnvelopeTransport()
+    storage_transport = InMemoryTransport()
+    message = Email(to="user@localhost", subject="SUBJECT", text="Test.", headers={"Cc": "copy@localhost"})
+
+    await Mailer(transport, from_address="root@localhost").send(message)
+    await Mailer(MultiTransport([storage_transport]), from_address="root@localhost").send(message)
+    await Mailer(
+        MultiTransport([storage_transport]),
+        from_address="root@localhost",
+        preprocessors=[lambda mime_message: mime_message.add_header("Bcc", "hidden@localhost") or mime_message],
+    ).send(message)
+    assert transport.envelopes == [Envelope("root@localhost", ["user@localhost", "copy@localhost"])]
+    assert len(storage_transport.storage) == 2
+
+
+@pytest.mark.asyncio
+async def test_mailer_supports_transports_without_envelope() -> None:
+    storage: typing.List[EmailMessage] = []
+
+    class _Transport(Transport):
+        async def send(self, message: EmailMessage) -> None:
+            storage.append(message)
+
+    mailer = Mailer(_Transport())
+    message = Email(to="user@localhost", from_address="root@localhost", subject="SUBJECT", text="Test.")
+    await mailer.send(message)
+    assert len(storage) == 1
+
+    with pytest.raises(DeliveryError) as ex_info:
+        await mailer.send(message, Envelope("root@localhost", ["other@localhost"]))
+    assert "does not support envelopes" in str(ex_info.value.__cause__)
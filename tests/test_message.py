@@ -8,7 +8,7 @@ from email.message import EmailMessage
 from email.mime.base import MIMEBase
 
 from mailers.exceptions import InvalidBodyError
-from mailers.message import Email
+from mailers.message import Email, Envelope, choose_transfer_encoding
 
 
 def test_email_subject(email: Email) -> None:
@@ -456,3 +456,76 @@ def test_validates_content_presence() -> None:
     with pytest.raises(InvalidBodyError):
         email = Email(from_address="sender@localhost")
         email.build()
+
+
+@pytest.mark.parametrize(
+    "data, allow_8bit, expected",
+    [
+        (b"Hello world.", False, "7bit"),
+        (b"x" * 500, False, "7bit"),
+        (b"x" * 1000, False, "quoted-printable"),
+        ("Héllo wörld.".encode(), False, "quoted-printable"),
+        ("Привет мир.".encode(), False, "base64"),
+        ("Привет мир.".encode(), True, "8bit"),
+        ("Привет мир.".encode() * 100, True, "base64"),
+        (b"null\0byte", True, "quoted-printable"),
+    ],
+)
+def test_choose_transfer_encoding(data: bytes, allow_8bit: bool, expected: str) -> None:
+    assert choose_transfer_encoding(data, allow_8bit) == expected
+
+
+def test_uses_8bit_transfer_encoding_when_allowed() -> None:
+    email = Email(
+        from_address="sender@localhost",
+        text="Привет мир.",
+        html="<b>Привет мир.</b>",
+        allow_8bit=True,
+    )
+    mime_message = email.build()
+    parts = typing.cast(typing.List[EmailMessage], mime_message.get_payload())
+    assert parts[0]["Content-Transfer-Encoding"] == "8bit"
+    assert parts[1]["Content-Transfer-Encoding"] == "8bit"
+    assert "Привет мир.".encode() in mime_message.as_bytes()
+    assert parts[0].get_content() == "Привет мир.\n"
+
+
+def test_uses_7bit_transfer_encoding_for_long_ascii_lines() -> None:
+    email = Email(from_address="sender@localhost", text="x" * 200)
+    mime_message = email.build()
+    assert mime_message["Content-Transfer-Encoding"] == "7bit"
+    assert mime_message.get_content() == "x" * 200 + "\n"
+
+
+def test_build_envelope() -> None:
+    email = Email(
+        to=["User <user@localhost>", "copy@localhost"],
+        cc="user@localhost",
+        bcc="hidden@localhost",
+        from_address="Root <root@localhost>",
+        text="text",
+    )
+    assert email.build_envelope() == Envelope(
+        "root@localhost", ["user@localhost", "copy@localhost", "hidden@localhost"]
+    )
+    assert Envelope.from_message(email.build()) == email.build_envelope()
+
+    email.sender = "sender@localhost"
+    email.return_path = "<bounce@localhost>"
+    assert email.build_envelope().sender == "sender@localhost"
+    email.sender = None
+    assert email.build_envelope().sender == "bounce@localhost"
+    assert Envelope.from_message(email.build()).sender == "bounce@localhost"
+
+
+def test_build_envelope_uses_address_headers() -> None:
+    email = Email(
+        to="user@localhost",
+        from_address="root@localhost",
+        text="text",
+        headers={"Cc": "copy@localhost", "Bcc": "hidden@localhost", "Sender": "sender@localhost"},
+    )
+    assert email.build_envelope() == Envelope(
+        "sender@localhost", ["user@localhost", "copy@localhost", "hidden@localhost"]
+    )
+    assert Envelope.from_message(email.build()) == email.build_envelope()
@@ -1,11 +1,15 @@
+import anyio
 import jinja2
 import pathlib
 import pytest
 import typing
 from email.message import EmailMessage
+from unittest import mock
 
 from mailers import InMemoryTransport
-from mailers.mailer import TemplatedMailer
+from mailers.exceptions import DeliveryError
+from mailers.mailer import BulkRow, TemplatedMailer
+from mailers.message import Attachment
 
 THIS_DIR = pathlib.Path(__file__).parent
 
@@ -55,3 +59,222 @@ async def test_templated_mailer_with_html_part(mailbox: typing.List[EmailMessage
         template_context={"hello": "world"},
     )
     assert mailbox[0].get_payload() == "<b>HTML message: world</b>\n"
+
+
+@pytest.mark.asyncio
+async def test_templated_mailer_inlines_css(mailbox: typing.List[EmailMessage]) -> None:
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader([THIS_DIR / "templates"]))
+
+    transport = InMemoryTransport(mailbox)
+    mailer = TemplatedMailer(transport=transport, jinja_env=env, from_address="root@localhost", inline_css=True)
+    await mailer.send_templated_message(
+        to="root@localhost",
+        subject="hello",
+        html_template="styled.html",
+        template_context={"rows": ["a"]},
+    )
+    assert '<td class="cell" style="color: red;">a</td>' in mailbox[0].get_content()
+    assert mailer.jinja_env is not env
+
+
+@pytest.mark.asyncio
+async def test_templated_mailer_renders_async_templates(mailbox: typing.List[EmailMessage]) -> None:
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader([THIS_DIR / "templates"]), enable_async=True)
+
+    transport = InMemoryTransport(mailbox)
+    mailer = TemplatedMailer(transport=transport, jinja_env=env, from_address="root@localhost")
+    await mailer.send_templated_message(
+        to="root@localhost",
+        subject="hello",
+        html_template="mail.html",
+        text_template="mail.txt",
+        template_context={"hello": "world"},
+    )
+    parts = typing.cast(typing.List[EmailMessage], mailbox[0].get_payload())
+    assert parts[0].get_content() == "Text message: world.\n"
+    assert parts[1].get_content() == "<b>HTML message: world</b>\n"
+
+
+@pytest.mark.asyncio
+async def test_templated_mailer_renders_in_thread(mailbox: typing.List[EmailMessage]) -> None:
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader([THIS_DIR / "templates"]))
+
+    transport = InMemoryTransport(mailbox)
+    mailer = TemplatedMailer(transport=transport, jinja_env=env, from_address="root@localhost", render_in_thread=True)
+    with mock.patch("anyio.to_thread.run_sync", wraps=anyio.to_thread.run_sync) as spy:
+        await mailer.send_templated_message(
+            to="root@localhost",
+            subject="hello",
+            html_template="mail.html",
+            text_template="mail.txt",
+            template_context={"hello": "world"},
+        )
+    assert spy.call_count == 2
+    parts = typing.cast(typing.List[EmailMessage], mailbox[0].get_payload())
+    assert parts[0].get_content() == "Text message: world.\n"
+    assert parts[1].get_content() == "<b>HTML message: world</b>\n"
+
+
+def test_templated_mailer_caches_templates() -> None:
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader([THIS_DIR / "templates"]), auto_reload=False)
+    mailer = TemplatedMailer(transport=InMemoryTransport(), jinja_env=env)
+    with mock.patch.object(env, "get_template", wraps=env.get_template) as spy:
+        assert mailer.get_template("mail.txt") is mailer.get_template("mail.txt")
+    spy.assert_called_once_with("mail.txt")
+
+
+def test_templated_mailer_not_caches_auto_reloaded_templates() -> None:
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader([THIS_DIR / "templates"]), auto_reload=True)
+    mailer = TemplatedMailer(transport=InMemoryTransport(), jinja_env=env)
+    with mock.patch.object(env, "get_template", wraps=env.get_template) as spy:
+        mailer.get_template("mail.txt")
+        mailer.get_template("mail.txt")
+    assert spy.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_templated_mailer_sends_many(mailbox: typing.List[EmailMessage]) -> None:
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader([THIS_DIR / "templates"]))
+    mailer = TemplatedMailer(transport=InMemoryTransport(mailbox), jinja_env=env, from_address="root@localhost")
+    rows = [(f"user{index}@localhost", {"hello": f"user{index}"}) for index in range(5)]
+
+    async with mailer.send_templated_many(
+        rows, subject="hello", text_template="mail.txt", headers={"X-Campaign": "test"}, concurrency=2
+    ) as bulk:
+        results = [result async for result in bulk]
+    assert [result.to for result in results] == [to for to, _ in rows]
+    assert all(result.ok for result in results)
+    assert sorted(message.get_content() for message in mailbox) == [
+        f"Text message: user{index}.\n" for index in range(5)
+    ]
+    assert all(message["X-Campaign"] == "test" for message in mailbox)
+
+
+@pytest.mark.asyncio
+async def test_templated_mailer_sends_many_from_async_iterable(mailbox: typing.List[EmailMessage]) -> None:
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader([THIS_DIR / "templates"]))
+    mailer = TemplatedMailer(transport=InMemoryTransport(mailbox), jinja_env=env, from_address="root@localhost")
+
+    async def _rows() -> typing.AsyncIterator[typing.Tuple[str, typing.Dict[str, str]]]:
+        for index in range(3):
+            yield f"user{index}@localhost", {"hello": "world"}
+
+    attachment = Attachment(body=b"CONTENT", name="file.txt", content_type="text/plain")
+    async with mailer.send_templated_many(
+        _rows(), subject="hello", html_template="mail.html", attachments=[attachment]
+    ) as bulk:
+        results = [result async for result in bulk]
+    assert len(results) == 3
+    assert len(mailbox) == 3
+    assert all(
+        typing.cast(typing.List[EmailMessage], message.get_payload())[1].get_content() == "CONTENT"
+        for message in mailbox
+    )
+
+
+@pytest.mark.asyncio
+async def test_templated_mailer_sends_many_reports_failures(mailbox: typing.List[EmailMessage]) -> None:
+    class _Transport(InMemoryTransport):
+        async def send(self, message: EmailMessage) -> None:
+            if message["To"] == "fail@localhost":
+                raise ValueError()
+            await super().send(message)
+
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader([THIS_DIR / "templates"]))
+    mailer = TemplatedMailer(transport=_Transport(mailbox), jinja_env=env, from_address="root@localhost")
+    rows: typing.List[BulkRow] = [("ok@localhost", {}), ("fail@localhost", {}), ("ok2@localhost", {})]
+
+    async with mailer.send_templated_many(rows, subject="hello", text_template="mail.txt") as bulk:
+        results = [result async for result in bulk]
+    assert [result.ok for result in results] == [True, False, True]
+    assert isinstance(results[1].error, DeliveryError)
+    assert len(mailbox) == 2
+
+
+@pytest.mark.asyncio
+async def test_templated_mailer_sends_many_with_bounded_concurrency() -> None:
+    active = 0
+    max_active = 0
+
+    class _Transport(InMemoryTransport):
+        async def send(self, message: EmailMessage) -> None:
+            nonlocal active, max_active
+            active += 1
+            max_active = max(max_active, active)
+            await anyio.sleep(0.01)
+            active -= 1
+
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader([THIS_DIR / "templates"]))
+    mailer = TemplatedMailer(transport=_Transport(), jinja_env=env, from_address="root@localhost")
+    rows: typing.Iterator[BulkRow] = ((f"user{index}@localhost", {}) for index in range(20))
+
+    async with mailer.send_templated_many(rows, subject="hello", text_template="mail.txt", concurrency=4) as bulk:
+        results = [result async for result in bulk]
+    assert len(results) == 20
+    assert max_active == 4
+
+
+def test_templated_mailer_warms_up_templates() -> None:
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader([THIS_DIR / "templates"]), auto_reload=False)
+    mailer = TemplatedMailer(transport=InMemoryTransport(), jinja_env=env)
+    timings = mailer.warm_up()
+    assert set(timings) == {"mail.html", "mail.txt", "styled.html"}
+    assert all(timing >= 0 for timing in timings.values())
+
+    with mock.patch.object(env, "get_template") as spy:
+        mailer.get_template("mail.html")
+    spy.assert_not_called()
+
+
+def test_templated_mailer_warms_up_selected_templates() -> None:
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader([THIS_DIR / "templates"]))
+    mailer = TemplatedMailer(transport=InMemoryTransport(), jinja_env=env)
+    assert set(mailer.warm_up(["mail.txt"])) == {"mail.txt"}
+    assert set(mailer.warm_up(filter_func=lambda name: name.endswith(".html"))) == {"mail.html", "styled.html"}
+
+
+def test_templated_mailer_uses_bytecode_cache(tmp_path: pathlib.Path) -> None:
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader([THIS_DIR / "templates"]))
+    mailer = TemplatedMailer(transport=InMemoryTransport(), jinja_env=env, bytecode_cache_dir=str(tmp_path))
+    assert env.bytecode_cache is None
+    assert isinstance(mailer.jinja_env.bytecode_cache, jinja2.FileSystemBytecodeCache)
+
+    mailer.warm_up(["mail.txt"])
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+@pytest.mark.asyncio
+async def test_templated_mailer_sends_many_does_not_wait_for_slow_sends(mailbox: typing.List[EmailMessage]) -> None:
+    class _Transport(InMemoryTransport):
+        async def send(self, message: EmailMessage) -> None:
+            if message["To"] == "slow@localhost":
+                # other rows keep going while this send waits
+                while len(self.storage) < 5:
+                    await anyio.sleep(0.001)
+            await super().send(message)
+
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader([THIS_DIR / "templates"]))
+    mailer = TemplatedMailer(transport=_Transport(mailbox), jinja_env=env, from_address="root@localhost")
+    rows: typing.List[BulkRow] = [("slow@localhost", {})]
+    rows.extend((f"user{index}@localhost", {}) for index in range(5))
+
+    with anyio.fail_after(1):
+        async with mailer.send_templated_many(rows, subject="hello", text_template="mail.txt", concurrency=2) as bulk:
+            results = [result async for result in bulk]
+    assert [result.to for result in results] == [to for to, _ in rows]
+    assert mailbox[-1]["To"] == "slow@localhost"
+
+
+@pytest.mark.asyncio
+async def test_templated_mailer_sends_many_stops_after_break(mailbox: typing.List[EmailMessage]) -> None:
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader([THIS_DIR / "templates"]))
+    mailer = TemplatedMailer(transport=InMemoryTransport(mailbox), jinja_env=env, from_address="root@localhost")
+    rows: typing.Iterator[BulkRow] = ((f"user{index}@localhost", {}) for index in range(1000))
+
+    async with mailer.send_templated_many(rows, subject="hello", text_template="mail.txt", concurrency=2) as bulk:
+        async for _ in bulk:
+            break
+    assert len(mailbox) < 1000
+    # the loop is left without closing the iterator, the task group has already been closed by the context
+    await anyio.sleep(0.01)
+    assert len(mailbox) < 1000
@@ -0,0 +1,84 @@
+import css_inline
+import jinja2
+import pathlib
+import typing
+from unittest import mock
+
+from mailers.templating import CSSInliningLoader, inline_css_in_template_source
+
+THIS_DIR = pathlib.Path(__file__).parent
+
+
+def test_inline_css_in_template_source_keeps_jinja_syntax() -> None:
+    env = jinja2.Environment()
+    source = (
+        "<style>td { color: red; }</style>"
+        '<table>{% for row in rows %}<tr><td title="{{ row }}">{{ row if row < 2 }}</td></tr>{% endfor %}</table>'
+        "{# comment #}"
+    )
+    inlined = inline_css_in_template_source(source, env)
+    assert '<td title="{{ row }}" style="color: red;">{{ row if row < 2 }}</td>' in inlined
+    assert "<table>{% for row in rows %}" in inlined
+    assert "{% endfor %}</tbody></table>" in inlined
+    assert "{# comment #}" in inlined
+
+
+def test_css_inlining_loader() -> None:
+    env = jinja2.Environment(loader=CSSInliningLoader(jinja2.FileSystemLoader([THIS_DIR / "templates"])))
+    content = env.get_template("styled.html").render({"rows": ["a", "b"]})
+    assert '<td class="cell" style="color: red;">a</td>' in content
+    assert '<td class="cell" style="color: red;">b</td>' in content
+    assert env.get_template("mail.txt").render({"hello": "world"}) == "Text message: world."
+
+
+def test_css_inlining_loader_inlines_once() -> None:
+    inliner = mock.MagicMock(wraps=css_inline.CSSInliner())
+    env = jinja2.Environment(
+        loader=CSSInliningLoader(jinja2.FileSystemLoader([THIS_DIR / "templates"]), inliner=inliner)
+    )
+    env.get_template("styled.html").render({"rows": ["a"]})
+    env.get_template("styled.html").render({"rows": ["b"]})
+    inliner.inline_fragment.assert_called_once()
+
+
+def test_css_inlining_loader_supports_inheritance() -> None:
+    loader = jinja2.DictLoader(
+        {
+            "base.html": (
+                "<html><head><style>h1 { color: red; }</style></head>"
+                "<body><h1>Title</h1>{% block content %}{% endblock %}</body></html>"
+            ),
+            "child.html": (
+                '{% extends "base.html" %}{% block content %}'
+                '<style>.note { color: blue; }</style><p class="note">{{ name }}</p>{% include "footer.html" %}'
+                "{% endblock %}"
+            ),
+            "footer.html": "<style>small { color: gray; }</style><small>Footer</small>",
+        }
+    )
+    env = jinja2.Environment(loader=CSSInliningLoader(loader))
+    content = env.get_template("child.html").render({"name": "a"})
+    assert content.count("<html>") == 1
+    assert content.count("<body>") == 1
+    assert '<h1 style="color: red;">Title</h1>' in content
+    assert '<p class="note" style="color: blue;">a</p>' in content
+    assert '<small style="color: gray;">Footer</small></body></html>' in content
+
+
+def test_css_inlining_loader_follows_auto_reload(tmp_path: pathlib.Path) -> None:
+    template_file = tmp_path / "mail.html"
+    template_file.write_text("<style>b { color: red; }</style><b>{{ name }}</b>")
+    env = jinja2.Environment(loader=CSSInliningLoader(jinja2.FileSystemLoader([tmp_path])), auto_reload=True)
+    assert 'style="color: red;"' in env.get_template("mail.html").render({"name": "a"})
+
+    template_file.write_text("<style>b { color: blue; }</style><b>{{ name }}</b>")
+    stat = template_file.stat()
+    with mock.patch("os.path.getmtime", return_value=stat.st_mtime + 10):
+        content = env.get_template("mail.html").render({"name": "a"})
+    assert 'style="color: blue;"' in content
+
+
+def test_css_inlining_loader_lists_templates() -> None:
+    loader = CSSInliningLoader(jinja2.DictLoader({"a.html": "", "b.txt": ""}))
+    templates: typing.List[str] = loader.list_templates()
+    assert templates == ["a.html", "b.txt"]
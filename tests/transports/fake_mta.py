@@ -0,0 +1,123 @@
+"""
+A minimal SMTP and LMTP server for tests.
+
+Run as a script, it speaks SMTP over stdin and stdout like "sendmail -bs"
+and appends received transactions as JSON lines to the file given as the first argument.
+"""
+
+import json
+import os
+import socketserver
+import sys
+import typing
+
+Transaction = typing.Dict[str, typing.Any]
+
+
+class Session:
+    """Refuses recipients starting with "reject" at RCPT, LMTP fails recipients starting with "fail" after DATA."""
+
+    def __init__(
+        self,
+        rfile: typing.IO[bytes],
+        wfile: typing.IO[bytes],
+        lmtp: bool,
+        on_transaction: typing.Callable[[Transaction], None],
+    ) -> None:
+        self.rfile = rfile
+        self.wfile = wfile
+        self.lmtp = lmtp
+        self.on_transaction = on_transaction
+
+    def reply(self, *lines: str) -> None:
+        self.wfile.write("".join(line + "\r\n" for line in lines).encode())
+        self.wfile.flush()
+
+    def run(self) -> None:
+        self.reply("220 localhost ready")
+        sender: typing.Optional[str] = None
+        recipients: typing.List[str] = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            argument = command[command.find("<") + 1 : command.find(">")]
+            if verb in ["LHLO", "EHLO", "HELO"]:
+                if (verb == "LHLO") != self.lmtp:
+                    self.reply("500 Unexpected greeting")
+                else:
+                    self.reply("250-localhost", "250-PIPELINING", "250 8BITMIME")
+            elif verb == "MAIL":
+                sender, recipients = argument, []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                if sender is None:
+                    self.reply("503 Need MAIL command")
+                elif argument.startswith("reject"):
+                    self.reply(f"550 No such user {argument}")
+                else:
+                    recipients.append(argument)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                if not recipients:
+                    self.reply("503 No valid recipients")
+                    continue
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = b""
+                while True:
+                    data_line = self.rfile.readline()
+                    if data_line == b".\r\n":
+                        break
+                    data += data_line[1:] if data_line.startswith(b".") else data_line
+                self.on_transaction(
+                    {"pid": os.getpid(), "sender": sender, "recipients": recipients, "data": data.decode()}
+                )
+                if self.lmtp:
+                    self.reply(
+                        *[f"452 Mailbox full {r}" if r.startswith("fail") else f"250 Delivered {r}" for r in recipients]
+                    )
+                else:
+                    self.reply("250 Queued")
+                sender, recipients = None, []
+            elif verb == "RSET":
+                sender, recipients = None, []
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("500 Unknown command")
+
+
+class LMTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.transactions: typing.List[Transaction] = []
+        self.connections = 0
+        super().__init__(path, _LMTPHandler)
+
+
+class _LMTPHandler(socketserver.StreamRequestHandler):
+    server: LMTPServer
+
+    def handle(self) -> None:
+        self.server.connections += 1
+        rfile, wfile = typing.cast(typing.IO[bytes], self.rfile), typing.cast(typing.IO[bytes], self.wfile)
+        Session(rfile, wfile, lmtp=True, on_transaction=self.server.transactions.append).run()
+
+
+def _main(log_path: str) -> None:
+    def _log(transaction: Transaction) -> None:
+        with open(log_path, "a") as f:
+            f.write(json.dumps(transaction) + "\n")
+
+    Session(sys.stdin.buffer, sys.stdout.buffer, lmtp=False, on_transaction=_log).run()
+
+
+if __name__ == "__main__":
+    _main(sys.argv[1])
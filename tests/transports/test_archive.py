@@ -0,0 +1,157 @@
+import anyio
+import os
+import pathlib
+import pytest
+import typing
+from email.message import EmailMessage
+
+from mailers import ArchiveTransport
+from mailers.message import Email
+from mailers.transports.archive import ArchiveReader
+
+
+def _create_message(index: int) -> EmailMessage:
+    return Email(
+        to="user@localhost",
+        from_address="root@localhost",
+        subject=f"Message {index}",
+        text=f"Message {index} contents.",
+        message_id=f"<{index}@localhost>",
+    ).build()
+
+
+@pytest.mark.asyncio
+async def test_archive_transport(tmp_path: pathlib.Path) -> None:
+    async with ArchiveTransport(str(tmp_path)) as transport:
+        for index in range(3):
+            await transport.send(_create_message(index))
+
+        # buffered messages are available before they are written
+        assert os.listdir(tmp_path) == []
+        message = await transport.get_message("<1@localhost>")
+        assert message and message["Subject"] == "Message 1"
+
+    assert sorted(os.listdir(tmp_path)) == ["00000001.idx", "00000001.log"]
+    message = await transport.get_message("<2@localhost>")
+    assert message and message["Subject"] == "Message 2"
+
+    reader = ArchiveReader(str(tmp_path))
+    assert len(reader) == 3
+    message = reader.get("<0@localhost>")
+    assert message and message.get_content().strip() == "Message 0 contents."
+    assert reader.get("<unknown@localhost>") is None
+
+
+@pytest.mark.asyncio
+async def test_archive_transport_does_not_load_index_on_write(tmp_path: pathlib.Path) -> None:
+    async with ArchiveTransport(str(tmp_path)) as transport:
+        await transport.send(_create_message(0))
+    async with ArchiveTransport(str(tmp_path)) as transport:
+        await transport.send(_create_message(1))
+        await transport.flush()
+        assert transport.reader._index is None
+
+        message = await transport.get_message("<1@localhost>")
+        assert message and message["Subject"] == "Message 1"
+        assert transport.reader._index is None
+
+        message = await transport.get_message("<0@localhost>")
+        assert message and message["Subject"] == "Message 0"
+
+
+@pytest.mark.asyncio
+async def test_archive_transport_flushes_full_buffer(tmp_path: pathlib.Path) -> None:
+    transport = ArchiveTransport(str(tmp_path), buffer_size=1)
+    await transport.send(_create_message(0))
+    assert "<0@localhost>" in ArchiveReader(str(tmp_path))
+
+
+@pytest.mark.asyncio
+async def test_archive_transport_rotates_segments_by_size(tmp_path: pathlib.Path) -> None:
+    async with ArchiveTransport(str(tmp_path), max_segment_size=1) as transport:
+        for index in range(3):
+            await transport.send(_create_message(index))
+
+    assert len(list(tmp_path.glob("*.log"))) == 3
+    reader = ArchiveReader(str(tmp_path))
+    assert [typing.cast(EmailMessage, reader.get(f"<{index}@localhost>"))["Subject"] for index in range(3)] == [
+        "Message 0",
+        "Message 1",
+        "Message 2",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_archive_transport_rotates_segments_by_age(tmp_path: pathlib.Path) -> None:
+    transport = ArchiveTransport(str(tmp_path), max_segment_age=3600)
+    await transport.send(_create_message(0))
+    await transport.flush()
+    await transport.send(_create_message(1))
+    await transport.flush()
+    assert len(list(tmp_path.glob("*.log"))) == 1
+
+    transport.max_segment_age = 0.000001
+    await transport.send(_create_message(2))
+    await transport.flush()
+    assert len(list(tmp_path.glob("*.log"))) == 2
+
+
+@pytest.mark.asyncio
+async def test_archive_transport_compresses_messages(tmp_path: pathlib.Path) -> None:
+    async with ArchiveTransport(str(tmp_path), compress=True) as transport:
+        for index in range(3):
+            await transport.send(_create_message(index))
+
+    assert sorted(os.listdir(tmp_path)) == ["00000001.idx", "00000001.log.zlib"]
+    message = ArchiveReader(str(tmp_path)).get("<2@localhost>")
+    assert message and message["Subject"] == "Message 2"
+
+
+@pytest.mark.asyncio
+async def test_archive_transport_starts_new_segment_on_restart(tmp_path: pathlib.Path) -> None:
+    async with ArchiveTransport(str(tmp_path)) as transport:
+        await transport.send(_create_message(0))
+    async with ArchiveTransport(str(tmp_path)) as transport:
+        await transport.send(_create_message(1))
+        message = await transport.get_message("<0@localhost>")
+        assert message and message["Subject"] == "Message 0"
+
+    assert sorted(os.listdir(tmp_path)) == ["00000001.idx", "00000001.log", "00000002.idx", "00000002.log"]
+
+
+@pytest.mark.asyncio
+async def test_archive_transport_skips_segments_without_index(tmp_path: pathlib.Path) -> None:
+    # data written before a crash, the index was never written
+    (tmp_path / "00000001.log").write_bytes(b"orphan data")
+    async with ArchiveTransport(str(tmp_path)) as transport:
+        await transport.send(_create_message(0))
+
+    assert sorted(os.listdir(tmp_path)) == ["00000001.log", "00000002.idx", "00000002.log"]
+    message = ArchiveReader(str(tmp_path)).get("<0@localhost>")
+    assert message and message["Subject"] == "Message 0"
+
+
+@pytest.mark.asyncio
+async def test_archive_transport_flushes_buffer_periodically(tmp_path: pathlib.Path) -> None:
+    async with ArchiveTransport(str(tmp_path), flush_interval=0.01) as transport:
+        await transport.send(_create_message(0))
+        await anyio.sleep(0.05)
+        assert "<0@localhost>" in ArchiveReader(str(tmp_path))
+
+
+@pytest.mark.asyncio
+async def test_archive_transport_flushes_expired_buffer_on_send(tmp_path: pathlib.Path) -> None:
+    transport = ArchiveTransport(str(tmp_path), flush_interval=0.01)
+    await transport.send(_create_message(0))
+    await anyio.sleep(0.02)
+    await transport.send(_create_message(1))
+    assert len(ArchiveReader(str(tmp_path))) == 2
+
+
+def test_archive_reader_skips_partially_written_index_entries(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "00000001.log").write_bytes(b"data")
+    (tmp_path / "00000001.idx").write_text("<1@localhost>\t0\t4\n<2@localhost>\t4")
+
+    reader = ArchiveReader(str(tmp_path))
+    assert reader.get_bytes("<1@localhost>") == b"data"
+    assert "<2@localhost>" not in reader
@@ -32,3 +32,13 @@ async def test_console_transport_unsupported() -> None:
     with pytest.raises(AssertionError) as ex:
         ConsoleTransport("unknown")  # type: ignore
     assert str(ex.value) == "Unsupported console stream type: unknown."
+
+
+@pytest.mark.asyncio
+async def test_buffered_console_transport(message: EmailMessage) -> None:
+    stream = io.StringIO()
+
+    with mock.patch.object(sys, "stdout", stream):
+        async with ConsoleTransport("stdout", buffered=True) as backend:
+            await backend.send(message)
+        assert stream.getvalue() == message.as_bytes().decode()
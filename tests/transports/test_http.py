@@ -0,0 +1,153 @@
+import anyio
+import base64
+import json
+import pytest
+import threading
+import typing
+from email.message import EmailMessage
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from mailers.exceptions import DeliveryError
+from mailers.message import Email, Envelope
+from mailers.transports.http import HTTPTransport, JSONPayloadAdapter, RawPayloadAdapter
+
+
+class _APIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _APIHandler)
+        self.requests: typing.List[typing.Any] = []
+        self.connections: typing.Set[typing.Tuple[str, int]] = set()
+        self.status = 200
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/send"
+
+
+class _APIHandler(BaseHTTPRequestHandler):
+    """A local stand-in for an email API."""
+
+    protocol_version = "HTTP/1.1"
+    server: _APIServer
+
+    def do_POST(self) -> None:
+        self.server.connections.add(self.client_address)
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append({"json": json.loads(body), "authorization": self.headers.get("Authorization")})
+        response = b'{"status": "queued"}'
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args: typing.Any) -> None:
+        pass
+
+
+@pytest.fixture
+def api_server() -> typing.Generator[_APIServer, None, None]:
+    server = _APIServer()
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _create_message(index: int = 0) -> EmailMessage:
+    email = Email(
+        to="user@localhost",
+        cc="Copy <copy@localhost>",
+        bcc="hidden@localhost",
+        from_address="Root <root@localhost>",
+        subject=f"Message {index}",
+        text="Text.",
+        html="<b>HTML.</b>",
+        headers={"X-Campaign": "spring"},
+    )
+    email.attach("contents", "file.txt", "text/plain")
+    return email.build()
+
+
+@pytest.mark.asyncio
+async def test_http_transport(api_server: _APIServer) -> None:
+    async with HTTPTransport(api_server.url, auth=("api", "secret")) as transport:
+        for index in range(3):
+            await transport.send(_create_message(index))
+
+    assert len(api_server.requests) == 3
+    assert len(api_server.connections) == 1  # the connection is kept alive
+
+    request = api_server.requests[0]
+    assert request["authorization"] == "Basic " + base64.b64encode(b"api:secret").decode()
+    payload = request["json"]
+    assert payload["from"] == "root@localhost"
+    assert payload["return_path"] == "root@localhost"
+    assert payload["to"] == ["user@localhost"]
+    assert payload["cc"] == ["copy@localhost"]
+    assert payload["bcc"] == ["hidden@localhost"]
+    assert payload["subject"] == "Message 0"
+    assert payload["text"].strip() == "Text."
+    assert payload["html"].strip() == "<b>HTML.</b>"
+    assert payload["headers"]["X-Campaign"] == "spring"
+    assert "Message-ID" in payload["headers"]
+    assert payload["attachments"] == [
+        {
+            "filename": "file.txt",
+            "content_type": "text/plain",
+            "inline": False,
+            "content_id": None,
+            "content": base64.b64encode(b"contents").decode(),
+        }
+    ]
+
+
+@pytest.mark.asyncio
+async def test_http_transport_sends_json_payload_to_envelope_recipients(api_server: _APIServer) -> None:
+    envelope = Envelope("bounce@localhost", ["copy@localhost", "extra@localhost"])
+    async with HTTPTransport(api_server.url) as transport:
+        await transport.send(_create_message(), envelope)
+
+    payload = api_server.requests[0]["json"]
+    assert payload["return_path"] == "bounce@localhost"
+    assert payload["to"] == []
+    assert payload["cc"] == ["copy@localhost"]
+    assert payload["bcc"] == ["extra@localhost"]
+
+
+@pytest.mark.asyncio
+async def test_http_transport_batches_messages(api_server: _APIServer) -> None:
+    async with HTTPTransport(api_server.url, adapter=RawPayloadAdapter(max_batch_size=3), max_delay=0.05) as transport:
+        async with anyio.create_task_group() as task_group:
+            for index in range(5):
+                task_group.start_soon(transport.send, _create_message(index))
+
+    assert [len(request["json"]["messages"]) for request in api_server.requests] == [3, 2]
+    payload = api_server.requests[0]["json"]["messages"][0]
+    assert payload["sender"] == "root@localhost"
+    assert payload["recipients"] == ["user@localhost", "copy@localhost", "hidden@localhost"]
+    assert b"Subject: Message 0" in base64.b64decode(payload["raw"])
+    assert b"hidden@localhost" not in base64.b64decode(payload["raw"])
+
+
+@pytest.mark.asyncio
+async def test_http_transport_reports_errors_to_every_message_of_batch(api_server: _APIServer) -> None:
+    api_server.status = 500
+    errors = []
+
+    async def _send(transport: HTTPTransport) -> None:
+        try:
+            await transport.send(_create_message())
+        except DeliveryError as ex:
+            errors.append(ex)
+
+    async with HTTPTransport(api_server.url, adapter=JSONPayloadAdapter(max_batch_size=2)) as transport:
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(_send, transport)
+            task_group.start_soon(_send, transport)
+
+    assert len(errors) == 2
+    assert "Email API responded with 500" in str(errors[0])
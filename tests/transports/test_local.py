@@ -0,0 +1,119 @@
+import json
+import os
+import pathlib
+import pytest
+import sys
+import tempfile
+import threading
+import typing
+
+from mailers.exceptions import RecipientsRefusedError
+from mailers.message import Email, Envelope
+from mailers.transports.local import LMTPTransport, SendmailTransport
+from tests.transports.fake_mta import LMTPServer
+
+FAKE_MTA = os.path.join(os.path.dirname(__file__), "fake_mta.py")
+
+
+@pytest.fixture
+def lmtp_server() -> typing.Generator[LMTPServer, None, None]:
+    # unix socket paths are limited to about 100 characters, so pytest's tmp_path may be too long
+    with tempfile.TemporaryDirectory() as directory:
+        server = LMTPServer(os.path.join(directory, "lmtp.sock"))
+        thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.asyncio
+async def test_lmtp_transport_reuses_session(lmtp_server: LMTPServer) -> None:
+    async with LMTPTransport(path=lmtp_server.server_address) as transport:  # type: ignore[arg-type]
+        for index in range(3):
+            await transport.send(
+                Email(
+                    to="user@localhost",
+                    bcc="hidden@localhost",
+                    from_address="root@localhost",
+                    subject=f"Message {index}",
+                    text=".leading dot",
+                ).build()
+            )
+
+    assert lmtp_server.connections == 1
+    assert len(lmtp_server.transactions) == 3
+    transaction = lmtp_server.transactions[0]
+    assert transaction["sender"] == "root@localhost"
+    assert transaction["recipients"] == ["user@localhost", "hidden@localhost"]
+    assert "Bcc" not in transaction["data"]
+    assert "\r\n.leading dot" in transaction["data"]
+
+
+@pytest.mark.asyncio
+async def test_lmtp_transport_reports_status_per_recipient(lmtp_server: LMTPServer) -> None:
+    transport = LMTPTransport(path=lmtp_server.path)
+    message = Email(
+        to=["user@localhost", "reject@localhost", "fail@localhost"], from_address="root@localhost", text="Text."
+    ).build()
+
+    statuses = await transport.deliver(message)
+    assert statuses["user@localhost"][0] == 250
+    assert statuses["reject@localhost"] == (550, "No such user reject@localhost")
+    assert statuses["fail@localhost"] == (452, "Mailbox full fail@localhost")
+    await transport.aclose()
+
+
+@pytest.mark.asyncio
+async def test_lmtp_transport_raises_when_all_recipients_are_refused(lmtp_server: LMTPServer) -> None:
+    transport = LMTPTransport(path=lmtp_server.path)
+    with pytest.raises(RecipientsRefusedError) as ex:
+        await transport.send(Email(to="reject@localhost", from_address="root@localhost", text="Text.").build())
+    assert ex.value.statuses == {"reject@localhost": (550, "No such user reject@localhost")}
+
+    # the session remains usable
+    await transport.send(Email(to="user@localhost", from_address="root@localhost", text="Text.").build())
+    assert lmtp_server.connections == 1
+    await transport.aclose()
+
+
+@pytest.mark.asyncio
+async def test_lmtp_transport_reconnects_closed_sessions(lmtp_server: LMTPServer) -> None:
+    transport = LMTPTransport(path=lmtp_server.path)
+    await transport.send(Email(to="user@localhost", from_address="root@localhost", text="Text.").build())
+    await transport._idle[0].stream.aclose()
+
+    await transport.send(Email(to="user@localhost", from_address="root@localhost", text="Text.").build())
+    assert lmtp_server.connections == 2
+    assert len(lmtp_server.transactions) == 2
+    await transport.aclose()
+
+
+@pytest.mark.asyncio
+async def test_sendmail_transport(tmp_path: pathlib.Path) -> None:
+    log_path = tmp_path / "transactions.jsonl"
+    async with SendmailTransport([sys.executable, FAKE_MTA, str(log_path)]) as transport:
+        for _ in range(2):
+            await transport.send(Email(to="user@localhost", from_address="root@localhost", text="Text.").build())
+
+        message = Email(to=["user@localhost", "reject@localhost"], from_address="root@localhost", text="Text.")
+        statuses = await transport.deliver(message.build())
+        assert statuses == {
+            "user@localhost": (250, "Queued"),
+            "reject@localhost": (550, "No such user reject@localhost"),
+        }
+
+    transactions = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert len(transactions) == 3
+    assert len({transaction["pid"] for transaction in transactions}) == 1
+    assert transactions[2]["recipients"] == ["user@localhost"]
+
+
+@pytest.mark.asyncio
+async def test_lmtp_transport_uses_envelope(lmtp_server: LMTPServer) -> None:
+    async with LMTPTransport(path=lmtp_server.path) as transport:
+        message = Email(to="user@localhost", from_address="root@localhost", text="Text.").build()
+        await transport.send(message, Envelope("bounce@localhost", ["other@localhost"]))
+
+    assert lmtp_server.transactions[0]["sender"] == "bounce@localhost"
+    assert lmtp_server.transactions[0]["recipients"] == ["other@localhost"]
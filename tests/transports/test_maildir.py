@@ -0,0 +1,79 @@
+import anyio
+import mailbox
+import os
+import pathlib
+import pytest
+from email.message import EmailMessage
+from unittest import mock
+
+from mailers import MaildirTransport
+
+
+@pytest.mark.asyncio
+async def test_maildir_transport(tmp_path: pathlib.Path, message: EmailMessage) -> None:
+    transport = MaildirTransport(str(tmp_path))
+    await transport.send(message)
+
+    assert sorted(os.listdir(tmp_path)) == ["cur", "new", "tmp"]
+    assert os.listdir(tmp_path / "tmp") == []
+    [delivered] = mailbox.Maildir(str(tmp_path), create=False)
+    assert delivered["Subject"] == "subject"
+
+
+@pytest.mark.asyncio
+async def test_maildir_transport_creates_unique_names(tmp_path: pathlib.Path, message: EmailMessage) -> None:
+    transport = MaildirTransport(str(tmp_path))
+    async with anyio.create_task_group() as task_group:
+        for _ in range(50):
+            task_group.start_soon(transport.send, message)
+
+    assert len(os.listdir(tmp_path / "new")) == 50
+
+
+@pytest.mark.asyncio
+async def test_maildir_transport_shards_messages(tmp_path: pathlib.Path, message: EmailMessage) -> None:
+    transport = MaildirTransport(str(tmp_path), shard_levels=2)
+    for _ in range(10):
+        await transport.send(message)
+
+    maildirs = [path.parent for path in tmp_path.glob("*/*/new")]
+    assert all(len(path.name) == 2 and len(path.parent.name) == 2 for path in maildirs)
+    assert sum(len(mailbox.Maildir(str(path), create=False)) for path in maildirs) == 10
+
+
+@pytest.mark.asyncio
+async def test_maildir_transport_flushes_batches(tmp_path: pathlib.Path, message: EmailMessage) -> None:
+    transport = MaildirTransport(str(tmp_path), fsync=True, max_batch_size=5, max_delay=1)
+    with mock.patch("os.fsync", wraps=os.fsync) as fsync:
+        async with anyio.create_task_group() as task_group:
+            for _ in range(10):
+                task_group.start_soon(transport.send, message)
+
+    assert len(os.listdir(tmp_path / "new")) == 10
+    # one flush per file and one flush of "new" directory per batch
+    assert fsync.call_count == 12
+
+
+@pytest.mark.asyncio
+async def test_maildir_transport_reports_errors_to_every_sender_of_batch(
+    tmp_path: pathlib.Path, message: EmailMessage
+) -> None:
+    (tmp_path / "file").write_text("")
+    transport = MaildirTransport(str(tmp_path / "file"), fsync=True, max_delay=0.01)
+    errors = []
+
+    async def _send() -> None:
+        try:
+            await transport.send(message)
+        except OSError as ex:
+            errors.append(ex)
+
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(_send)
+        task_group.start_soon(_send)
+    assert len(errors) == 2
+
+
+def test_maildir_transport_requires_directory() -> None:
+    with pytest.raises(ValueError, match='Argument "directory" of MaildirTransport cannot be empty.'):
+        MaildirTransport("")
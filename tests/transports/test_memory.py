@@ -1,8 +1,10 @@
+import anyio
 import pytest
 import typing
 from email.message import EmailMessage
 
 from mailers import InMemoryTransport
+from mailers.message import Email
 
 
 @pytest.mark.asyncio
@@ -13,3 +15,76 @@ async def test_in_memory_transport(message: EmailMessage) -> None:
     assert len(storage) == 1
     assert backend.mailbox == storage
     assert len(backend.mailbox) == 1
+
+
+def _create_message(index: int, to: str = "user@localhost", **kwargs: typing.Any) -> EmailMessage:
+    return Email(
+        to=to,
+        from_address="root@localhost",
+        subject=f"Message {index}",
+        text="Text.",
+        message_id=f"<{index}@localhost>",
+        **kwargs,
+    ).build()
+
+
+@pytest.mark.asyncio
+async def test_in_memory_transport_evicts_oldest_messages() -> None:
+    transport = InMemoryTransport(capacity=2)
+    for index in range(3):
+        await transport.send(_create_message(index))
+
+    assert [message["Subject"] for message in transport.mailbox] == ["Message 1", "Message 2"]
+    assert transport.get_by_message_id("<0@localhost>") is None
+    assert transport.find_by_subject("Message 0") == []
+    assert len(transport.find_by_recipient("user@localhost")) == 2
+
+
+@pytest.mark.asyncio
+async def test_in_memory_transport_evicts_from_given_storage() -> None:
+    storage: typing.List[EmailMessage] = []
+    transport = InMemoryTransport(storage, capacity=1)
+    await transport.send(_create_message(0))
+    await transport.send(_create_message(1))
+    assert [message["Subject"] for message in storage] == ["Message 1"]
+
+
+@pytest.mark.asyncio
+async def test_in_memory_transport_indexes_messages() -> None:
+    transport = InMemoryTransport(index_headers=["X-Campaign"])
+    await transport.send(_create_message(0, to="User <USER@localhost>", headers={"X-Campaign": "spring"}))
+    await transport.send(_create_message(1, to="admin@localhost", bcc="user@localhost"))
+
+    assert [message["Subject"] for message in transport.find_by_recipient("user@localhost")] == [
+        "Message 0",
+        "Message 1",
+    ]
+    assert transport.find_by_recipient("unknown@localhost") == []
+    assert [message["Subject"] for message in transport.find_by_subject("Message 1")] == ["Message 1"]
+    assert transport.get_by_message_id("<1@localhost>") is transport.mailbox[1]
+    assert transport.find_by_header("X-Campaign", "spring") == [transport.mailbox[0]]
+    assert transport.find_by_header("From", "root@localhost") == list(transport.mailbox)
+
+    transport.clear()
+    assert len(transport.mailbox) == 0
+    assert transport.find_by_recipient("user@localhost") == []
+
+
+@pytest.mark.asyncio
+async def test_in_memory_transport_waits_for_message() -> None:
+    transport = InMemoryTransport()
+    await transport.send(_create_message(0))
+    assert (await transport.wait_for())["Subject"] == "Message 0"
+
+    async def _send_later() -> None:
+        await anyio.sleep(0.01)
+        await transport.send(_create_message(1))
+        await transport.send(_create_message(2))
+
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(_send_later)
+        message = await transport.wait_for(lambda message: message["Subject"] == "Message 2", timeout=1)
+    assert message["Subject"] == "Message 2"
+
+    with pytest.raises(TimeoutError):
+        await transport.wait_for(lambda message: message["Subject"] == "Message 3", timeout=0.01)
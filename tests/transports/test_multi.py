@@ -1,8 +1,11 @@
+import anyio
 import pytest
+import time
+import typing
 from email.message import EmailMessage
 from unittest import mock
 
-from mailers import InMemoryTransport
+from mailers import InMemoryTransport, Transport
 from mailers.transports.multi import MultiDeliveryError, MultiTransport
 
 
@@ -28,3 +31,101 @@ async def test_multi_transport_nothing_delivers(message: EmailMessage) -> None:
             with mock.patch.object(channel_fail, "send", side_effect=ValueError):
                 transport = MultiTransport([channel_fail, channel_ok])
                 await transport.send(message)
+
+
+class SlowTransport(InMemoryTransport):
+    def __init__(self, delay: float) -> None:
+        super().__init__()
+        self.delay = delay
+
+    async def send(self, message: EmailMessage) -> None:
+        await anyio.sleep(self.delay)
+        await super().send(message)
+
+
+@pytest.mark.asyncio
+async def test_multi_transport_failover_timeout(message: EmailMessage) -> None:
+    slow, fallback = SlowTransport(1), InMemoryTransport()
+    transport = MultiTransport([slow, fallback], timeouts={slow: 0.01})
+    await transport.send(message)
+    assert not slow.storage
+    assert len(fallback.storage) == 1
+
+
+@pytest.mark.asyncio
+async def test_multi_transport_broadcast(message: EmailMessage) -> None:
+    first, second = SlowTransport(0.1), SlowTransport(0.1)
+    transport = MultiTransport([first, second], broadcast=True)
+
+    started_at = time.perf_counter()
+    await transport.send(message)
+    assert time.perf_counter() - started_at < 0.19
+    assert len(first.storage) == 1
+    assert len(second.storage) == 1
+
+
+@pytest.mark.asyncio
+async def test_multi_transport_broadcast_required_failure(message: EmailMessage) -> None:
+    channel_ok, channel_fail = InMemoryTransport(), InMemoryTransport()
+    transport = MultiTransport([channel_ok, channel_fail], broadcast=True)
+    with mock.patch.object(channel_fail, "send", side_effect=ValueError):
+        with pytest.raises(MultiDeliveryError) as ex_info:
+            await transport.send(message)
+    assert len(channel_ok.storage) == 1
+    assert isinstance(ex_info.value.exceptions[0], ValueError)
+
+
+@pytest.mark.asyncio
+async def test_multi_transport_broadcast_best_effort(message: EmailMessage) -> None:
+    primary, archive, failing = InMemoryTransport(), SlowTransport(0.05), InMemoryTransport()
+    errors: typing.List[typing.Tuple[Transport, Exception]] = []
+    transport = MultiTransport(
+        [primary, archive, failing],
+        broadcast=True,
+        best_effort=[archive, failing],
+        error_handler=lambda transport, ex: errors.append((transport, ex)),
+    )
+
+    with mock.patch.object(failing, "send", side_effect=ValueError):
+        async with transport:
+            await transport.send(message)
+            assert len(primary.storage) == 1
+            assert not archive.storage
+
+    assert len(archive.storage) == 1
+    assert errors[0][0] is failing
+    assert isinstance(errors[0][1], ValueError)
+
+
+@pytest.mark.asyncio
+async def test_multi_transport_broadcast_best_effort_timeout(message: EmailMessage) -> None:
+    primary, archive = InMemoryTransport(), SlowTransport(1)
+    errors: typing.List[Exception] = []
+    transport = MultiTransport(
+        [primary, archive],
+        broadcast=True,
+        best_effort=[archive],
+        timeouts={archive: 0.01},
+        error_handler=lambda transport, ex: errors.append(ex),
+    )
+    async with transport:
+        await transport.send(message)
+
+    assert len(primary.storage) == 1
+    assert not archive.storage
+    assert isinstance(errors[0], TimeoutError)
+
+
+@pytest.mark.asyncio
+async def test_multi_transport_waits_for_best_effort_outside_context(
+    message: EmailMessage, caplog: pytest.LogCaptureFixture
+) -> None:
+    primary, archive, failing = InMemoryTransport(), SlowTransport(0.01), InMemoryTransport()
+    transport = MultiTransport([primary, archive, failing], broadcast=True, best_effort=[archive, failing])
+
+    with mock.patch.object(failing, "send", side_effect=ValueError):
+        await transport.send(message)
+
+    assert len(primary.storage) == 1
+    assert len(archive.storage) == 1
+    assert "Best effort delivery" in caplog.text
@@ -0,0 +1,107 @@
+import pytest
+import typing
+from email.message import EmailMessage
+from unittest import mock
+
+from mailers import InMemoryTransport
+from mailers.exceptions import DeliveryError
+from mailers.message import Email, Envelope
+from mailers.transports.routing import RoutingDeliveryError, RoutingTransport
+
+
+def _build_message() -> EmailMessage:
+    return Email(
+        to=["alice@corp.example", "Bob <bob@gmail.com>"],
+        cc="carol@eu.corp.example",
+        bcc=["dave@other.org"],
+        subject="subject",
+        text="contents",
+        from_address="root@localhost",
+    ).build()
+
+
+def test_routing_transport_lookup() -> None:
+    internal, webmail, nested, default = InMemoryTransport(), InMemoryTransport(), InMemoryTransport(), object()
+    transport = RoutingTransport(
+        {
+            "corp.example": internal,
+            "*.corp.example": internal,
+            "*.eu.corp.example": nested,
+            "Gmail.com.": webmail,
+        },
+        default=default,  # type: ignore[arg-type]
+    )
+
+    assert transport.get_transport("user@corp.example") is internal
+    assert transport.get_transport("user@mail.corp.example") is internal
+    assert transport.get_transport("user@a.b.corp.example") is internal
+    assert transport.get_transport("user@eu.corp.example") is internal
+    assert transport.get_transport("user@mx.eu.corp.example") is nested
+    assert transport.get_transport("user@GMAIL.COM") is webmail
+    assert transport.get_transport("user@mail.gmail.com") is default
+    assert transport.get_transport("user@example") is default
+    assert transport.get_transport("user@notcorp.example") is default
+
+
+class EnvelopeRecorder(InMemoryTransport):
+    def __init__(self) -> None:
+        super().__init__()
+        self.envelopes: typing.List[typing.Optional[Envelope]] = []
+
+    async def send(self, message: EmailMessage, envelope: typing.Optional[Envelope] = None) -> None:
+        self.envelopes.append(envelope)
+        await super().send(message)
+
+
+@pytest.mark.asyncio
+async def test_routing_transport_splits_recipients() -> None:
+    internal, webmail, default = EnvelopeRecorder(), EnvelopeRecorder(), EnvelopeRecorder()
+    transport = RoutingTransport({"corp.example": internal, "*.corp.example": internal, "gmail.com": webmail}, default)
+    message = _build_message()
+    await transport.send(message)
+
+    assert internal.envelopes == [Envelope("root@localhost", ["alice@corp.example", "carol@eu.corp.example"])]
+    assert webmail.envelopes == [Envelope("root@localhost", ["bob@gmail.com"])]
+    assert default.envelopes == [Envelope("root@localhost", ["dave@other.org"])]
+    assert internal.storage[0] is message
+    assert webmail.storage[0] is message
+
+
+@pytest.mark.asyncio
+async def test_routing_transport_uses_given_envelope(message: EmailMessage) -> None:
+    internal, default = EnvelopeRecorder(), EnvelopeRecorder()
+    transport = RoutingTransport({"corp.example": internal}, default)
+    await transport.send(message, Envelope("bounce@localhost", ["user@corp.example", "user@other.org"]))
+
+    assert internal.envelopes == [Envelope("bounce@localhost", ["user@corp.example"])]
+    assert default.envelopes == [Envelope("bounce@localhost", ["user@other.org"])]
+
+
+@pytest.mark.asyncio
+async def test_routing_transport_single_route_sends_original(message: EmailMessage) -> None:
+    local = InMemoryTransport()
+    transport = RoutingTransport({"localhost": local})
+    await transport.send(message)
+    assert local.storage[0] is message
+
+
+@pytest.mark.asyncio
+async def test_routing_transport_no_route() -> None:
+    internal = InMemoryTransport()
+    transport = RoutingTransport({"corp.example": internal})
+    with pytest.raises(DeliveryError, match="bob@gmail.com"):
+        await transport.send(_build_message())
+    assert not internal.storage
+
+
+@pytest.mark.asyncio
+async def test_routing_transport_partial_failure() -> None:
+    internal, webmail = EnvelopeRecorder(), EnvelopeRecorder()
+    transport = RoutingTransport({"*.corp.example": internal, "corp.example": internal}, webmail)
+    with mock.patch.object(webmail, "send", side_effect=ValueError):
+        with pytest.raises(RoutingDeliveryError) as ex_info:
+            await transport.send(_build_message())
+
+    assert set(ex_info.value.failed_recipients) == {"bob@gmail.com", "dave@other.org"}
+    assert len(ex_info.value.exceptions) == 1
+    assert len(internal.storage) == 1
@@ -1,9 +1,14 @@
+import asyncio
 import pytest
 import typing
 from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import SMTP, Envelope, Session
 from email.message import EmailMessage
 
 from mailers import SMTPTransport
+from mailers.exceptions import RecipientsRefusedError
+from mailers.message import Email
+from mailers.message import Envelope as MessageEnvelope
 
 
 @pytest.mark.asyncio
@@ -13,3 +18,192 @@ async def test_smtp_transport(
     backend = SMTPTransport(smtpd_server.hostname, smtpd_server.port, timeout=1)
     await backend.send(message)
     assert len(mailbox) == 1
+
+
+class _EnvelopeHandler:
+    def __init__(self) -> None:
+        self.envelopes: typing.List[Envelope] = []
+
+    async def handle_DATA(self, server: SMTP, session: Session, envelope: Envelope) -> str:
+        self.envelopes.append(envelope)
+        return "250 OK"
+
+
+@pytest.mark.asyncio
+async def test_smtp_transport_sends_utf8_headers(smtpd_controller: typing.Callable[..., Controller]) -> None:
+    handler = _EnvelopeHandler()
+    server = smtpd_controller(handler, enable_SMTPUTF8=True)
+    message = Email(to="user@localhost", subject="Привет", text="мир", from_address="root@localhost")
+    mime_message = message.build()
+    backend = SMTPTransport(server.hostname, server.port, timeout=1, utf8=True)
+    await backend.send(mime_message)
+
+    assert len(handler.envelopes) == 1
+    assert "SMTPUTF8" in handler.envelopes[0].mail_options
+    assert "Subject: Привет".encode() in typing.cast(bytes, handler.envelopes[0].original_content)
+
+
+@pytest.mark.asyncio
+async def test_smtp_transport_keeps_encoded_headers_of_signed_messages(
+    smtpd_controller: typing.Callable[..., Controller],
+) -> None:
+    handler = _EnvelopeHandler()
+    server = smtpd_controller(handler, enable_SMTPUTF8=True)
+    message = Email(to="user@localhost", subject="Привет", text="мир", from_address="root@localhost")
+    mime_message = message.build()
+    mime_message["DKIM-Signature"] = "v=1; a=rsa-sha256; d=localhost; s=default; b=signature"
+    backend = SMTPTransport(server.hostname, server.port, timeout=1, utf8=True)
+    await backend.send(mime_message)
+
+    content = typing.cast(bytes, handler.envelopes[0].original_content)
+    assert "SMTPUTF8" not in handler.envelopes[0].mail_options
+    assert "Привет".encode() not in content
+    assert b"Subject: =?utf-8?" in content
+
+
+@pytest.mark.asyncio
+async def test_smtp_transport_utf8_falls_back_without_server_support(
+    message: EmailMessage, smtpd_server: Controller, mailbox: typing.List[EmailMessage]
+) -> None:
+    backend = SMTPTransport(smtpd_server.hostname, smtpd_server.port, timeout=1, utf8=True)
+    await backend.send(message)
+    assert len(mailbox) == 1
+
+
+@pytest.mark.asyncio
+async def test_smtp_transport_does_not_modify_message(smtpd_controller: typing.Callable[..., Controller]) -> None:
+    handler = _EnvelopeHandler()
+    server = smtpd_controller(handler)
+    message = Email(
+        to="user@localhost",
+        subject="subject",
+        text="text",
+        from_address="root@localhost",
+        sender="bounce@localhost",
+    ).build()
+    backend = SMTPTransport(server.hostname, server.port, timeout=1)
+    await backend.send(message)
+    await backend.send(message)
+
+    assert message["Sender"] == "bounce@localhost"
+    assert [envelope.mail_from for envelope in handler.envelopes] == ["bounce@localhost"] * 2
+    assert b"Sender:" not in typing.cast(bytes, handler.envelopes[1].original_content)
+
+
+@pytest.mark.asyncio
+async def test_smtp_transport_uses_envelope(smtpd_controller: typing.Callable[..., Controller]) -> None:
+    handler = _EnvelopeHandler()
+    server = smtpd_controller(handler)
+    message = Email(to="user@localhost", subject="subject", text="text", from_address="root@localhost").build()
+    backend = SMTPTransport(server.hostname, server.port, timeout=1)
+    await backend.send(message, MessageEnvelope("bounce@localhost", ["other@localhost", "copy@localhost"]))
+
+    assert handler.envelopes[0].mail_from == "bounce@localhost"
+    assert handler.envelopes[0].rcpt_tos == ["other@localhost", "copy@localhost"]
+
+
+class _RecordingHandler:
+    def __init__(self) -> None:
+        self.transactions: typing.List[typing.Tuple[int, typing.List[str], bytes]] = []
+        self.senders: typing.List[str] = []
+        self.active = 0
+        self.max_active = 0
+
+    async def handle_RCPT(
+        self, server: SMTP, session: Session, envelope: Envelope, address: str, rcpt_options: typing.List[str]
+    ) -> str:
+        if address.startswith("reject"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server: SMTP, session: Session, envelope: Envelope) -> str:
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        self.transactions.append((id(session), list(envelope.rcpt_tos), typing.cast(bytes, envelope.original_content)))
+        self.senders.append(typing.cast(str, envelope.mail_from))
+        return "250 Queued"
+
+
+@pytest.mark.asyncio
+async def test_smtp_transport_splits_recipients(smtpd_controller: typing.Callable[..., Controller]) -> None:
+    handler = _RecordingHandler()
+    server = smtpd_controller(handler)
+    recipients = ["user1@localhost", "reject@localhost", "user2@localhost", "user3@localhost", "user4@localhost"]
+    message = Email(to="team@localhost", bcc=recipients, text="text", from_address="root@localhost").build()
+    backend = SMTPTransport(server.hostname, server.port, timeout=1, max_recipients=2)
+    statuses = await backend.deliver(message, MessageEnvelope("root@localhost", recipients))
+
+    assert [rcpt_tos for _, rcpt_tos, _ in handler.transactions] == [
+        ["user1@localhost"],
+        ["user2@localhost", "user3@localhost"],
+        ["user4@localhost"],
+    ]
+    assert len({session for session, _, _ in handler.transactions}) == 1
+    assert len({data for _, _, data in handler.transactions}) == 1
+    assert b"Bcc" not in handler.transactions[0][2]
+    assert statuses["reject@localhost"] == (550, "No such user")
+    assert statuses["user1@localhost"] == (250, "Queued")
+    assert list(statuses) == [
+        "user1@localhost",
+        "reject@localhost",
+        "user2@localhost",
+        "user3@localhost",
+        "user4@localhost",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_smtp_transport_runs_transactions_over_pooled_connections(
+    smtpd_controller: typing.Callable[..., Controller],
+) -> None:
+    handler = _RecordingHandler()
+    server = smtpd_controller(handler)
+    recipients = [f"user{index}@localhost" for index in range(6)]
+    message = Email(to=recipients, text="text", from_address="root@localhost").build()
+    async with SMTPTransport(server.hostname, server.port, timeout=1, max_recipients=2, pool_size=3) as backend:
+        await backend.send(message)
+        await backend.send(message)
+
+    assert len(handler.transactions) == 6
+    assert len({session for session, _, _ in handler.transactions}) == 3
+    assert handler.max_active > 1
+
+
+@pytest.mark.asyncio
+async def test_smtp_transport_raises_when_all_recipients_refused(
+    smtpd_controller: typing.Callable[..., Controller],
+) -> None:
+    handler = _RecordingHandler()
+    server = smtpd_controller(handler)
+    message = Email(to=["reject1@localhost", "reject2@localhost"], text="text", from_address="root@localhost")
+    backend = SMTPTransport(server.hostname, server.port, timeout=1, max_recipients=1)
+    with pytest.raises(RecipientsRefusedError) as ex_info:
+        await backend.send(message.build())
+
+    assert ex_info.value.statuses == {
+        "reject1@localhost": (550, "No such user"),
+        "reject2@localhost": (550, "No such user"),
+    }
+    assert not handler.transactions
+
+
+@pytest.mark.asyncio
+async def test_smtp_transport_sends_verp_transactions(smtpd_controller: typing.Callable[..., Controller]) -> None:
+    handler = _RecordingHandler()
+    server = smtpd_controller(handler)
+    recipients = ["user1@localhost", "user2@example.com", "reject@localhost"]
+    message = Email(to=recipients, text="text", from_address="root@localhost").build()
+    backend = SMTPTransport(server.hostname, server.port, timeout=1, verp="bounces+{local}={domain}@localhost")
+    statuses = await backend.deliver(message)
+
+    assert handler.senders == ["bounces+user1=localhost@localhost", "bounces+user2=example.com@localhost"]
+    assert [rcpt_tos for _, rcpt_tos, _ in handler.transactions] == [["user1@localhost"], ["user2@example.com"]]
+    assert len({session for session, _, _ in handler.transactions}) == 1
+    assert len({data for _, _, data in handler.transactions}) == 1
+    assert statuses["reject@localhost"] == (550, "No such user")
+    assert backend.get_verp_sender("user@example.com") == "bounces+user=example.com@localhost"
+    with pytest.raises(ValueError):
+        backend.get_verp_sender('"first last"@example.com')
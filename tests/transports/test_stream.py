@@ -1,5 +1,8 @@
+import anyio
 import io
 import pytest
+import threading
+import typing
 from email.message import EmailMessage
 
 from mailers import StreamTransport
@@ -11,3 +14,74 @@ async def test_stream_transport(message: EmailMessage) -> None:
     backend = StreamTransport(stream)
     await backend.send(message)
     assert len(stream.getvalue()) == len(str(message))
+
+
+@pytest.mark.asyncio
+async def test_buffered_stream_transport(message: EmailMessage) -> None:
+    stream = io.BytesIO()
+    async with StreamTransport(stream, buffered=True) as backend:
+        for _ in range(3):
+            await backend.send(message)
+    assert stream.getvalue() == message.as_bytes() * 3
+
+
+@pytest.mark.asyncio
+async def test_buffered_stream_transport_writes_to_text_streams(message: EmailMessage) -> None:
+    stream = io.StringIO()
+    async with StreamTransport(stream, buffered=True) as backend:
+        await backend.send(message)
+    assert stream.getvalue() == message.as_bytes().decode()
+
+    binary = io.BytesIO()
+    wrapper = io.TextIOWrapper(binary)
+    async with StreamTransport(wrapper, buffered=True) as backend:
+        await backend.send(message)
+    assert binary.getvalue() == message.as_bytes()
+
+
+class _SlowStream(io.BytesIO):
+    def __init__(self) -> None:
+        super().__init__()
+        self.released = threading.Event()
+        self.writes: typing.List[int] = []
+
+    def write(self, data: typing.Any) -> int:
+        self.released.wait()
+        self.writes.append(len(data))
+        return super().write(data)
+
+
+@pytest.mark.asyncio
+async def test_buffered_stream_transport_does_not_block_on_slow_stream(message: EmailMessage) -> None:
+    stream = _SlowStream()
+    size = len(message.as_bytes())
+    backend = StreamTransport(stream, buffered=True, max_buffer_size=size * 3)
+
+    # messages are queued while the stream is blocked
+    for _ in range(3):
+        with anyio.fail_after(1):
+            await backend.send(message)
+
+    async def _release() -> None:
+        await anyio.sleep(0.01)
+        stream.released.set()
+
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(_release)
+        # waits for the writer to free the buffer when it is full
+        with anyio.fail_after(1):
+            await backend.send(message)
+
+    await backend.aclose()
+    assert stream.getvalue() == message.as_bytes() * 4
+    assert len(stream.writes) < 4  # queued messages are written in batches
+
+
+@pytest.mark.asyncio
+async def test_buffered_stream_transport_reports_write_errors(message: EmailMessage) -> None:
+    stream = io.BytesIO()
+    stream.close()
+    backend = StreamTransport(stream, buffered=True)
+    await backend.send(message)
+    with pytest.raises(ValueError):
+        await backend.aclose()